@@ -5,6 +5,21 @@ This code is in the public domain.
 
 """
 
+from binascii import hexlify, unhexlify
+
+
+def xor_bytes(data, keystream):
+    """Returns data XORed with the first len(data) bytes of keystream.
+
+    Both are turned into big integers, so that the whole string is
+    XORed at once instead of byte by byte.
+    """
+    n = len(data)
+    if not n:
+        return data[:0]
+    x = int(hexlify(data), 16) ^ int(hexlify(keystream[:n]), 16)
+    return unhexlify('%0*x' % (n * 2, x))
+
 
 class Arcfour(object):
     """Python implementation of Arcfour encryption algorithm.
@@ -13,27 +28,37 @@ class Arcfour(object):
 
         Arcfour('Key').process('Plaintext').encode('hex')
 
+    keystream(n) returns the next n bytes of the keystream itself,
+    which is what process() XORs with the data.
     """
 
     def __init__(self, key):
         s = list(range(256))
         j = 0
+        key = bytearray(key)
         klen = len(key)
         for i in range(256):
-            j = (j + s[i] + ord(key[i % klen])) % 256
-            (s[i], s[j]) = (s[j], s[i])
+            si = s[i]
+            j = (j + si + key[i % klen]) & 255
+            s[i] = s[j]
+            s[j] = si
         self.s = s
         (self.i, self.j) = (0, 0)
 
-    def process(self, data):
+    def keystream(self, n):
         (i, j) = (self.i, self.j)
         s = self.s
-        r = ''
-        for c in data:
-            i = (i + 1) % 256
-            j = (j + s[i]) % 256
-            (s[i], s[j]) = (s[j], s[i])
-            k = s[(s[i] + s[j]) % 256]
-            r += chr(ord(c) ^ k)
+        r = bytearray(n)
+        for k in range(n):
+            i = (i + 1) & 255
+            si = s[i]
+            j = (j + si) & 255
+            sj = s[j]
+            s[i] = sj
+            s[j] = si
+            r[k] = s[(si + sj) & 255]
         (self.i, self.j) = (i, j)
-        return r
+        return bytes(r)
+
+    def process(self, data):
+        return xor_bytes(data, self.keystream(len(data)))
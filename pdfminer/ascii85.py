@@ -5,8 +5,61 @@ This code is in the public domain.
 
 """
 
-import re
 import struct
+from binascii import unhexlify
+
+
+# the characters that are not ASCII85 digits, nor 'z'.
+NON_ASCII85 = ''.join(chr(c) for c in range(256) if not (33 <= c <= 117 or c == 122))
+# the value of '!!!!!', which is subtracted from each group.
+ASCII85_ZERO = 33 * (85 ** 4 + 85 ** 3 + 85 ** 2 + 85 + 1)
+
+NON_HEX = ''.join(chr(c) for c in range(256) if chr(c) not in '0123456789abcdefABCDEF')
+
+
+class ASCII85Decoder(object):
+    """Incremental ASCII85 decoder.
+
+    decode() returns the bytes of the complete groups it was given;
+    the rest is kept for the next call, or for flush(). White-space
+    and any other characters that are not digits are ignored.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.eod = False
+
+    def decode(self, data):
+        if self.eod:
+            return ''
+        # the data may be a slice of an mmap (a buffer).
+        data = bytes(data)
+        i = data.find('~')
+        if 0 <= i:
+            # '~>' is the EOD marker.
+            data = data[:i]
+            self.eod = True
+        data = self.buf + data.translate(None, NON_ASCII85).replace('z', '!!!!!')
+        n = len(data) - len(data) % 5
+        self.buf = data[n:]
+        b = bytearray(data)
+        zero = ASCII85_ZERO
+        groups = [((((b[i] * 85 + b[i + 1]) * 85 + b[i + 2]) * 85 + b[i + 3]) * 85 + b[i + 4] - zero) & 0xffffffff
+                  for i in range(0, n, 5)]
+        data = struct.pack('>%dL' % len(groups), *groups)
+        if self.eod:
+            data += self.flush()
+        return data
+
+    def flush(self):
+        """Returns the bytes of the last, incomplete group."""
+        (data, self.buf) = (self.buf, '')
+        if len(data) < 2:
+            return ''
+        # round the group up, as if it was padded with 'u'.
+        b = bytearray(data + 'uuuu')
+        group = ((((b[0] * 85 + b[1]) * 85 + b[2]) * 85 + b[3]) * 85 + b[4] - ASCII85_ZERO) & 0xffffffff
+        return struct.pack('>L', group)[:len(data) - 1]
 
 
 def ascii85decode(data):
@@ -15,10 +68,10 @@ def ascii85decode(data):
     letters, using 85 different types of characters (as 256**4 < 85**5).
     When the length of the original bytes is not a multiple of 4, a special
     rule is used for round up.
-    
+
     The Adobe's ASCII85 implementation is slightly different from
     its original in handling the last characters.
-    
+
     The sample string is taken from:
       http://en.wikipedia.org/w/index.php?title=Ascii85
 
@@ -28,29 +81,45 @@ def ascii85decode(data):
     'pleasure.'
 
     """
-    n = b = 0
-    out = ''
-    for c in data:
-        if '!' <= c <= 'u':
-            n += 1
-            b = b * 85 + (ord(c) - 33)
-            if n == 5:
-                out += struct.pack('>L', b)
-                n = b = 0
-        elif c == 'z':
-            assert n == 0
-            out += '\0\0\0\0'
-        elif c == '~':
-            if n:
-                for _ in range(5 - n):
-                    b = b * 85 + 84
-                out += struct.pack('>L', b)[:n - 1]
-            break
-    return out
-
-
-hex_re = re.compile(r'([a-f\d]{2})', re.IGNORECASE)
-trail_re = re.compile(r'^(?:[a-f\d]{2}|\s)*([a-f\d])[\s>]*$', re.IGNORECASE)
+    decoder = ASCII85Decoder()
+    return decoder.decode(data) + decoder.flush()
+
+
+class ASCIIHexDecoder(object):
+    """Incremental ASCIIHex decoder.
+
+    decode() returns the bytes of the pairs of digits it was given;
+    an odd digit is kept for the next call, or for flush().
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.eod = False
+
+    def decode(self, data):
+        if self.eod:
+            return ''
+        # the data may be a slice of an mmap (a buffer).
+        data = bytes(data)
+        i = data.find('>')
+        if 0 <= i:
+            # '>' is the EOD marker.
+            data = data[:i]
+            self.eod = True
+        data = self.buf + data.translate(None, NON_HEX)
+        n = len(data) - len(data) % 2
+        self.buf = data[n:]
+        data = unhexlify(data[:n])
+        if self.eod:
+            data += self.flush()
+        return data
+
+    def flush(self):
+        """Returns the byte of an odd digit, as if a 0 followed it."""
+        (data, self.buf) = (self.buf, '')
+        if not data:
+            return ''
+        return unhexlify(data + '0')
 
 
 def asciihexdecode(data):
@@ -62,7 +131,7 @@ def asciihexdecode(data):
     EOD. Any other characters will cause an error. If the filter encounters
     the EOD marker after reading an odd number of hexadecimal digits, it
     will behave as if a 0 followed the last digit.
-    
+
     >>> asciihexdecode('61 62 2e6364   65')
     'ab.cde'
     >>> asciihexdecode('61 62 2e6364   657>')
@@ -71,9 +140,5 @@ def asciihexdecode(data):
     'p'
 
     """
-    decode = (lambda hx: chr(int(hx, 16)))
-    out = list(map(decode, hex_re.findall(data)))
-    m = trail_re.search(data)
-    if m:
-        out.append(decode("%c0" % m.group(1)))
-    return ''.join(out)
+    decoder = ASCIIHexDecoder()
+    return decoder.decode(data) + decoder.flush()
@@ -1,6 +1,11 @@
 #!/usr/bin/env python2
 """ CCITT Fax decoder
 
+Codes are looked up TABLE_BITS bits at a time in flat tables, and each
+line is kept as the list of its changing elements: the positions where
+the color changes, starting from white. Lines are painted into the
+output a run at a time.
+
 Bugs: uncompressed mode untested.
 
 cf.
@@ -9,51 +14,41 @@ ITU-T Recommendation T.6 "FACSIMILE CODING SCHEMES AND CODING CONTROL FUNCTIONS
 
 """
 
-import array
+from bisect import bisect_right
+from binascii import unhexlify
+from itertools import groupby
 
 
-class BitParser(object):
+# codes are looked up this many bits at a time: the longest code.
+TABLE_BITS = 13
 
-    def __init__(self):
-        self._pos = 0
+# the modes of the vertical codes: a1 - b1.
+VERTICAL = frozenset(range(-3, 4))
 
-    @classmethod
-    def add(cls, root, v, bits):
-        p = root
-        for i in range(len(bits)):
-            if 0 < i:
-                if p[b] is None:
-                    p[b] = [None, None]
-                p = p[b]
-            if bits[i] == '1':
-                b = 1
-            else:
-                b = 0
-        p[b] = v
 
-    def feedbytes(self, data):
-        for c in data:
-            b = ord(c)
-            for m in (128, 64, 32, 16, 8, 4, 2, 1):
-                self._parse_bit(b & m)
-
-    def _parse_bit(self, x):
-        if x:
-            v = self._state[1]
-        else:
-            v = self._state[0]
-        self._pos += 1
-        if isinstance(v, list):
-            self._state = v
-        else:
-            self._state = self._accept(v)
+def peek(b, pos):
+    """Returns the TABLE_BITS bits of the bytearray b at bit position pos."""
+    i = pos >> 3
+    return ((b[i] << 16 | b[i + 1] << 8 | b[i + 2]) >> (24 - TABLE_BITS - (pos & 7))) & 0x1fff
+
+
+class BitParser(object):
+
+    @classmethod
+    def add(cls, table, v, bits):
+        """Adds the code bits to table, at every index that starts with it."""
+        n = len(bits)
+        shift = TABLE_BITS - n
+        i = int(bits, 2) << shift
+        table[i:i + (1 << shift)] = [(v, n)] * (1 << shift)
 
 
 ##  CCITTG4Parser
 ##
 class CCITTG4Parser(BitParser):
 
-    MODE = [None,None]
+    # EOL (000000000001) is read at the start of each line.
+    MODE = [None] * (1 << TABLE_BITS)
     BitParser.add(MODE, 0,   '1')
     BitParser.add(MODE, +1,  '011')
     BitParser.add(MODE, -1,  '010')
@@ -71,9 +66,8 @@ class CCITTG4Parser(BitParser):
     BitParser.add(MODE, 'x5', '0000001100')
     BitParser.add(MODE, 'x6', '0000001101')
     BitParser.add(MODE, 'x7', '0000001110')
-    BitParser.add(MODE, 'e', '000000000001000000000001')
 
-    WHITE = [None,None]
+    WHITE = [None] * (1 << TABLE_BITS)
     BitParser.add(WHITE, 0   , '00110101')
     BitParser.add(WHITE, 1   , '000111')
     BitParser.add(WHITE, 2   , '0111')
@@ -179,7 +173,7 @@ class CCITTG4Parser(BitParser):
     BitParser.add(WHITE, 2496, '000000011110')
     BitParser.add(WHITE, 2560, '000000011111')
 
-    BLACK = [None,None]
+    BLACK = [None] * (1 << TABLE_BITS)
     BitParser.add(BLACK, 0   , '0000110111')
     BitParser.add(BLACK, 1   , '010')
     BitParser.add(BLACK, 2   , '11')
@@ -285,254 +279,319 @@ class CCITTG4Parser(BitParser):
     BitParser.add(BLACK, 2496, '000000011110')
     BitParser.add(BLACK, 2560, '000000011111')
 
-    UNCOMPRESSED = [None,None]
-    BitParser.add(UNCOMPRESSED, '1', '1')
-    BitParser.add(UNCOMPRESSED, '01', '01')
-    BitParser.add(UNCOMPRESSED, '001', '001')
-    BitParser.add(UNCOMPRESSED, '0001', '0001')
-    BitParser.add(UNCOMPRESSED, '00001', '00001')
-    BitParser.add(UNCOMPRESSED, '00000', '000001')
-    BitParser.add(UNCOMPRESSED, 'T00', '00000011')
-    BitParser.add(UNCOMPRESSED, 'T10', '00000010')
-    BitParser.add(UNCOMPRESSED, 'T000', '000000011')
-    BitParser.add(UNCOMPRESSED, 'T100', '000000010')
-    BitParser.add(UNCOMPRESSED, 'T0000', '0000000011')
-    BitParser.add(UNCOMPRESSED, 'T1000', '0000000010')
-    BitParser.add(UNCOMPRESSED, 'T00000', '00000000011')
-    BitParser.add(UNCOMPRESSED, 'T10000', '00000000010')
-    
-    class EOFB(Exception):
-        pass
+    # T.4 Table 5: the pixels of each code (1 for white and 0 for black),
+    # and for the exit codes, the color of the next run as well.
+    UNCOMPRESSED = [None] * (1 << TABLE_BITS)
+    BitParser.add(UNCOMPRESSED, '0', '1')
+    BitParser.add(UNCOMPRESSED, '10', '01')
+    BitParser.add(UNCOMPRESSED, '110', '001')
+    BitParser.add(UNCOMPRESSED, '1110', '0001')
+    BitParser.add(UNCOMPRESSED, '11110', '00001')
+    BitParser.add(UNCOMPRESSED, '11111', '000001')
+    BitParser.add(UNCOMPRESSED, ('', 1), '00000010')
+    BitParser.add(UNCOMPRESSED, ('', 0), '00000011')
+    BitParser.add(UNCOMPRESSED, ('1', 1), '000000010')
+    BitParser.add(UNCOMPRESSED, ('1', 0), '000000011')
+    BitParser.add(UNCOMPRESSED, ('11', 1), '0000000010')
+    BitParser.add(UNCOMPRESSED, ('11', 0), '0000000011')
+    BitParser.add(UNCOMPRESSED, ('111', 1), '00000000010')
+    BitParser.add(UNCOMPRESSED, ('111', 0), '00000000011')
+    BitParser.add(UNCOMPRESSED, ('1111', 1), '000000000010')
+    BitParser.add(UNCOMPRESSED, ('1111', 0), '000000000011')
 
     class InvalidData(Exception):
         pass
 
-    class ByteSkip(Exception):
-        pass
-
-    def __init__(self, width, bytealign=False):
-        BitParser.__init__(self)
+    def __init__(self, width, bytealign=False, k=-1, rows=0):
+        """k is the K parameter: negative for Group 4, 0 for Group 3
+        one-dimensional, and positive for mixed Group 3, where each
+        line tells whether it is one- or two-dimensional. If rows is
+        not 0, the lines after the first rows are ignored.
+        """
         self.width = width
         self.bytealign = bytealign
+        self.k = k
+        self.rows = rows
         self.reset()
 
     def feedbytes(self, data):
-        for c in data:
-            b = ord(c)
-            try:
-                for m in (128, 64, 32, 16, 8, 4, 2, 1):
-                    self._parse_bit(b & m)
-            except self.ByteSkip:
-                self._accept = self._parse_mode
-                self._state = self.MODE
-            except self.EOFB:
-                break
+        """Decodes the codes that data completes."""
+        # the data may be a slice of an mmap (a buffer).
+        self._data += bytes(data)
+        self._decode(False)
 
-    def _parse_mode(self, mode):
-        if mode == 'p':
-            self._do_pass()
-            self._flush_line()
-            return self.MODE
-        elif mode == 'h':
-            self._n1 = 0
-            self._accept = self._parse_horiz1
-            if self._color:
-                return self.WHITE
+    def close(self):
+        """Decodes what is left of the data."""
+        self._decode(True)
+
+    def _decode(self, final):
+        data = self._data
+        # codes are read three bytes at a time.
+        b = bytearray(data + '\x00\x00\x00\x00')
+        (pos, end) = (self._bitpos, len(data) * 8)
+        while not self._eod:
+            if self._linestart:
+                x = self._start_line(b, pos, end, final)
+                if x is None:
+                    break
+                pos = x
             else:
-                return self.BLACK
-        elif mode == 'u':
-            self._accept = self._parse_uncompressed
-            return self.UNCOMPRESSED
-        elif mode == 'e':
-            raise self.EOFB
-        elif isinstance(mode, int):
-            self._do_vertical(mode)
-            self._flush_line()
-            return self.MODE
-        else:
-            raise self.InvalidData(mode)
-
-    def _parse_horiz1(self, n):
-        if n is None:
-            raise self.InvalidData
-        self._n1 += n
-        if n < 64:
-            self._n2 = 0
-            self._color = 1-self._color
-            self._accept = self._parse_horiz2
-        if self._color:
-            return self.WHITE
-        else:
-            return self.BLACK
-
-    def _parse_horiz2(self, n):
-        if n is None:
-            raise self.InvalidData
-        self._n2 += n
-        if n < 64:
-            self._color = 1 - self._color
-            self._accept = self._parse_mode
-            self._do_horizontal(self._n1, self._n2)
-            self._flush_line()
-            return self.MODE
-        elif self._color:
-            return self.WHITE
-        else:
-            return self.BLACK
-
-    def _parse_uncompressed(self, bits):
-        if not bits:
-            raise self.InvalidData
-        if bits.startswith('T'):
-            self._accept = self._parse_mode            
-            self._color = int(bits[1])
-            self._do_uncompressed(bits[2:])
-            return self.MODE
+                pos = self._decode_line(b, pos, end)
+                if not self._linestart:
+                    # the data ends in the middle of a line.
+                    if final:
+                        self._eod = True
+                    break
+        self._data = data[pos >> 3:]
+        self._bitpos = pos & 7
+
+    def _start_line(self, b, pos, end, final):
+        """Reads what comes before a line: fill bits, an EOL and the tag
+        bit. Returns the position of the line, or None if there are not
+        enough bits yet.
+        """
+        if self.rows and self.rows <= self._y:
+            self._eod = True
+            return None
+        if self.bytealign:
+            pos = (pos + 7) & ~7
+        # skip the fill bits before an EOL.
+        while pos < end and not peek(b, pos) >> 1:
+            pos += 1
+        if not final and end < pos + 25:
+            return None
+        if end <= pos:
+            self._eod = True
+            return None
+        if peek(b, pos) >> 1 == 1:
+            pos += 12
+            # two EOLs in a row end the data (EOFB or RTC).
+            x = peek(b, pos)
+            if (0 < self.k and x == 0x1001) or (self.k <= 0 and x >> 1 == 1):
+                self._eod = True
+                return None
+        if 0 < self.k:
+            # the tag bit: 1 for a one-dimensional line.
+            self._twod = not (peek(b, pos) >> (TABLE_BITS - 1))
+            pos += 1
+        self._linestart = False
+        return pos
+
+    def _decode_line(self, b, pos, end):
+        """Decodes the codes of the current line, up to its end or the
+        last complete code. Returns the position after them.
+
+        The state of the line is kept in locals while decoding: the
+        changes of the reference line (ref) and of the current line
+        (line), the position of a0 and the current color.
+        """
+        mode_table = self.MODE
+        width = self.width
+        (ref, line, a0, color) = (self._refline, self._curline, self._curpos, self._color)
+        fail = None
+        # the runs of uncompressed mode, last first.
+        runs = []
+        while a0 < width:
+            n2 = None
+            if runs:
+                (color, n) = runs.pop()
+                mode = 'u'
+                x1 = (a0 if 0 < a0 else 0) + n
+            elif self._twod:
+                start = pos
+                i = pos >> 3
+                e = mode_table[((b[i] << 16 | b[i + 1] << 8 | b[i + 2]) >> (24 - TABLE_BITS - (pos & 7))) & 0x1fff]
+                if e is None:
+                    fail = pos
+                    break
+                (mode, n) = e
+                pos += n
+                if mode in VERTICAL or mode == 'p':
+                    # b1 is the first change past a0 to the opposite
+                    # color; the changes to black have even indexes.
+                    i = bisect_right(ref, a0)
+                    if (i & 1) == color:
+                        i += 1
+                    if mode == 'p':
+                        x1 = ref[i + 1]
+                    else:
+                        x1 = ref[i] + mode
+                elif mode == 'h':
+                    (n1, pos) = self._read_run(b, pos, end, color)
+                    if n1 is not None:
+                        (n2, pos) = self._read_run(b, pos, end, 1 - color)
+                    if n2 is None:
+                        fail = pos
+                        break
+                    x1 = (a0 if 0 < a0 else 0) + n1
+                elif mode == 'u':
+                    (v, pos) = self._read_uncompressed(b, pos, end)
+                    if v is None or end < pos:
+                        fail = pos
+                        break
+                    # the pixels are painted a run at a time, then the
+                    # exit code gives the color of the next run.
+                    (exit_color, pixels) = v
+                    runs = [(int(c), len(list(g))) for (c, g) in groupby(pixels)][::-1]
+                    if not runs:
+                        color = exit_color
+                    continue
+                else:
+                    raise self.InvalidData(mode)
+            else:
+                start = pos
+                # one-dimensional: a run of the current color.
+                (n, pos) = self._read_run(b, pos, end, color)
+                if n is None:
+                    fail = pos
+                    break
+                mode = 'r'
+                x1 = (a0 if 0 < a0 else 0) + n
+            if end < pos:
+                fail = pos
+                break
+            # paint from a0 up to x1 with color. The line is white from
+            # x0 on if it has an even number of changes.
+            x0 = a0 if 0 < a0 else 0
+            if (len(line) & 1) == color:
+                if line and line[-1] == x0:
+                    line.pop()
+                else:
+                    line.append(x0)
+            if width < x1:
+                x1 = width
+            a0 = x1 if x0 < x1 else x0
+            if n2 is not None:
+                # then the run of the other color.
+                if line and line[-1] == a0:
+                    line.pop()
+                else:
+                    line.append(a0)
+                a0 += n2
+                if width < a0:
+                    a0 = width
+            elif mode == 'u':
+                if not runs:
+                    color = exit_color
+            elif mode != 'p':
+                color = 1 - color
+        (self._curline, self._curpos, self._color) = (line, a0, color)
+        if fail is not None:
+            if fail + TABLE_BITS <= end:
+                raise self.InvalidData(peek(b, fail))
+            return start
+        self._flush_line()
+        return pos
+
+    def _read_run(self, b, pos, end, color):
+        """Reads the codes of a run of color: makeup codes, then a
+        terminating code. Returns (length, pos), or (None, pos) at an
+        invalid code.
+        """
+        if color:
+            table = self.WHITE
         else:
-            self._do_uncompressed(bits)
-            return self.UNCOMPRESSED
+            table = self.BLACK
+        n = 0
+        while pos <= end:
+            e = table[peek(b, pos)]
+            if e is None:
+                return (None, pos)
+            pos += e[1]
+            n += e[0]
+            if e[0] < 64:
+                break
+        return (n, pos)
+
+    def _read_uncompressed(self, b, pos, end):
+        """Reads the codes of uncompressed mode, up to its exit code.
+        Returns ((color, pixels), pos), or (None, pos) at an invalid code.
+        """
+        pixels = []
+        while pos <= end:
+            e = self.UNCOMPRESSED[peek(b, pos)]
+            if e is None:
+                return (None, pos)
+            pos += e[1]
+            if isinstance(e[0], tuple):
+                (bits, color) = e[0]
+                pixels.append(bits)
+                return ((color, ''.join(pixels)), pos)
+            pixels.append(e[0])
+        return (None, pos)
+
+    def _get_line(self, changes):
+        bits = ['1'] * self.width
+        for (x0, x1) in zip(changes[::2], changes[1::2] + [self.width]):
+            bits[x0:x1] = ['0'] * (x1 - x0)
+        return ''.join(bits)
 
     def _get_bits(self):
-        return ''.join(str(b) for b in self._curline[:self._curpos])
-
-    def _get_refline(self, i):
-        if i < 0:
-            return '[]'+''.join(str(b) for b in self._refline)
-        elif len(self._refline) <= i:
-            return ''.join(str(b) for b in self._refline)+'[]'
-        else:
-            return (''.join(str(b) for b in self._refline[:i]) +
-                    '[' + str(self._refline[i]) + ']' +
-                    ''.join(str(b) for b in self._refline[i + 1:]))
+        return self._get_line(self._curline)[:max(0, self._curpos)]
 
     def reset(self):
         self._y = 0
-        self._curline = array.array('b', [1] * self.width)
+        self._curline = []
         self._reset_line()
-        self._accept = self._parse_mode
-        self._state = self.MODE
+        self._data = ''
+        self._bitpos = 0
+        self._twod = self.k < 0
+        self._eod = False
+
+    def output_line(self, y, changes):
+        print(y, self._get_line(changes))
 
-    def output_line(self, y, bits):
-        print(y, ''.join(str(b) for b in bits))
-    
     def _reset_line(self):
-        self._refline = self._curline
-        self._curline = array.array('b', [1] * self.width)
+        # the sentinels stand for the changes past the end of the line.
+        self._refline = self._curline + [self.width] * 3
+        self._curline = []
         self._curpos = -1
         self._color = 1
-        
+        self._linestart = True
+
     def _flush_line(self):
-        if self.width <= self._curpos:
-            self.output_line(self._y, self._curline)
-            self._y += 1
-            self._reset_line()
-            if self.bytealign:
-                raise self.ByteSkip
-
-    def _do_vertical(self, dx):
-        #print '* vertical(%d): curpos=%r, color=%r' % (dx, self._curpos, self._color)
-        #print '  refline:', self._get_refline(self._curpos+1)
-        x1 = self._curpos + 1
-        while 1:
-            if x1 == 0:
-                if self._color == 1 and self._refline[x1] != self._color:
-                    break
-            elif x1 == len(self._refline):
-                break
-            elif self._refline[x1 - 1] == self._color and self._refline[x1] != self._color:
-                break
-            x1 += 1
-        x1 += dx
-        x0 = max(0, self._curpos)
-        x1 = max(0, min(self.width, x1))
-        if x1 < x0:
-            for x in range(x1, x0):
-                self._curline[x] = self._color
-        elif x0 < x1:
-            for x in range(x0, x1):
-                self._curline[x] = self._color
-        self._curpos = x1
-        self._color = 1 - self._color
-    
-    def _do_pass(self):
-        #print '* pass: curpos=%r, color=%r' % (self._curpos, self._color)
-        #print '  refline:', self._get_refline(self._curpos+1)
-        x1 = self._curpos + 1
-        while 1:
-            if x1 == 0:
-                if self._color == 1 and self._refline[x1] != self._color:
-                    break
-            elif x1 == len(self._refline):
-                break
-            elif self._refline[x1 - 1] == self._color and self._refline[x1] != self._color:
-                break
-            x1 += 1
-        while 1:
-            if x1 == 0:
-                if self._color == 0 and self._refline[x1] == self._color:
-                    break
-            elif x1 == len(self._refline):
-                break
-            elif self._refline[x1 - 1] != self._color and self._refline[x1] == self._color:
-                break
-            x1 += 1
-        for x in range(self._curpos, x1):
-            self._curline[x] = self._color
-        self._curpos = x1
-    
-    def _do_horizontal(self, n1, n2):
-        #print '* horizontal(%d,%d): curpos=%r, color=%r' % (n1, n2, self._curpos, self._color)
-        if self._curpos < 0:
-            self._curpos = 0
-        x = self._curpos
-        for _ in range(n1):
-            if len(self._curline) <= x:
-                break
-            self._curline[x] = self._color
-            x += 1
-        for _ in range(n2):
-            if len(self._curline) <= x:
-                break
-            self._curline[x] = 1 - self._color
-            x += 1
-        self._curpos = x
-    
-    def _do_uncompressed(self, bits):
-        #print '* uncompressed(%r): curpos=%r' % (bits, self._curpos)
-        for c in bits:
-            self._curline[self._curpos] = int(c)
-            self._curpos += 1
-            self._flush_line()
+        self.output_line(self._y, self._curline)
+        self._y += 1
+        self._reset_line()
 
 
 class CCITTFaxDecoder(CCITTG4Parser):
-    
-    def __init__(self, width, bytealign=False, reversed=False):
-        CCITTG4Parser.__init__(self, width, bytealign=bytealign)
+    """Decodes the lines into a bitmap, one bit per pixel. Unless
+    reversed (BlackIs1), the black pixels are 0.
+    """
+
+    def __init__(self, width, bytealign=False, reversed=False, k=-1, rows=0):
+        CCITTG4Parser.__init__(self, width, bytealign=bytealign, k=k, rows=rows)
         self.reversed = reversed
-        self._buf = ''
-    
+        self._rowsize = (width + 7) // 8
+        # the pixels of a row are the bits of an integer, padded to bytes.
+        self._nbits = self._rowsize * 8
+        self._white = (1 << self._nbits) - (1 << (self._nbits - width))
+        self._bitmap = bytearray(self._rowsize * rows)
+
     def close(self):
-        return self._buf
-    
-    def output_line(self, y, bits):
-        thebytes = array.array('B', [0] * ((len(bits) + 7) / 8))
-        if self.reversed:
-            bits = [1-b for b in bits]
-        for (i, b) in enumerate(bits):
-            if b:
-                thebytes[i / 8] += (128, 64, 32, 16, 8, 4, 2, 1)[i % 8]
-        self._buf += thebytes.tostring()
+        CCITTG4Parser.close(self)
+        return bytes(self._bitmap[:self._y * self._rowsize])
+
+    def output_line(self, y, changes):
+        nbits = self._nbits
+        bits = 0
+        for (x0, x1) in zip(changes[::2], changes[1::2] + [self.width]):
+            bits += (1 << (nbits - x0)) - (1 << (nbits - x1))
+        if not self.reversed:
+            bits ^= self._white
+        i = y * self._rowsize
+        if len(self._bitmap) < i + self._rowsize:
+            self._bitmap.extend(bytearray(max(self._rowsize, len(self._bitmap))))
+        self._bitmap[i:i + self._rowsize] = unhexlify('%0*x' % (self._rowsize * 2, bits))
 
 
 def ccittfaxdecode(data, params):
-    K = params.get('K')
-    cols = params.get('Columns')
-    bytealign = params.get('EncodedByteAlign')
-    isreversed = params.get('BlackIs1')
-    if K == -1:
-        parser = CCITTFaxDecoder(cols, bytealign=bytealign, reversed=isreversed)
-    else:
-        raise ValueError(K)
+    K = params.get('K', 0)
+    cols = params.get('Columns', 1728)
+    rows = params.get('Rows', 0)
+    bytealign = params.get('EncodedByteAlign', False)
+    isreversed = params.get('BlackIs1', False)
+    parser = CCITTFaxDecoder(cols, bytealign=bytealign, reversed=isreversed, k=K, rows=rows)
     parser.feedbytes(data)
     return parser.close()
@@ -256,9 +256,7 @@ class CMapParser(PSStackParser):
         self._in_cmap = False
 
     def run(self):
-        try:
-            self.nextobject()
-        except PSEOF:
+        for _ in self.iterobjects():
             pass
 
     def do_keyword(self, pos, token):
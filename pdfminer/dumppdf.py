@@ -24,7 +24,7 @@ import os
 import sys
 import re
 
-from pdfminer.psparser import PSKeyword, PSLiteral
+from pdfminer.psparser import PSKeyword, PSLiteral, literal_name
 from pdfminer.pdfparser import PDFDocument, PDFParser, PDFNoOutlines
 from pdfminer.pdftypes import PDFStream, PDFObjRef, resolve1, stream_value
 
@@ -121,37 +121,31 @@ def dumpallobjs(out, doc, codec=None):
     out.write('</pdf>')
 
 
-def dumpoutline(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None):
+def dumpoutline(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None, use_mmap=False):
     doc = PDFDocument()
-    parser = PDFParser(fp)
+    parser = PDFParser(fp, use_mmap=use_mmap)
     parser.set_document(doc)
     doc.set_parser(parser)
     doc.initialize(password)
-    pages = dict((page.pageid, pageno) for (pageno,page) in enumerate(doc.get_pages()))
-
-    def resolve_dest(dest):
-        if isinstance(dest, str):
-            dest = resolve1(doc.get_dest(dest))
-        elif isinstance(dest, PSLiteral):
-            dest = resolve1(doc.get_dest(dest.name))
-        if isinstance(dest, dict):
-            dest = dest['D']
-        return dest
+    pages = None
     try:
         outlines = doc.get_outlines()
         outfp.write('<outlines>\n')
         for (level, title, dest, a, se) in outlines:
             pageno = None
-            if dest:
-                dest = resolve_dest(dest)
-                pageno = pages[dest[0].objid]
-            elif a:
-                action = a.resolve()
-                if isinstance(action, dict):
-                    subtype = action.get('S')
-                    if subtype and repr(subtype) == '/GoTo' and action.get('D'):
-                        dest = resolve_dest(action['D'])
-                        pageno = pages[dest[0].objid]
+            if dest is None and a:
+                action = resolve1(a)
+                if isinstance(action, dict) and literal_name(action.get('S')) == 'GoTo':
+                    dest = action.get('D')
+            if dest is not None:
+                dest = doc.resolve_dest(dest)
+                if dest and isinstance(dest[0], PDFObjRef):
+                    if pages is None:
+                        pages = doc.get_page_numbers()
+                    pageno = pages.get(dest[0].objid)
+                elif dest and isinstance(dest[0], int) and not isinstance(dest[0], bool):
+                    # a page number, as in remote destinations.
+                    pageno = dest[0]
             s = e(title).encode('utf-8', 'xmlcharrefreplace')
             outfp.write('<outline level="%r" title="%s">\n' % (level, s))
             if dest is not None:
@@ -168,9 +162,9 @@ def dumpoutline(outfp, fp, objids, pagenos, password='', dumpall=False, codec=No
     fp.close()
 
 
-def extractembedded(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None):
+def extractembedded(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None, use_mmap=False):
     doc = PDFDocument()
-    parser = PDFParser(fp)
+    parser = PDFParser(fp, use_mmap=use_mmap)
     parser.set_document(doc)
     doc.set_parser(parser)
     doc.initialize(password)
@@ -204,11 +198,12 @@ def extractembedded(outfp, fp, objids, pagenos, password='', dumpall=False, code
                     f = os.fdopen(fd, 'wb')
                     f.write(fileobj.get_data())
                     f.close()
+    parser.close()
 
 
-def dumppdf(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None):
+def dumppdf(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None, use_mmap=False):
     doc = PDFDocument()
-    parser = PDFParser(fp)
+    parser = PDFParser(fp, use_mmap=use_mmap)
     parser.set_document(doc)
     doc.set_parser(parser)
     doc.initialize(password)
@@ -217,18 +212,22 @@ def dumppdf(outfp, fp, objids, pagenos, password='', dumpall=False, codec=None):
             obj = doc.getobj(objid)
             dumpxml(outfp, obj, codec=codec)
     if pagenos:
-        for (pageno, page) in enumerate(doc.get_pages()):
-            if pageno in pagenos:
-                if codec:
-                    for obj in page.contents:
-                        obj = stream_value(obj)
-                        dumpxml(outfp, obj, codec=codec)
-                else:
-                    dumpxml(outfp, page.attrs)
+        for pageno in sorted(set(pagenos)):
+            try:
+                page = doc.get_page(pageno)
+            except IndexError:
+                continue
+            if codec:
+                for obj in page.contents:
+                    obj = stream_value(obj)
+                    dumpxml(outfp, obj, codec=codec)
+            else:
+                dumpxml(outfp, page.attrs)
     if dumpall:
         dumpallobjs(outfp, doc, codec=codec)
     if (not objids) and (not pagenos) and (not dumpall):
         dumptrailers(outfp, doc)
+    parser.close()
     fp.close()
     if codec not in ('raw', 'binary'):
         outfp.write('\n')
@@ -248,6 +247,7 @@ def main(argv=None):
     parser.add_argument('-i', metavar='objid', nargs='+', default=[],  type=int, help='object id(s) (space separated)')
     parser.add_argument('-o', metavar='outfile', type=argparse.FileType('wb'), default=sys.stdout,
                         help='output file name (default: stdout)')
+    parser.add_argument('--mmap', action='store_true', help='memory-map the files instead of reading them')
     args = parser.parse_args(argv)
 
     logging.basicConfig()
@@ -260,7 +260,7 @@ def main(argv=None):
         proc = extractembedded
         os.chdir(args.E)
     for fp in args.file:
-        proc(args.o, fp, args.i, [i-1 for i in args.p], args.P, args.dumpall, args.c)
+        proc(args.o, fp, args.i, [i-1 for i in args.p], args.P, args.dumpall, args.c, use_mmap=args.mmap)
         pass
 
 
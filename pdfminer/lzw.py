@@ -1,10 +1,11 @@
 #!/usr/bin/env python2
+""" Python implementation of the LZW decoder (PDF Reference 3.3.3).
+
+This code is in the public domain.
+
+"""
 
 import logging
-try:
-    from io import StringIO
-except ImportError:
-    from io import StringIO
 
 
 log = logging.getLogger('pdfminer.lzw')
@@ -15,91 +16,97 @@ class CorruptDataError(Exception):
 
 
 class LZWDecoder(object):
+    """Incremental LZW decoder.
+
+    Each call to decode() returns what the given data adds to the
+    output; the codes that cross the end of the data are kept until
+    the next call. early is the EarlyChange parameter: whether the
+    code width grows one code early.
 
-    def __init__(self, fp):
+    Codes are taken from the data a few bytes at a time, and the table
+    keeps every string it knows, so that each code is one lookup and
+    one copy. After a corrupt code or the end-of-data code, the rest
+    of the input is ignored.
+
+    A decoder given a file object fp can also decode all of it with
+    run(), as the previous decoder did.
+    """
+
+    def __init__(self, fp=None, early=1):
         self.fp = fp
-        self.buff = 0
-        self.bpos = 8
-        self.nbits = 9
-        self.table = None
+        self.early = early
+        self.table = [chr(c) for c in range(256)] + [None, None]
         self.prevbuf = None
+        self.nbits = 9
+        self.buf = ''
+        self.bitpos = 0
+        self.eod = False
 
-    def readbits(self, bits):
-        v = 0
-        while 1:
-            # the number of remaining bits we can get from the current buffer.
-            r = 8 - self.bpos
-            if bits <= r:
-                # |-----8-bits-----|
-                # |-bpos-|-bits-|  |
-                # |      |----r----|
-                v = (v << bits) | ((self.buff >> (r - bits)) & ((1 << bits) - 1))
-                self.bpos += bits
-                break
-            else:
-                # |-----8-bits-----|
-                # |-bpos-|---bits----...
-                # |      |----r----|
-                v = (v << r) | (self.buff & ((1 << r) - 1))
-                bits -= r
-                x = self.fp.read(1)
-                if not x:
-                    raise EOFError
-                self.buff = ord(x)
-                self.bpos = 0
-        return v
-
-    def feed(self, code):
-        x = ''
-        if code == 256:
-            self.table = [chr(c) for c in range(256)]  # 0-255
-            self.table.append(None)  # 256
-            self.table.append(None)  # 257
-            self.prevbuf = ''
-            self.nbits = 9
-        elif code == 257:
-            pass
-        elif not self.prevbuf:
-            try:
-                x = self.prevbuf = self.table[code]
-            except (TypeError, IndexError):
-                # TypeError: table is None
-                raise CorruptDataError()
-        else:
-            if code < len(self.table):
-                x = self.table[code]
-                self.table.append(self.prevbuf + x[0])
-            elif code == len(self.table):
-                self.table.append(self.prevbuf + self.prevbuf[0])
-                x = self.table[code]
+    def decode(self, data):
+        if self.eod:
+            return ''
+        # the data may be a slice of an mmap (a buffer).
+        data = self.buf + bytes(data)
+        # codes are read three bytes at a time.
+        b = bytearray(data + '\x00\x00')
+        nbits = self.nbits
+        mask = (1 << nbits) - 1
+        grow = (1 << nbits) - self.early
+        table = self.table
+        tablelen = len(table)
+        prevbuf = self.prevbuf
+        (pos, end) = (self.bitpos, len(data) * 8)
+        out = []
+        append = out.append
+        while pos + nbits <= end:
+            i = pos >> 3
+            code = ((b[i] << 16 | b[i + 1] << 8 | b[i + 2]) >> (24 - nbits - (pos & 7))) & mask
+            pos += nbits
+            if 257 < code < tablelen or code < 256:
+                x = table[code]
+                if prevbuf is not None and tablelen < 4096:
+                    table.append(prevbuf + x[0])
+                    tablelen += 1
+            elif code == 256:
+                del table[258:]
+                tablelen = 258
+                (nbits, mask, grow) = (9, 511, 512 - self.early)
+                prevbuf = None
+                continue
+            elif code == tablelen and prevbuf is not None:
+                x = prevbuf + prevbuf[0]
+                table.append(x)
+                tablelen += 1
             else:
-                raise CorruptDataError()
-            l = len(self.table)
-            if l == 511:
-                self.nbits = 10
-            elif l == 1023:
-                self.nbits = 11
-            elif l == 2047:
-                self.nbits = 12
-            self.prevbuf = x
-        return x
+                # 257 (end of data), or corrupt data.
+                if code != 257:
+                    log.debug('corrupt code: %d, tablelen=%d', code, tablelen)
+                self.eod = True
+                break
+            append(x)
+            prevbuf = x
+            if grow <= tablelen and nbits < 12:
+                nbits += 1
+                mask = (1 << nbits) - 1
+                grow = (1 << nbits) - self.early
+        (self.nbits, self.prevbuf) = (nbits, prevbuf)
+        (self.buf, self.bitpos) = (data[pos >> 3:], pos & 7)
+        return ''.join(out)
+
+    def flush(self):
+        # the bits left over can only be padding.
+        return ''
 
     def run(self):
-        while 1:
-            try:
-                code = self.readbits(self.nbits)
-            except EOFError:
-                break
-            #x = self.feed(code)
-            try:
-                x = self.feed(code)
-            except CorruptDataError:
-                # just ignore corrupt data and stop yielding there
+        """Yields the decoded data of fp in pieces."""
+        while not self.eod:
+            data = self.fp.read(4096)
+            if not data:
                 break
-            yield x
-            log.debug('nbits=%d, code=%d, output=%r, table=%r', self.nbits, code, x, self.table)
+            x = self.decode(data)
+            if x:
+                yield x
 
 
-def lzwdecode(data):
-    fp = StringIO(data)
-    return ''.join(LZWDecoder(fp).run())
+def lzwdecode(data, early=1):
+    return LZWDecoder(early=early).decode(data)
@@ -28,6 +28,7 @@ import logging
 import sys
 
 from pdfminer.pdfinterp import PDFResourceManager, process_pdf
+from pdfminer.pdfparser import PDFLRUObjCache
 from pdfminer.pdfdevice import TagExtractor
 from pdfminer.converter import XMLConverter, HTMLConverter, TextConverter
 from pdfminer.layout import LAParams
@@ -38,6 +39,11 @@ def main(argv=None):
     parser = argparse.ArgumentParser(description='Convert PDF into text.')
     parser.add_argument('file', nargs='*', type=argparse.FileType('rb'), default=sys.stdin, help='file(s) to convert')
     parser.add_argument('-C', '--nocache', dest='cache', action='store_false', help='prevent object caching (slower)')
+    parser.add_argument('-K', '--cachesize', metavar='megabytes', type=float,
+                        help='limit the memory used by object caching (in MB)')
+    parser.add_argument('-X', metavar='directory', dest='cachedir',
+                        help='keep the XRefs of the files in directory (faster reopening)')
+    parser.add_argument('--mmap', action='store_true', help='memory-map the files instead of reading them')
     parser.add_argument('-l', metavar='level', default='warn', help='logging level (warn, info, debug)')
     parser.add_argument('-p', metavar='page', nargs='+', default=[], type=int, help='page number(s) (space separated)')
     parser.add_argument('-m', metavar='maxpages', default=0, type=int, help='maximum number of pages to extract')
@@ -97,8 +103,13 @@ def main(argv=None):
     else:
         device = TextConverter(rsrcmgr, args.o, codec=args.c, laparams=laparams, imagewriter=args.O)
     for fp in args.file:
+        objcache = None
+        if args.cachesize:
+            objcache = PDFLRUObjCache(maxbytes=int(args.cachesize * 1048576))
+        # with a memory limit, the streams are only read when they are used.
         process_pdf(rsrcmgr, device, fp, [i-1 for i in args.p], maxpages=args.m, password=args.P,
-                    caching=args.cache, check_extractable=True)
+                    caching=args.cache, check_extractable=True, cachedir=args.cachedir, objcache=objcache,
+                    use_mmap=args.mmap, lazy_streams=bool(args.cachesize))
         fp.close()
     device.close()
     if args.o is not sys.stdout:
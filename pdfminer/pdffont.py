@@ -94,11 +94,7 @@ class Type1FontHeaderParser(PSStackParser):
         self._cid2unicode = {}
 
     def get_encoding(self):
-        while 1:
-            try:
-                (cid,name) = self.nextobject()
-            except PSEOF:
-                break
+        for (cid, name) in self.iterobjects():
             try:
                 self._cid2unicode[cid] = name2unicode(name)
             except KeyError:
@@ -184,8 +184,54 @@ class PDFResourceManager(object):
         return font
 
 
+class PDFStreamReader(object):
+    """A file over the decoded data of a stream, decoded as it is read.
+
+    Only what was returned by the last read() and what has not been
+    read yet are kept, so it can seek back only that far.
+    """
+
+    def __init__(self, strm, chunk_size, cache_size=0):
+        self.chunks = strm.iter_decoded(chunk_size, cache_size)
+        self.buf = ''
+        self.bufpos = 0
+        self.markpos = 0
+        self.pos = 0
+
+    def __repr__(self):
+        return '<PDFStreamReader: pos=%d>' % self.pos
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos):
+        if pos < self.bufpos:
+            raise IOError('Cannot seek back to %d' % pos)
+        self.pos = pos
+
+    def read(self, n=-1):
+        self.markpos = self.pos
+        while n < 0 or len(self.buf) < self.pos - self.bufpos + n:
+            data = next(self.chunks, None)
+            if data is None:
+                break
+            # forget what is before the last read.
+            i = min(self.markpos - self.bufpos, len(self.buf))
+            (self.buf, self.bufpos) = (self.buf[i:] + data, self.bufpos + i)
+        i = self.pos - self.bufpos
+        data = self.buf[i:] if n < 0 else self.buf[i:i + n]
+        self.pos += len(data)
+        return data
+
+
 class PDFContentParser(PSStackParser):
 
+    # Content streams are decoded this many bytes at a time, and
+    # the ones that decode to no more than STREAM_CACHE_SIZE bytes
+    # are kept for the next time they are drawn.
+    STREAM_CHUNK_SIZE = 65536
+    STREAM_CACHE_SIZE = 1048576
+
     def __init__(self, streams):
         self.streams = streams
         self.istream = 0
@@ -198,7 +244,10 @@ class PDFContentParser(PSStackParser):
                 self.istream += 1
             else:
                 raise PSEOF('Unexpected EOF, file truncated?')
-            self.fp = StringIO(strm.get_data())
+            if strm.data is not None:
+                self.fp = StringIO(strm.data)
+            else:
+                self.fp = PDFStreamReader(strm, self.STREAM_CHUNK_SIZE, self.STREAM_CACHE_SIZE)
 
     def seek(self, pos):
         self.fillfp()
@@ -729,6 +778,11 @@ class PDFPageInterpreter(object):
         self.device.begin_page(page, ctm)
         self.render_contents(page.resources, page.contents, ctm=ctm)
         self.device.end_page(page)
+        # the contents are seldom used again; drop them if they can be reread.
+        for stream in page.contents:
+            stream = resolve1(stream)
+            if isinstance(stream, PDFStream):
+                stream.release()
 
     def render_contents(self, resources, streams, ctm=MATRIX_IDENTITY):
         """Render the content streams. This method may be called recursively. """
@@ -743,11 +797,7 @@ class PDFPageInterpreter(object):
         except PSEOF:
             # empty page
             return
-        while 1:
-            try:
-                (_, obj) = parser.nextobject()
-            except PSEOF:
-                break
+        for (_, obj) in parser.iterobjects():
             if isinstance(obj, PSKeyword):
                 name = keyword_name(obj)
                 method = 'do_%s' % name.replace('*', '_a').replace('"', '_w').replace("'", '_q')
@@ -772,26 +822,39 @@ class PDFTextExtractionNotAllowed(PDFInterpreterError):
     pass
 
 
-def process_pdf(rsrcmgr, device, fp, pagenos=None, maxpages=0, password='', caching=True, check_extractable=True):
+def process_pdf(rsrcmgr, device, fp, pagenos=None, maxpages=0, password='', caching=True, check_extractable=True,
+                cachedir=None, objcache=None, use_mmap=False, lazy_streams=False):
     # Create a PDF parser object associated with the file object.
-    parser = PDFParser(fp)
-    # Create a PDF document object that stores the document structure.
-    doc = PDFDocument(caching=caching)
-    # Connect the parser and document objects.
-    parser.set_document(doc)
-    doc.set_parser(parser)
-    # Supply the document password for initialization.
-    # (If no password is set, give an empty string.)
-    doc.initialize(password)
-    # Check if the document allows text extraction. If not, abort.
-    if check_extractable and not doc.is_extractable:
-        raise PDFTextExtractionNotAllowed('Text extraction is not allowed: %r' % fp)
-    # Create a PDF interpreter object.
-    interpreter = PDFPageInterpreter(rsrcmgr, device)
-    # Process each page contained in the document.
-    for (pageno, page) in enumerate(doc.get_pages()):
-        if pagenos and (pageno not in pagenos):
-            continue
-        interpreter.process_page(page)
-        if maxpages and maxpages <= pageno + 1:
-            break
+    with PDFParser(fp, use_mmap=use_mmap, lazy_streams=lazy_streams) as parser:
+        # Create a PDF document object that stores the document structure.
+        doc = PDFDocument(caching=caching, cachedir=cachedir, objcache=objcache)
+        # Connect the parser and document objects.
+        parser.set_document(doc)
+        doc.set_parser(parser)
+        # Supply the document password for initialization.
+        # (If no password is set, give an empty string.)
+        doc.initialize(password)
+        # Check if the document allows text extraction. If not, abort.
+        if check_extractable and not doc.is_extractable:
+            raise PDFTextExtractionNotAllowed('Text extraction is not allowed: %r' % fp)
+        # Create a PDF interpreter object.
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        # Process each page contained in the document.
+        if pagenos:
+            # fetch the requested pages only. as when they are all
+            # walked, stop after processing the page number maxpages.
+            for pageno in sorted(set(pagenos)):
+                if pageno < 0:
+                    continue
+                try:
+                    page = doc.get_page(pageno)
+                except IndexError:
+                    break
+                interpreter.process_page(page)
+                if maxpages and maxpages <= pageno + 1:
+                    break
+            return
+        for (pageno, page) in enumerate(doc.get_pages()):
+            interpreter.process_page(page)
+            if maxpages and maxpages <= pageno + 1:
+                break
@@ -1,27 +1,71 @@
 #!/usr/bin/env python2
 
+import copy
 import logging
+import mmap
+import os
 import re
+import stat
 import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import count
 try:
     import hashlib as md5
+    from hashlib import sha256, sha384, sha512
 except ImportError:
     import md5
+    sha256 = sha384 = sha512 = None
 try:
     from io import StringIO
 except ImportError:
     from io import StringIO
 
-from .arcfour import Arcfour
-from .pdftypes import PDFException, PDFTypeError, PDFNotImplementedError, PDFStream, PDFObjRef
+from .arcfour import Arcfour, xor_bytes
+from .pdftypes import PDFException, PDFTypeError, PDFNotImplementedError, PDFStream, PDFObjRef, LITERAL_CRYPT
 from .pdftypes import dict_value, int_value, list_value, str_value, stream_value, resolve1, decipher_all
-from .psparser import handle_error, KWD, literal_name, LIT, PSEOF, PSStackParser, PSSyntaxError
-from .utils import cached_property, choplist, decode_text, nunpack, ObjIdRange
+from .psparser import handle_error, KWD, literal_name, LIT, PSEOF, PSException, PSLiteral
+from .psparser import PSStackParser, PSSyntaxError
+from .rijndael import RijndaelDecryptor, RijndaelEncryptor
+from .utils import cached_property, cached_slot, choplist, decode_text, nunpack, ObjIdRange
 from .xmp import xmpparse
 
 
 log = logging.getLogger('pdfminer.pdfparser')
 
+try:
+    array('q')
+    _INT64 = 'q'
+except ValueError:
+    # Python 2 has no 'q' arrays; 'l' is 64 bits on LP64 systems.
+    _INT64 = 'l'
+
+try:
+    _bufslice = buffer
+except NameError:
+    # Python 3
+    def _bufslice(obj, offset, size):
+        return memoryview(obj)[offset:offset + size]
+
+if hasattr(array, 'tobytes'):
+    def _tobytes(a):
+        return a.tobytes()
+
+    def _frombytes(typecode, data):
+        a = array(typecode)
+        a.frombytes(data)
+        return a
+else:
+    # Python 2
+    def _tobytes(a):
+        return a.tostring()
+
+    def _frombytes(typecode, data):
+        return array(typecode, data)
+
 
 class PDFSyntaxError(PDFException):
     pass
@@ -53,6 +97,7 @@ LITERAL_XREF = LIT('XRef')
 LITERAL_PAGE = LIT('Page')
 LITERAL_PAGES = LIT('Pages')
 LITERAL_CATALOG = LIT('Catalog')
+LITERAL_METADATA = LIT('Metadata')
 
 
 class PDFBaseXRef(object):
@@ -66,11 +111,21 @@ class PDFBaseXRef(object):
     def get_pos(self, objid):
         raise KeyError(objid)
 
+    def get_entries(self):
+        """Yields (objid, strmid, index) for every object in use."""
+        for objid in self.get_objids():
+            try:
+                (strmid, index) = self.get_pos(objid)
+            except KeyError:
+                continue
+            yield (objid, strmid, index)
+
 
 class PDFXRef(PDFBaseXRef):
     
     def __init__(self):
         self.offsets = {}
+        self.streamed = {}
         self.trailer = {}
 
     def load(self, parser):
@@ -93,6 +148,8 @@ class PDFXRef(PDFBaseXRef):
                 (start, nobjs) = list(map(int, f))
             except ValueError:
                 raise PDFNoValidXRef('Invalid line: %r: line=%r' % (parser, line))
+            if self.load_entries(parser, start, nobjs):
+                continue
             for objid in range(start, start + nobjs):
                 try:
                     (_, line) = parser.nextline()
@@ -108,6 +165,30 @@ class PDFXRef(PDFBaseXRef):
         log.info('xref objects: %r', self.offsets)
         self.load_trailer(parser)
 
+    XREF_ENTRIES = re.compile(r'(?:\d{10} \d{5} [fn](?: \r| \n|\r\n))*\Z')
+
+    def load_entries(self, parser, start, nobjs):
+        """Reads a subsection of nobjs entries in one go.
+
+        This only works when every entry is exactly 20 bytes long, as
+        the spec says. Otherwise it returns False, leaving the parser
+        where it was, and the entries are read line by line.
+        """
+        pos = parser.tell()
+        parser.fp.seek(pos)
+        data = parser.fp.read(nobjs * 20)
+        if len(data) != nobjs * 20 or not self.XREF_ENTRIES.match(data):
+            parser.seek(pos)
+            return False
+        # "offset genno n|f" for each entry.
+        f = data.split()
+        entries = zip(count(start), zip(list(map(int, f[1::3])), list(map(int, f[0::3]))))
+        if 'f' in data:
+            entries = [entry for (entry, use) in zip(entries, f[2::3]) if use == 'n']
+        self.offsets.update(entries)
+        parser.seek(pos + len(data))
+        return True
+
     KEYWORD_TRAILER = KWD('trailer')
 
     def load_trailer(self, parser):
@@ -120,38 +201,109 @@ class PDFXRef(PDFBaseXRef):
             if not x:
                 raise PDFNoValidXRef('Unexpected EOF - file corrupted')
             (_, dic) = x[0]
-        self.trailer.update(dict_value(dic))
+        self.trailer.update(dict_value(dic).items())
 
-    PDFOBJ_CUE = re.compile(r'^(\d+)\s+(\d+)\s+obj\b')
+    # object headers and trailers at the start of a line, and the type of
+    # XRef streams and object streams.
+    FALLBACK_CUE = re.compile(r'[\r\n](?:(\d+)\s+(\d+)\s+obj\b|(trailer))|/Type\s*/(XRef|ObjStm)\b')
 
     def load_fallback(self, parser):
-        parser.seek(0)
-        while 1:
+        """Rebuilds the XRef of a damaged file by scanning all of it.
+
+        Objects are located by their "objid genno obj" headers, a later
+        header taking precedence. The trailer is the last one that has
+        a /Root, or else the dictionary of the last XRef stream. Objects
+        packed in object streams are located through the stream headers.
+        """
+        data = parser.mmap
+        if data is None:
             try:
-                (pos, line) = parser.nextline()
-            except PSEOF:
-                break
-            if line.startswith('trailer'):
-                parser.seek(pos)
-                self.load_trailer(parser)
-                log.debug('trailer: %r', self.get_trailer())
+                data = mmap.mmap(parser.fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, ValueError, EnvironmentError):
+                parser.fp.seek(0)
+                data = parser.fp.read()
+        trailers = []
+        xrefstms = []
+        objstms = []
+        objid = None
+        for m in self.FALLBACK_CUE.finditer(data):
+            if m.group(1):
+                objid = int(m.group(1))
+                self.offsets[objid] = (int(m.group(2)), m.start(1))
+            elif m.group(4):
+                if objid is not None:
+                    if m.group(4) == 'XRef':
+                        xrefstms.append(objid)
+                    else:
+                        objstms.append(objid)
+            else:
+                trailers.append(m.start(3))
+        if data is not parser.mmap and isinstance(data, mmap.mmap):
+            data.close()
+        for pos in reversed(trailers):
+            parser.seek(pos)
+            xref = PDFXRef()
+            xref.load_trailer(parser)
+            if 'Root' in xref.trailer or pos == trailers[0]:
+                self.trailer = xref.trailer
                 break
-            m = self.PDFOBJ_CUE.match(line)
-            if not m: continue
-            (objid, genno) = m.groups()
-            self.offsets[int(objid)] = (0, pos)
+        if 'Root' not in self.trailer:
+            for objid in reversed(xrefstms):
+                stream = self._fallback_obj(parser, objid)
+                if isinstance(stream, PDFStream) and 'Root' in stream:
+                    self.trailer.update(stream.attrs.items())
+                    break
+        log.debug('trailer: %r', self.get_trailer())
+        if 'Encrypt' in self.trailer:
+            # object streams can't be read before the document is decrypted.
+            return
+        for strmid in objstms:
+            stream = self._fallback_obj(parser, strmid)
+            if not isinstance(stream, PDFStream) or stream.get('Type') is not LITERAL_OBJSTM:
+                continue
+            try:
+                n = int_value(stream['N'])
+                header = stream.get_data()[:int_value(stream['First'])].split()
+                objids = list(map(int, header[0:n * 2:2]))
+            except (KeyError, ValueError, PDFException, PSException) as e:
+                log.info('cannot read object stream: objid=%r: %r', strmid, e)
+                continue
+            for (index, objid) in enumerate(objids):
+                if objid not in self.offsets:
+                    self.streamed[objid] = (strmid, index)
+
+    def _fallback_obj(self, parser, objid):
+        """Reads an object found by load_fallback(), or returns None."""
+        try:
+            parser.seek(self.offsets[objid][1])
+            parser.nexttoken()  # objid
+            parser.nexttoken()  # genno
+            parser.nexttoken()  # obj
+            (_, obj) = parser.nextobject()
+        except PSException as e:
+            log.info('cannot read object: objid=%r: %r', objid, e)
+            return None
+        return obj
 
     def get_trailer(self):
         return self.trailer
 
     def get_objids(self):
+        if self.streamed:
+            return iter(list(self.offsets.keys()) + list(self.streamed.keys()))
         return iter(self.offsets.keys())
 
+    def get_entries(self):
+        for (objid, (_, pos)) in self.offsets.items():
+            yield (objid, None, pos)
+        for (objid, (strmid, index)) in self.streamed.items():
+            yield (objid, strmid, index)
+
     def get_pos(self, objid):
         try:
             (genno, pos) = self.offsets[objid]
         except KeyError:
-            raise
+            return self.streamed[objid]
         return None, pos
 
 
@@ -193,6 +345,19 @@ class PDFXRefStream(PDFBaseXRef):
             for x in range(objid_range.get_start_id(), objid_range.get_end_id() + 1):
                 yield x
 
+    def _decode(self, ent):
+        f1 = nunpack(ent[:self.fl1], 1)
+        if f1 == 1:
+            pos = nunpack(ent[self.fl1:self.fl1 + self.fl2])
+            genno = nunpack(ent[self.fl1 + self.fl2:])
+            return None, pos
+        elif f1 == 2:
+            objid = nunpack(ent[self.fl1:self.fl1 + self.fl2])
+            index = nunpack(ent[self.fl1 + self.fl2:])
+            return objid, index
+        # this is a free object
+        return None
+
     def get_pos(self, objid):
         offset = 0
         found = False
@@ -206,20 +371,282 @@ class PDFXRefStream(PDFBaseXRef):
         if not found:
             raise KeyError(objid)
         i = self.entlen * offset
-        ent = self.data[i:i + self.entlen]
-        f1 = nunpack(ent[:self.fl1], 1)
-        if f1 == 1:
-            pos = nunpack(ent[self.fl1:self.fl1 + self.fl2])
-            genno = nunpack(ent[self.fl1 + self.fl2:])
-            return None, pos
-        elif f1 == 2:
-            objid = nunpack(ent[self.fl1:self.fl1 + self.fl2])
-            index = nunpack(ent[self.fl1 + self.fl2:])
-            return objid, index
-        # this is a free object
+        pos = self._decode(self.data[i:i + self.entlen])
+        if pos is None:
+            raise KeyError(objid)
+        return pos
+
+    def get_entries(self):
+        i = 0
+        for objid in self.get_objids():
+            pos = self._decode(self.data[i:i + self.entlen])
+            i += self.entlen
+            if pos is not None:
+                yield (objid, pos[0], pos[1])
+
+
+class PDFXRefIndex(object):
+    """Finds objects in all the XRefs of a document at once.
+
+    The XRefs are merged so that entries of a newer revision hide the
+    ones of older revisions. Each entry is kept in parallel arrays
+    indexed by object id: its kind (0: none, 1: at a file offset,
+    2: in an object stream), the file offset, and the object stream id
+    and index. Documents with very sparse object ids use a dictionary.
+    """
+
+    def __init__(self, xrefs):
+        entries = [list(xref.get_entries()) for xref in xrefs]
+        objids = [objid for ents in entries for (objid, _, _) in ents]
+        size = max(objids) + 1 if objids else 0
+        if size <= 4 * len(objids) + 1024:
+            self.kinds = array('b', [0]) * size
+            self.offsets = array(_INT64, [0]) * size
+            self.strmids = array(_INT64, [0]) * size
+            self.indexes = array(_INT64, [0]) * size
+            self.sparse = None
+        else:
+            self.sparse = {}
+        # xrefs come newest first.
+        for ents in reversed(entries):
+            if self.sparse is not None:
+                self.sparse.update((objid, (strmid, index)) for (objid, strmid, index) in ents if 0 <= objid)
+                continue
+            (kinds, offsets, strmids, indexes) = (self.kinds, self.offsets, self.strmids, self.indexes)
+            for (objid, strmid, index) in ents:
+                if objid < 0:
+                    continue
+                if strmid:
+                    kinds[objid] = 2
+                    strmids[objid] = strmid
+                    indexes[objid] = index
+                else:
+                    kinds[objid] = 1
+                    offsets[objid] = index
+
+    def get_objids(self):
+        if self.sparse is not None:
+            return iter(sorted(self.sparse))
+        return (objid for (objid, kind) in enumerate(self.kinds) if kind)
+
+    def get_pos(self, objid):
+        if self.sparse is not None:
+            return self.sparse[objid]
+        try:
+            kind = self.kinds[objid]
+        except (IndexError, TypeError):
+            raise KeyError(objid)
+        if kind == 1 and 0 <= objid:
+            return None, self.offsets[objid]
+        elif kind == 2 and 0 <= objid:
+            return self.strmids[objid], self.indexes[objid]
         raise KeyError(objid)
 
 
+class PDFCachedXRef(PDFBaseXRef):
+    """An XRef restored from a PDFXRefCache.
+
+    Only its trailer and object ids are kept; the positions of the
+    objects come from the merged index of the document.
+    """
+
+    def __init__(self, trailer, objids, index):
+        self.trailer = trailer
+        self.objids = objids
+        self.index = index
+
+    def __repr__(self):
+        return '<PDFCachedXRef: objids=%d>' % len(self.objids)
+
+    def get_trailer(self):
+        return self.trailer
+
+    def get_objids(self):
+        return iter(self.objids)
+
+    def get_pos(self, objid):
+        return self.index.get_pos(objid)
+
+    def get_entries(self):
+        for objid in self.objids:
+            (strmid, index) = self.index.get_pos(objid)
+            yield (objid, strmid, index)
+
+
+def _pdf_repr(obj):
+    """Writes a trailer value back in PDF syntax."""
+    if obj is None:
+        return 'null'
+    elif obj is True:
+        return 'true'
+    elif obj is False:
+        return 'false'
+    elif isinstance(obj, int):
+        return '%d' % obj
+    elif isinstance(obj, float):
+        s = repr(obj)
+        if 'e' in s:
+            s = '%f' % obj
+        return s
+    elif isinstance(obj, str):
+        return '<%s>' % ''.join('%02x' % ord(c) for c in obj)
+    elif isinstance(obj, PSLiteral):
+        return '/' + _PDF_NAME_ESCAPE.sub(lambda m: '#%02x' % ord(m.group(0)), obj.name)
+    elif isinstance(obj, PDFObjRef):
+        return '%d 0 R' % obj.objid
+    elif isinstance(obj, dict):
+        return '<<%s>>' % ''.join('%s %s ' % (_pdf_repr(LIT(k)), _pdf_repr(v)) for (k, v) in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        return '[%s]' % ' '.join(_pdf_repr(v) for v in obj)
+    raise PDFTypeError('cannot write %r' % (obj,))
+
+_PDF_NAME_ESCAPE = re.compile(r'[^!"$&\'*+,\-.0-9:;=?@A-Z\\^_`a-z|~]')
+
+
+class PDFXRefCache(object):
+    """Keeps the XRefs of documents in a directory across runs.
+
+    A cache file holds the merged index, the trailers and the object
+    ids of every XRef of a document, so that reopening it skips the
+    parsing of its XRefs (or the rescan of a damaged file). Files are
+    identified by their size, modification time and a hash of their
+    first and last bytes; anything that can't be identified (such as
+    pipes and in-memory files) is not cached.
+
+    Typical usage:
+      cache = PDFXRefCache(cachedir, parser)
+      if not cache.load(doc):
+          ...  # read the XRefs
+          cache.save(doc)
+    """
+
+    MAGIC = 'pdfminer-xref\n'
+    VERSION = 2
+    HASHSIZE = 65536
+
+    def __init__(self, cachedir, parser):
+        self.cachedir = cachedir
+        self.parser = parser
+        self.path = None
+        key = self.get_key(parser.rawfp)
+        if key is not None:
+            self.path = os.path.join(cachedir, key + '.xref')
+
+    def get_key(self, fp):
+        """Returns the key of a file, or None if it can't be cached."""
+        try:
+            st = os.fstat(fp.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            pos = fp.tell()
+            fp.seek(0)
+            head = fp.read(self.HASHSIZE)
+            fp.seek(max(0, st.st_size - self.HASHSIZE))
+            tail = fp.read(self.HASHSIZE)
+            fp.seek(pos)
+        except (AttributeError, ValueError, EnvironmentError):
+            return None
+        # the layout of the arrays depends on the machine.
+        hash = md5.md5('%d %d %s %s %r ' % (self.VERSION, array(_INT64).itemsize, sys.byteorder,
+                                            st.st_size, st.st_mtime))
+        hash.update(head)
+        hash.update(tail)
+        return hash.hexdigest()
+
+    def load(self, doc):
+        """Restores the XRefs of doc. Returns False if they aren't cached."""
+        if self.path is None:
+            return False
+        try:
+            with open(self.path, 'rb') as fp:
+                data = fp.read()
+        except EnvironmentError:
+            return False
+        try:
+            (xrefs, index, fallback) = self._decode(data, doc)
+        except (ValueError, IndexError, struct.error, PSException, PDFException) as e:
+            log.info('invalid xref cache: path=%r: %r', self.path, e)
+            return False
+        log.info('xref cache: path=%r', self.path)
+        doc.xrefs = xrefs
+        doc._index = index
+        self.parser.fallback = fallback
+        return True
+
+    def save(self, doc):
+        """Writes the XRefs of doc to the cache directory."""
+        if self.path is None:
+            return
+        try:
+            data = self._encode(doc.xrefs, doc._index, self.parser.fallback)
+        except PDFTypeError as e:
+            log.info('cannot cache xrefs: %r', e)
+            return
+        tmppath = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with open(tmppath, 'wb') as fp:
+                fp.write(data)
+            os.rename(tmppath, self.path)
+        except EnvironmentError as e:
+            log.info('cannot write xref cache: path=%r: %r', self.path, e)
+            try:
+                os.remove(tmppath)
+            except EnvironmentError:
+                pass
+
+    def _encode(self, xrefs, index, fallback):
+        blobs = []
+        if index.sparse is None:
+            blobs.extend(_tobytes(a) for a in (index.kinds, index.offsets, index.strmids, index.indexes))
+        else:
+            objids = sorted(index.sparse)
+            strmids = [index.sparse[objid][0] or 0 for objid in objids]
+            indexes = [index.sparse[objid][1] for objid in objids]
+            blobs.extend(_tobytes(array(_INT64, a)) for a in (objids, strmids, indexes))
+        for xref in xrefs:
+            blobs.append(_pdf_repr(xref.get_trailer()))
+            blobs.append(_tobytes(array(_INT64, xref.get_objids())))
+        header = struct.pack('<BBL', fallback, index.sparse is not None, len(xrefs))
+        data = header + ''.join(struct.pack('<Q', len(b)) + b for b in blobs)
+        # a checksum, so that a damaged file is never taken for a cache.
+        return self.MAGIC + md5.md5(data).digest() + data
+
+    def _decode(self, data, doc):
+        if not data.startswith(self.MAGIC):
+            raise ValueError('not an xref cache')
+        i = len(self.MAGIC) + 16
+        if md5.md5(data[i:]).digest() != data[i - 16:i]:
+            raise ValueError('bad checksum')
+        (fallback, sparse, nxrefs) = struct.unpack('<BBL', data[i:i + 6])
+        i += 6
+        blobs = []
+        while i < len(data):
+            (n,) = struct.unpack('<Q', data[i:i + 8])
+            blobs.append(data[i + 8:i + 8 + n])
+            i += 8 + n
+        if i != len(data) or len(blobs) != (3 if sparse else 4) + nxrefs * 2:
+            raise ValueError('truncated xref cache')
+        index = PDFXRefIndex([])
+        if sparse:
+            (objids, strmids, indexes) = (_frombytes(_INT64, b) for b in blobs[:3])
+            index.sparse = dict((objid, (strmid or None, i))
+                                for (objid, strmid, i) in zip(objids, strmids, indexes))
+            del blobs[:3]
+        else:
+            index.kinds = _frombytes('b', blobs[0])
+            (index.offsets, index.strmids, index.indexes) = (_frombytes(_INT64, b) for b in blobs[1:4])
+            del blobs[:4]
+        parser = _PDFValueParser(StringIO(''.join(blobs[0::2])))
+        parser.set_document(doc)
+        xrefs = []
+        for objids in blobs[1::2]:
+            (_, trailer) = parser.nextobject()
+            xrefs.append(PDFCachedXRef(dict_value(trailer), _frombytes(_INT64, objids), index))
+        return (xrefs, index, bool(fallback))
+
+
 class PDFPage(object):
     """An object that holds the information about a page.
 
@@ -241,38 +668,184 @@ class PDFPage(object):
       beads: a chain that represents natural reading order.
     """
 
+    __slots__ = ('doc', 'pageid', 'attrs', '_lastmod', '_resources', '_mediabox', '_cropbox', '_rotate',
+                 '_annots', '_beads', '_contents')
+
     def __init__(self, doc, pageid, attrs):
         """Initialize a page object.
         
         doc: a PDFDocument object.
         pageid: any Python object that can uniquely identify the page.
         attrs: a dictionary of page attributes.
+
+        The other attributes are resolved when they are first used.
         """
         self.doc = doc
         self.pageid = pageid
         self.attrs = dict_value(attrs)
-        self.lastmod = resolve1(self.attrs.get('LastModified'))
-        self.resources = resolve1(self.attrs['Resources'])
-        self.mediabox = resolve1(self.attrs['MediaBox'])
+
+    @cached_slot
+    def lastmod(self):
+        return resolve1(self.attrs.get('LastModified'))
+
+    @cached_slot
+    def resources(self):
+        return resolve1(self.attrs['Resources'])
+
+    @cached_slot
+    def mediabox(self):
+        return resolve1(self.attrs['MediaBox'])
+
+    @cached_slot
+    def cropbox(self):
         if 'CropBox' in self.attrs:
-            self.cropbox = resolve1(self.attrs['CropBox'])
-        else:
-            self.cropbox = self.mediabox
-        self.rotate = (resolve1(self.attrs.get('Rotate', 0)) + 360) % 360
-        self.annots = resolve1(self.attrs.get('Annots'))
-        self.beads = resolve1(self.attrs.get('B'))
+            return resolve1(self.attrs['CropBox'])
+        return self.mediabox
+
+    @cached_slot
+    def rotate(self):
+        return (resolve1(self.attrs.get('Rotate', 0)) + 360) % 360
+
+    @cached_slot
+    def annots(self):
+        return resolve1(self.attrs.get('Annots'))
+
+    @cached_slot
+    def beads(self):
+        return resolve1(self.attrs.get('B'))
+
+    @cached_slot
+    def contents(self):
         if 'Contents' in self.attrs:
             contents = resolve1(self.attrs['Contents'])
         else:
             contents = []
         if not isinstance(contents, list):
             contents = [contents]
-        self.contents = contents
+        return contents
 
     def __repr__(self):
         return '<PDFPage: Resources=%r, MediaBox=%r>' % (self.resources, self.mediabox)
 
 
+def _objsize(obj):
+    """Roughly estimates the memory used by a PDF object, in bytes.
+
+    Indirect references are not followed. The data of a stream counts
+    both raw and decoded.
+    """
+    if isinstance(obj, str):
+        return 40 + len(obj)
+    elif isinstance(obj, PDFStream):
+        return (100 + _objsize(obj.attrs) + len(obj.rawdata or '') + len(obj.data or ''))
+    elif isinstance(obj, dict):
+        return 100 + sum(40 + len(k) + _objsize(v) for (k, v) in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        return 60 + sum(8 + _objsize(v) for v in obj)
+    return 24
+
+
+class PDFObjCache(object):
+    """Keeps the objects of a PDFDocument once they are read.
+
+    This cache never forgets anything. The number of lookups that
+    found an object and that didn't are counted in hits and misses.
+    Any object with the same methods can be given to a PDFDocument.
+    """
+
+    def __init__(self):
+        self.objs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '<%s: objs=%d, hits=%d, misses=%d>' % (self.__class__.__name__, len(self), self.hits, self.misses)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __contains__(self, key):
+        return key in self.objs
+
+    def __getitem__(self, key):
+        try:
+            obj = self.objs[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return obj
+
+    def __setitem__(self, key, obj):
+        self.objs[key] = obj
+
+    def clear(self):
+        self.objs.clear()
+
+
+class PDFLRUObjCache(PDFObjCache):
+    """An object cache that forgets the least recently used objects.
+
+    Objects are evicted as soon as there are more than maxobjs of them,
+    or their estimated size exceeds maxbytes. The size of a stream is
+    measured again once its data is decoded, when the next object is
+    added.
+    """
+
+    def __init__(self, maxbytes=None, maxobjs=None):
+        PDFObjCache.__init__(self)
+        self.objs = OrderedDict()
+        self.maxbytes = maxbytes
+        self.maxobjs = maxobjs
+        self.nbytes = 0
+        self.sizes = {}
+        # (key, stream) of the streams decoded since the last insertion.
+        # it is only appended to, as streams may be decoded in any thread.
+        self.decoded = []
+
+    def __repr__(self):
+        return '<%s: objs=%d, bytes=%d, hits=%d, misses=%d>' % (self.__class__.__name__, len(self), self.nbytes,
+                                                               self.hits, self.misses)
+
+    def __getitem__(self, key):
+        obj = PDFObjCache.__getitem__(self, key)
+        # move it to the most recently used end.
+        del self.objs[key]
+        self.objs[key] = obj
+        return obj
+
+    def __setitem__(self, key, obj):
+        if key in self.objs:
+            self._remove(key)
+        self.objs[key] = obj
+        self._measure(key, obj)
+        (decoded, self.decoded) = (self.decoded, [])
+        for (k, stream) in decoded:
+            # it may have been evicted or replaced since.
+            if self.objs.get(k) is stream:
+                self._measure(k, stream)
+        while self.objs and ((self.maxbytes is not None and self.maxbytes < self.nbytes) or
+                             (self.maxobjs is not None and self.maxobjs < len(self.objs))):
+            self._remove(next(iter(self.objs)))
+
+    def _measure(self, key, obj):
+        size = _objsize(obj)
+        self.nbytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+        if isinstance(obj, PDFStream) and obj.data is None:
+            obj.on_decode = lambda stream: self.decoded.append((key, stream))
+
+    def _remove(self, key):
+        del self.objs[key]
+        self.nbytes -= self.sizes.pop(key)
+
+    def clear(self):
+        self.objs.clear()
+        self.sizes.clear()
+        self.decoded = []
+        self.nbytes = 0
+
+
 class PDFDocument(object):
     """PDFDocument object represents a PDF document.
 
@@ -285,19 +858,46 @@ class PDFDocument(object):
       doc.set_parser(parser)
       doc.initialize(password)
       obj = doc.getobj(objid)
-    
+
+    With a cachedir, the XRefs are kept in a PDFXRefCache so that
+    opening the same file again doesn't parse them. Objects are kept
+    in objcache (by default, a PDFObjCache that grows without limit)
+    unless caching is False.
+
+    With threadsafe=True, the objects of a document can be fetched from
+    several threads at once: each getobj() reads the file through its
+    own fork of the parser (see PDFParser.fork()), objcache is only
+    used under a lock, and each stream is decoded under a lock of its
+    own.
     """
 
-    def __init__(self, caching=True):
+    def __init__(self, caching=True, cachedir=None, objcache=None, threadsafe=False):
+        if objcache is None:
+            objcache = PDFObjCache()
         self.caching = caching
+        self.cachedir = cachedir
         self.xrefs = []
+        self._index = None
         self.info = []
         self.catalog = None
         self.encryption = None
         self.decipher = None
         self._parser = None
-        self._cached_objs = {}
-        self._parsed_objs = {}
+        self._encrypt_objid = None
+        self.objcache = objcache
+        self._lock = None
+        if threadsafe:
+            self._lock = threading.RLock()
+        self._page_index = {}
+        self._page_counts = {}
+        self._name_leaves = {}
+        self._dest_names = None
+        self._rc4_keys = {}
+        self._rc4_keystream = None
+        self._aes_decryptor = None
+        self._crypt_filters = {}
+        self._stmf = self._strf = None
+        self._encrypt_metadata = True
 
     @cached_property
     def metadata(self):
@@ -312,9 +912,20 @@ class PDFDocument(object):
         if self._parser:
             return
         self._parser = parser
+        cache = None
+        if self.cachedir:
+            cache = PDFXRefCache(self.cachedir, parser)
+        if cache is None or not cache.load(self):
+            self.xrefs = parser.read_xref()
+            self._index = PDFXRefIndex(self.xrefs)
+            if cache is not None:
+                cache.save(self)
+        self._read_trailers()
+
+    def _read_trailers(self):
         # Retrieve the information of each header that was appended
         # (maybe multiple times) at the end of the document.
-        self.xrefs = parser.read_xref()
+        self.info = []
         for xref in self.xrefs:
             trailer = xref.get_trailer()
             if not trailer:
@@ -322,6 +933,8 @@ class PDFDocument(object):
             # If there's an encryption info, remember it.
             if 'Encrypt' in trailer:
                 #assert not self.encryption
+                if isinstance(trailer['Encrypt'], PDFObjRef):
+                    self._encrypt_objid = trailer['Encrypt'].objid
                 self.encryption = (list_value(trailer['ID']),
                                    dict_value(trailer['Encrypt']))
             if 'Info' in trailer:
@@ -349,43 +962,103 @@ class PDFDocument(object):
         if literal_name(param.get('Filter')) != 'Standard':
             raise PDFEncryptionError('Unknown filter: param=%r' % param)
         V = int_value(param.get('V', 0))
-        if not (V == 1 or V == 2):
-            raise PDFEncryptionError('Unknown algorithm: param=%r' % param)
-        length = int_value(param.get('Length', 40))  # Key length (bits)
-        O = str_value(param['O'])
         R = int_value(param['R'])  # Revision
-        if 5 <= R:
-            raise PDFEncryptionError('Unknown revision: %r' % R)
-        U = str_value(param['U'])
         P = int_value(param['P'])
         self.is_printable = bool(P & 4)
         self.is_modifiable = bool(P & 8)
         self.is_extractable = bool(P & 16)
+        if V == 1 or V == 2:
+            if 4 <= R:
+                raise PDFEncryptionError('Unknown revision: %r' % R)
+            length = int_value(param.get('Length', 40))  # Key length (bits)
+            self.decrypt_key = self._authenticate_rc4(password, docid, param, R, length // 8)
+            self.decipher = self.decrypt_rc4
+        elif V == 4 or V == 5:
+            # Crypt filters: strings and streams are each deciphered by
+            # a filter named in StrF and StmF.
+            if (V == 4 and R != 4) or (V == 5 and R not in (5, 6)):
+                raise PDFEncryptionError('Unknown revision: %r' % R)
+            self._crypt_filters = dict_value(param.get('CF', {}))
+            (self._stmf, stmlen) = self._crypt_filter(param.get('StmF'))
+            (self._strf, strlen) = self._crypt_filter(param.get('StrF'))
+            self._encrypt_metadata = resolve1(param.get('EncryptMetadata', True)) is not False
+            if V == 4:
+                # the key length is in bytes or in bits, depending on the producer.
+                length = stmlen or strlen or int_value(param.get('Length', 128))
+                if 32 < length:
+                    length //= 8
+                length = max(5, min(length, 16))
+                self.decrypt_key = self._authenticate_rc4(password, docid, param, R, length,
+                                                          self._encrypt_metadata)
+            else:
+                self.decrypt_key = self._authenticate_aes256(password, param, R)
+            self.decipher = self.decrypt_crypt_filters
+        else:
+            raise PDFEncryptionError('Unknown algorithm: param=%r' % param)
+        # The objects read so far (the catalog, the document info) were
+        # not deciphered, so read them again.
+        self.objcache.clear()
+        self._page_index.clear()
+        self._name_leaves.clear()
+        self._dest_names = None
+        self._read_trailers()
+
+    def _authenticate_rc4(self, password, docid, param, R, length, encrypt_metadata=True):
+        """Returns the key of a document encrypted with revision 2 to 4.
+
+        The password is tried as the user password, then as the owner
+        password.
+        """
+        try:
+            return self._authenticate_user(password, docid, param, R, length, encrypt_metadata)
+        except PDFPasswordIncorrect:
+            pass
+        # Algorithm 3.7: the owner password deciphers O into the user password.
+        md5hash = md5.md5((password + self.PASSWORD_PADDING)[:32])
+        if 3 <= R:
+            for _ in range(50):
+                md5hash = md5.md5(md5hash.digest())
+        key = md5hash.digest()[:length]
+        password = str_value(param['O'])
+        if R == 2:
+            password = self.RC4_CIPHER(key).process(password)
+        else:
+            for i in range(19, -1, -1):
+                k = ''.join(chr(ord(c) ^ i) for c in key)
+                password = self.RC4_CIPHER(k).process(password)
+        return self._authenticate_user(password, docid, param, R, length, encrypt_metadata)
+
+    def _authenticate_user(self, password, docid, param, R, length, encrypt_metadata=True):
+        """Returns the key of a document encrypted with revision 2 to 4
+        if password is its user password."""
+        O = str_value(param['O'])
+        U = str_value(param['U'])
+        P = int_value(param['P'])
         # Algorithm 3.2
         password = (password + self.PASSWORD_PADDING)[:32]  # 1
         md5hash = md5.md5(password)  # 2
         md5hash.update(O)  # 3
-        md5hash.update(struct.pack('<l', P))  # 4
+        # some producers write P as an unsigned number.
+        md5hash.update(struct.pack('<L', P & 0xffffffff))  # 4
         md5hash.update(docid[0])  # 5
-        if 4 <= R:
-            # 6
-            raise PDFNotImplementedError('Revision 4 encryption is currently unsupported')
+        if 4 <= R and not encrypt_metadata:
+            md5hash.update('\xff\xff\xff\xff')  # 6
         if 3 <= R:
             # 8
             for _ in range(50):
-                md5hash = md5.md5(md5hash.digest()[:length / 8])
-        key = md5hash.digest()[:length / 8]
+                md5hash = md5.md5(md5hash.digest()[:length])
+        key = md5hash.digest()[:length]
         if R == 2:
             # Algorithm 3.4
-            u1 = Arcfour(key).process(self.PASSWORD_PADDING)
-        elif R == 3:
+            u1 = self.RC4_CIPHER(key).process(self.PASSWORD_PADDING)
+        else:
             # Algorithm 3.5
             md5hash = md5.md5(self.PASSWORD_PADDING)  # 2
             md5hash.update(docid[0])  # 3
-            x = Arcfour(key).process(md5hash.digest()[:16])  # 4
+            x = self.RC4_CIPHER(key).process(md5hash.digest()[:16])  # 4
             for i in range(1, 19 + 1):
                 k = ''.join(chr(ord(c) ^ i) for c in key)
-                x = Arcfour(k).process(x)
+                x = self.RC4_CIPHER(k).process(x)
             u1 = x + x  # 32bytes total
         if R == 2:
             is_authenticated = (u1 == U)
@@ -393,14 +1066,156 @@ class PDFDocument(object):
             is_authenticated = (u1[:16] == U[:16])
         if not is_authenticated:
             raise PDFPasswordIncorrect
-        self.decrypt_key = key
-        self.decipher = self.decrypt_rc4  # XXX may be AES
+        return key
 
-    def decrypt_rc4(self, objid, genno, data):
-        key = self.decrypt_key + struct.pack('<L', objid)[:3] + struct.pack('<L', genno)[:2]
-        md5hash = md5.md5(key)
-        key = md5hash.digest()[:min(len(key), 16)]
-        return Arcfour(key).process(data)
+    def _authenticate_aes256(self, password, param, R):
+        """Returns the key of a document encrypted with revision 5 or 6.
+
+        The password is tried as the user password, then as the owner
+        password.
+        """
+        if sha256 is None:
+            raise PDFEncryptionError('AES-256 requires hashlib')
+        password = password[:127]
+        O = str_value(param['O'])
+        U = str_value(param['U'])
+        if self._hash_aes256(R, password, U[32:40]) == U[:32]:
+            key = self._hash_aes256(R, password, U[40:48])
+            encrypted = str_value(param['UE'])
+        elif self._hash_aes256(R, password, O[32:40], U[:48]) == O[:32]:
+            key = self._hash_aes256(R, password, O[40:48], U[:48])
+            encrypted = str_value(param['OE'])
+        else:
+            raise PDFPasswordIncorrect
+        return RijndaelDecryptor(key, 256).decrypt_cbc('\0' * 16, encrypted[:32])
+
+    def _hash_aes256(self, R, password, salt, udata=''):
+        """Computes the hash of a password for revision 5 or 6 (Algorithm 2.B)."""
+        k = sha256(password + salt + udata).digest()
+        if R == 5:
+            return k
+        i = 0
+        while 1:
+            e = RijndaelEncryptor(k[:16], 128).encrypt_cbc(k[16:32], (password + k + udata) * 64)
+            # the first 16 bytes of e taken as a number, modulo 3.
+            k = (sha256, sha384, sha512)[sum(bytearray(e[:16])) % 3](e).digest()
+            i += 1
+            if 64 <= i and ord(e[-1]) <= i - 32:
+                break
+        return k[:32]
+
+    def _crypt_filter(self, name):
+        """Returns the decipher of a crypt filter and its key length, if any."""
+        name = literal_name(name) if name is not None else 'Identity'
+        if name == 'Identity':
+            return (None, None)
+        try:
+            cf = dict_value(self._crypt_filters[name])
+        except KeyError:
+            raise PDFEncryptionError('Unknown crypt filter: %r' % name)
+        cfm = literal_name(cf.get('CFM'))
+        if cfm == 'V2':
+            decipher = self.decrypt_rc4
+        elif cfm == 'AESV2':
+            decipher = self.decrypt_aes128
+        elif cfm == 'AESV3':
+            decipher = self.decrypt_aes256
+        else:
+            raise PDFEncryptionError('Unknown crypt filter method: %r' % cfm)
+        length = None
+        if 'Length' in cf:
+            length = int_value(cf['Length'])
+        return (decipher, length)
+
+    def decrypt_crypt_filters(self, objid, genno, data, attrs=None):
+        """Deciphers a string, or a stream with attrs, with its crypt filter."""
+        if attrs is None:
+            decipher = self._strf
+        else:
+            decipher = self._stmf
+            if not self._encrypt_metadata and attrs.get('Type') is LITERAL_METADATA:
+                return data
+            # a /Crypt filter of the stream itself replaces StmF.
+            filters = resolve1(attrs.get('Filter'))
+            if isinstance(filters, list) and filters:
+                filters = resolve1(filters[0])
+            if filters is LITERAL_CRYPT:
+                params = resolve1(attrs.get('DecodeParms'))
+                if isinstance(params, list) and params:
+                    params = resolve1(params[0])
+                name = None
+                if isinstance(params, dict):
+                    name = params.get('Name')
+                (decipher, _) = self._crypt_filter(name)
+        if decipher is None:
+            return data
+        return decipher(objid, genno, data)
+
+    # The class that decrypts RC4 data. Anything that is made from a key
+    # and has keystream(n) and process(data) like Arcfour can be used,
+    # e.g. a wrapper around a C implementation.
+    RC4_CIPHER = Arcfour
+
+    # The longest keystream that is kept for the next string of an object.
+    RC4_KEYSTREAM_CACHE = 65536
+
+    def decrypt_rc4(self, objid, genno, data, attrs=None):
+        # Algorithm 3.1: every string and stream of an object uses the same key.
+        try:
+            key = self._rc4_keys[(objid, genno)]
+        except KeyError:
+            key = self.decrypt_key + struct.pack('<L', objid)[:3] + struct.pack('<L', genno)[:2]
+            md5hash = md5.md5(key)
+            key = md5hash.digest()[:min(len(key), 16)]
+            self._rc4_keys[(objid, genno)] = key
+        # The strings of an object are decrypted one after another with
+        # the same key, so they all share the keystream of the first one.
+        cached = self._rc4_keystream
+        if cached is not None and cached[0] == key and len(data) <= len(cached[1]):
+            keystream = cached[1]
+        else:
+            keystream = self.RC4_CIPHER(key).keystream(len(data))
+            if len(keystream) <= self.RC4_KEYSTREAM_CACHE:
+                self._rc4_keystream = (key, keystream)
+        return xor_bytes(data, keystream)
+
+    def decrypt_aes128(self, objid, genno, data, attrs=None):
+        # Algorithm 3.1 with the "sAlT" of AES.
+        key = self.decrypt_key + struct.pack('<L', objid)[:3] + struct.pack('<L', genno)[:2] + 'sAlT'
+        key = md5.md5(key).digest()[:16]
+        return self._decrypt_aes(key, data)
+
+    def decrypt_aes256(self, objid, genno, data, attrs=None):
+        # AESV3 uses the file key for every object.
+        return self._decrypt_aes(self.decrypt_key, data)
+
+    def _decrypt_aes(self, key, data):
+        """Deciphers data made of an IV and AES-CBC blocks with padding.
+
+        Data that is not made of whole blocks, or whose padding is
+        wrong, is reported and deciphered as far as possible.
+        """
+        if not data:
+            return ''
+        n = (len(data) - 16) // 16 * 16
+        if n <= 0 or len(data) != 16 + n:
+            handle_error(PDFEncryptionError, 'AES data is not made of whole blocks: length=%d' % len(data))
+            if n <= 0:
+                return ''
+        # All the strings and streams of an object share the key.
+        cached = self._aes_decryptor
+        if cached is not None and cached[0] == key:
+            decryptor = cached[1]
+        else:
+            decryptor = RijndaelDecryptor(key, len(key) * 8)
+            self._aes_decryptor = (key, decryptor)
+        data = decryptor.decrypt_cbc(data[:16], data[16:16 + n])
+        pad = ord(data[-1])
+        if not (1 <= pad <= 16 and data[-pad:] == data[-1] * pad):
+            handle_error(PDFEncryptionError, 'Invalid AES padding: %r' % data[-16:])
+        if 1 <= pad <= 16:
+            data = data[:-pad]
+        return data
 
     KEYWORD_OBJ = KWD('obj')
 
@@ -408,121 +1223,276 @@ class PDFDocument(object):
         if not self.xrefs:
             raise PDFException('PDFDocument is not initialized')
         log.debug('getobj: objid=%r', objid)
-        if objid in self._cached_objs:
+        # cached objects are already deciphered.
+        try:
+            return self._getcached(objid)
+        except KeyError:
+            pass
+        try:
+            (strmid, index) = self._index.get_pos(objid)
+        except KeyError:
+            handle_error(PDFSyntaxError, 'Cannot locate objid=%r' % objid)
+            # return null for a nonexistent reference.
+            return None
+        if strmid:
+            (data, spans) = self._get_objstm(strmid)
             genno = 0
-            obj = self._cached_objs[objid]
+            try:
+                (start, end) = spans[index]
+                parser = PDFStreamParser(data[start:end])
+                parser.set_document(self)
+                (_, obj) = parser.nextobject()
+            except (IndexError, PSEOF):
+                handle_error(PDFSyntaxError, 'Invalid object number: objid=%r' % objid)
+                # return None for an invalid object number
+                return None
+            if isinstance(obj, PDFStream):
+                obj.set_objid(objid, 0)
         else:
-            for xref in self.xrefs:
-                try:
-                    (strmid, index) = xref.get_pos(objid)
-                    break
-                except KeyError:
-                    pass
-            else:
-                handle_error(PDFSyntaxError, 'Cannot locate objid=%r' % objid)
-                # return null for a nonexistent reference.
+            parser = self._parser
+            if self._lock is not None:
+                parser = parser.fork()
+            try:
+                parser.seek(index)
+            except PSEOF:
+                handle_error(PSEOF, 'Parser index out of bounds')
                 return None
-            if strmid:
-                stream = stream_value(self.getobj(strmid))
-                if stream.get('Type') is not LITERAL_OBJSTM:
-                    handle_error(PDFSyntaxError, 'Not a stream object: %r' % stream)
-                try:
-                    n = stream['N']
-                except KeyError:
-                    handle_error(PDFSyntaxError, 'N is not defined: %r' % stream)
-                    n = 0
-                if strmid in self._parsed_objs:
-                    objs = self._parsed_objs[strmid]
-                else:
-                    parser = PDFStreamParser(stream.get_data())
-                    parser.set_document(self)
-                    objs = []
-                    try:
-                        while 1:
-                            (_, obj) = parser.nextobject()
-                            objs.append(obj)
-                    except PSEOF:
-                        pass
-                    if self.caching:
-                        self._parsed_objs[strmid] = objs
-                genno = 0
-                i = n * 2 + index
-                try:
-                    obj = objs[i]
-                except IndexError:
-                    handle_error(PDFSyntaxError, 'Invalid object number: objid=%r' % objid)
-                    # return None for an invalid object number
-                    return None
+            (_, objid1) = parser.nexttoken()  # objid
+            (_, genno) = parser.nexttoken()  # genno
+            (_, kwd) = parser.nexttoken()
+            # #### hack around malformed pdf files
+            #assert objid1 == objid, (objid, objid1)
+            if objid1 != objid and kwd is not self.KEYWORD_OBJ:
+                x = []
+                for (_, kwd) in parser.itertokens():
+                    x.append(kwd)
+                    if kwd is self.KEYWORD_OBJ:
+                        break
+                if x:
+                    objid1 = x[-2]
+                    genno = x[-1]
+            # #### end hack around malformed pdf files
+            if kwd is not self.KEYWORD_OBJ:
+                raise PDFSyntaxError('Invalid object spec: offset=%r' % index)
+            try:
+                (_,obj) = parser.nextobject()
                 if isinstance(obj, PDFStream):
-                    obj.set_objid(objid, 0)
-            else:
-                try:
-                    self._parser.seek(index)
-                except PSEOF:
-                    handle_error(PSEOF, 'Parser index out of bounds')
-                    return None
-                (_, objid1) = self._parser.nexttoken()  # objid
-                (_, genno) = self._parser.nexttoken()  # genno
-                (_, kwd) = self._parser.nexttoken()
-                # #### hack around malformed pdf files
-                #assert objid1 == objid, (objid, objid1)
-                if objid1 != objid:
-                    x = []
-                    while kwd is not self.KEYWORD_OBJ:
-                        (_, kwd) = self._parser.nexttoken()
-                        x.append(kwd)
-                    if x:
-                        objid1 = x[-2]
-                        genno = x[-1]
-                # #### end hack around malformed pdf files
-                if kwd is not self.KEYWORD_OBJ:
-                    raise PDFSyntaxError('Invalid object spec: offset=%r' % index)
-                try:
-                    (_,obj) = self._parser.nextobject()
-                    if isinstance(obj, PDFStream):
-                        obj.set_objid(objid, genno)
-                except PSEOF:
-                    return None
-            log.debug('register: objid=%r: %r', objid, obj)
-            if self.caching:
-                self._cached_objs[objid] = obj
-        if self.decipher:
+                    obj.set_objid(objid, genno)
+            except PSEOF:
+                return None
+        if self.decipher and not strmid and objid != self._encrypt_objid:
+            # the strings of an object stream were deciphered with it, and
+            # the encryption dictionary itself is never encrypted.
             obj = decipher_all(self.decipher, objid, genno, obj)
+        if self._lock is not None and isinstance(obj, PDFStream):
+            obj.lock = threading.Lock()
+        log.debug('register: objid=%r: %r', objid, obj)
+        if self.caching:
+            obj = self._setcached(objid, obj)
         return obj
 
+    def _getcached(self, key):
+        if self._lock is None:
+            return self.objcache[key]
+        with self._lock:
+            return self.objcache[key]
+
+    def _setcached(self, key, obj):
+        """Caches obj and returns it, or the object that another thread
+        has cached under the same key in the meantime."""
+        if self._lock is None:
+            self.objcache[key] = obj
+            return obj
+        with self._lock:
+            if key in self.objcache:
+                return self.objcache[key]
+            self.objcache[key] = obj
+            return obj
+
+    def _get_objstm(self, strmid):
+        """Returns the data of an object stream and the span of each object.
+
+        Only the header of the stream (its first N pairs of integers)
+        is read here; each object is parsed when it is requested.
+        """
+        key = (LITERAL_OBJSTM, strmid)
+        try:
+            return self._getcached(key)
+        except KeyError:
+            pass
+        stream = stream_value(self.getobj(strmid))
+        if stream.get('Type') is not LITERAL_OBJSTM:
+            handle_error(PDFSyntaxError, 'Not a stream object: %r' % stream)
+        try:
+            n = int_value(stream['N'])
+            first = int_value(stream['First'])
+        except KeyError:
+            handle_error(PDFSyntaxError, 'N or First is not defined: %r' % stream)
+            (n, first) = (0, 0)
+        data = stream.get_data()
+        header = data[:first].split()[:n * 2]
+        try:
+            starts = [first + int(pos) for pos in header[1::2]]
+        except ValueError:
+            handle_error(PDFSyntaxError, 'Invalid object stream header: %r' % stream)
+            starts = []
+        if len(header) < n * 2:
+            handle_error(PDFSyntaxError, 'Object stream header too short: %r' % stream)
+        # an object ends where the next one starts.
+        ends = sorted(starts) + [len(data)]
+        spans = []
+        for start in starts:
+            spans.append((start, ends[min(bisect_right(ends, start), len(starts))]))
+        if self.caching:
+            return self._setcached(key, (data, spans))
+        return (data, spans)
+
     INHERITABLE_ATTRS = set(['Resources', 'MediaBox', 'CropBox', 'Rotate'])
 
+    def _search_pages(self, obj, parent):
+        """Yields (objid, attrs) of the pages under a node of the page tree.
+
+        The attributes of each page include the ones it inherits.
+        """
+        (objid, tree) = self._page_node(obj, parent)
+        if tree.get('Type') is LITERAL_PAGES and 'Kids' in tree:
+            log.info('Pages: Kids=%r', tree['Kids'])
+            for c in list_value(tree['Kids']):
+                for x in self._search_pages(c, tree):
+                    yield x
+        elif tree.get('Type') is LITERAL_PAGE:
+            log.info('Page: %r', tree)
+            yield (objid, tree)
+
+    def _page_node(self, obj, parent):
+        if isinstance(obj, int):
+            objid = obj
+            tree = dict_value(self.getobj(objid)).copy()
+        else:
+            objid = obj.objid
+            tree = dict_value(obj).copy()
+        for k in self.INHERITABLE_ATTRS:
+            if k in parent and k not in tree:
+                tree[k] = parent[k]
+        return (objid, tree)
+
     def get_pages(self):
         if not self.xrefs:
             raise PDFException('PDFDocument is not initialized')
-
-        def search(obj, parent):
-            if isinstance(obj, int):
-                objid = obj
-                tree = dict_value(self.getobj(objid)).copy()
-            else:
-                objid = obj.objid
-                tree = dict_value(obj).copy()
-            for (k, v) in parent.items():
-                if k in self.INHERITABLE_ATTRS and k not in tree:
-                    tree[k] = v
-            if tree.get('Type') is LITERAL_PAGES and 'Kids' in tree:
-                log.info('Pages: Kids=%r', tree['Kids'])
-                for c in list_value(tree['Kids']):
-                    for x in search(c, tree):
-                        yield x
-            elif tree.get('Type') is LITERAL_PAGE:
-                log.info('Page: %r', tree)
-                yield (objid, tree)
         if 'Pages' not in self.catalog:
             return
-        for (pageid, tree) in search(self.catalog['Pages'], self.catalog):
+        for (pageno, (pageid, tree)) in enumerate(self._search_pages(self.catalog['Pages'], self.catalog)):
+            self._page_index[pageno] = (pageid, tree)
             yield PDFPage(self, pageid, tree)
 
+    def _count_pages(self, objid, tree):
+        """Returns the number of pages under a node of the page tree."""
+        if tree.get('Type') is LITERAL_PAGE:
+            return 1
+        if tree.get('Type') is not LITERAL_PAGES or 'Kids' not in tree:
+            return 0
+        count = resolve1(tree.get('Count'))
+        if isinstance(count, int) and not isinstance(count, bool) and 0 <= count:
+            return count
+        # /Count is broken: count the pages one by one.
+        if objid not in self._page_counts:
+            self._page_counts[objid] = sum(1 for _ in self._search_pages(objid, tree))
+        return self._page_counts[objid]
+
+    def get_page_count(self):
+        """Returns the number of pages of the document.
+
+        The /Count of the root of the page tree is used if it agrees
+        with the counts of its kids. Otherwise the pages are walked.
+        """
+        if not self.xrefs:
+            raise PDFException('PDFDocument is not initialized')
+        if 'Pages' not in self.catalog:
+            return 0
+        (objid, tree) = self._page_node(self.catalog['Pages'], self.catalog)
+        count = self._count_pages(objid, tree)
+        if tree.get('Type') is LITERAL_PAGES and 'Kids' in tree:
+            kids = [self._page_node(c, tree) for c in list_value(tree['Kids'])]
+            if sum(self._count_pages(kidid, kid) for (kidid, kid) in kids) != count:
+                log.info('invalid /Count: %r', tree.get('Count'))
+                count = sum(1 for _ in self._search_pages(objid, tree))
+        return count
+
+    def get_page(self, pageno):
+        """Returns the page at pageno (starting from 0) as a PDFPage.
+
+        The page tree is descended using the /Count of each node, so
+        that only the nodes on the way to the page are read. If the
+        counts don't lead to a page, the pages are walked one by one.
+        """
+        if not self.xrefs:
+            raise PDFException('PDFDocument is not initialized')
+        if pageno in self._page_index:
+            return PDFPage(self, *self._page_index[pageno])
+        if pageno < 0 or 'Pages' not in self.catalog:
+            raise IndexError('page number out of range: %r' % pageno)
+        page = self._descend_pages(pageno)
+        if page is None:
+            log.info('invalid /Count: walking the pages to %r', pageno)
+            for (i, page) in enumerate(self._search_pages(self.catalog['Pages'], self.catalog)):
+                self._page_index[i] = page
+                if i == pageno:
+                    break
+            else:
+                raise IndexError('page number out of range: %r' % pageno)
+        self._page_index[pageno] = page
+        return PDFPage(self, *page)
+
+    def _descend_pages(self, pageno):
+        """Returns (objid, attrs) of the page at pageno according to
+        the /Count of each node, or None if the counts are wrong.
+
+        The counts of the kids of each node on the way are checked
+        against the count of the node.
+        """
+        (objid, tree) = self._page_node(self.catalog['Pages'], self.catalog)
+        n = pageno
+        visited = set()
+        while tree.get('Type') is not LITERAL_PAGE:
+            if tree.get('Type') is not LITERAL_PAGES or 'Kids' not in tree or objid in visited:
+                return None
+            visited.add(objid)
+            kids = [self._page_node(c, tree) for c in list_value(tree['Kids'])]
+            counts = [self._count_pages(kidid, kid) for (kidid, kid) in kids]
+            if sum(counts) != self._count_pages(objid, tree):
+                # the /Count of this node or of one of its kids is wrong.
+                return None
+            for ((kidid, kid), count) in zip(kids, counts):
+                if n < count:
+                    (objid, tree) = (kidid, kid)
+                    break
+                n -= count
+            else:
+                return None
+        if n != 0:
+            return None
+        return (objid, tree)
+
     def get_outlines(self):
+        """Returns an iterator of the outline items as (level, title, dest, action, se).
+
+        The outline tree is walked with an explicit stack, so that deep
+        or long outlines don't hit the recursion limit. Items that are
+        visited twice (a broken /Next or /First chain) are skipped.
+        """
         if 'Outlines' not in self.catalog:
             raise PDFNoOutlines
-        def search(entry, level):
+        return self._iter_outlines(self.catalog['Outlines'])
+
+    def _iter_outlines(self, root):
+        stack = [(root, 0)]
+        visited = set()
+        while stack:
+            (entry, level) = stack.pop()
+            if isinstance(entry, PDFObjRef):
+                if entry.objid in visited:
+                    continue
+                visited.add(entry.objid)
             entry = dict_value(entry)
             if 'Title' in entry:
                 if 'A' in entry or 'Dest' in entry:
@@ -531,39 +1501,180 @@ class PDFDocument(object):
                     action = entry.get('A')
                     se = entry.get('SE')
                     yield (level, title, dest, action, se)
-            if 'First' in entry and 'Last' in entry:
-                for x in search(entry['First'], level + 1):
-                    yield x
+            # The children come before the next sibling.
             if 'Next' in entry:
-                for x in search(entry['Next'], level):
-                    yield x
-            return
-        return search(self.catalog['Outlines'], 0)
+                stack.append((entry['Next'], level))
+            if 'First' in entry and 'Last' in entry:
+                stack.append((entry['First'], level + 1))
+        return
 
-    def lookup_name(self, cat, key):
+    def _get_dest_names(self):
+        """Returns all the named destinations as a dict."""
+        if self._dest_names is None:
+            names = {}
+            # PDF-1.1 or prior
+            if 'Dests' in self.catalog:
+                try:
+                    names.update(dict_value(self.catalog['Dests']))
+                except PDFTypeError:
+                    pass
+            # PDF-1.2 or later
+            for (k, v) in self.iter_names('Dests'):
+                if isinstance(k, str):
+                    names[k] = v
+            self._dest_names = names
+        return self._dest_names
+
+    def resolve_dest(self, dest):
+        """Resolves a destination into an explicit destination (a list).
+
+        A destination can be a name (looked up in the named
+        destinations, which are all read at once), a dictionary
+        with /D, or a list. Returns None if it cannot be resolved.
+        """
+        for _ in range(8):
+            dest = resolve1(dest)
+            if isinstance(dest, PSLiteral):
+                dest = dest.name
+            if isinstance(dest, str):
+                dest = self._get_dest_names().get(dest)
+            elif isinstance(dest, dict):
+                dest = dest.get('D')
+            elif isinstance(dest, list):
+                return dest
+            else:
+                break
+        return None
+
+    def get_outline_pages(self):
+        """Returns an iterator of the outline items as (level, title, pageno).
+
+        The page numbers (starting from 0) are looked up in a map from
+        page objids built once, and pageno is None if the destination
+        of an item cannot be resolved to a page of this document.
+        """
+        return self._iter_outline_pages(self.get_outlines())
+
+    def _iter_outline_pages(self, outlines):
+        pages = None
+        for (level, title, dest, action, se) in outlines:
+            if dest is None:
+                action = resolve1(action)
+                if (isinstance(action, dict) and
+                    literal_name(action.get('S')) == 'GoTo'):
+                    dest = action.get('D')
+            dest = self.resolve_dest(dest)
+            pageno = None
+            if dest:
+                page = dest[0]
+                if isinstance(page, PDFObjRef):
+                    if pages is None:
+                        pages = self.get_page_numbers()
+                    pageno = pages.get(page.objid)
+                elif isinstance(page, int) and not isinstance(page, bool):
+                    pageno = page
+            yield (level, title, pageno)
+        return
+
+    def get_page_numbers(self):
+        """Returns a dict that maps the page objids to page numbers."""
+        pages = {}
+        for (pageno, page) in enumerate(self.get_pages()):
+            pages.setdefault(page.pageid, pageno)
+        return pages
+
+    def _name_tree(self, cat):
+        """Returns the root of a name tree of the catalog as (key, node)."""
         try:
             names = dict_value(self.catalog['Names'])
         except (PDFTypeError, KeyError):
-            raise KeyError((cat, key))
+            raise KeyError(cat)
         # may raise KeyError
-        d0 = dict_value(names[cat])
+        root = names[cat]
+        if isinstance(root, PDFObjRef):
+            return (root.objid, dict_value(root))
+        return (cat, dict_value(root))
+
+    def _name_leaf(self, nodekey, node):
+        """Returns the names of a leaf node as a dictionary."""
+        if nodekey in self._name_leaves:
+            return self._name_leaves[nodekey]
+        leaf = dict(choplist(2, list_value(node['Names'])))
+        if nodekey is not None:
+            self._name_leaves[nodekey] = leaf
+        return leaf
 
-        def lookup(d):
-            if 'Limits' in d:
-                (k1,k2) = list_value(d['Limits'])
+    def lookup_name(self, cat, key):
+        """Looks up a key in a name tree of the catalog (e.g. 'Dests').
+
+        Kids are binary searched by their /Limits, and the names of the
+        leaves are cached.
+        """
+        try:
+            (nodekey, node) = self._name_tree(cat)
+        except KeyError:
+            raise KeyError((cat, key))
+
+        def lookup(nodekey, node, depth):
+            try:
+                (k1, k2) = list_value(node['Limits'])
+            except (KeyError, ValueError):
+                pass
+            else:
                 if key < k1 or k2 < key:
-                    return None
-            if 'Names' in d:
-                objs = list_value(d['Names'])
-                names = dict(choplist(2, objs))
-                return names[key]
-            if 'Kids' in d:
-                for c in list_value(d['Kids']):
-                    v = lookup(dict_value(c))
-                    if v:
-                        return v
+                    raise KeyError((cat, key))
+            if 'Names' in node:
+                try:
+                    return self._name_leaf(nodekey, node)[key]
+                except KeyError:
+                    raise KeyError((cat, key))
+            if 'Kids' not in node or 32 < depth:
+                raise KeyError((cat, key))
+            kids = [(kid.objid if isinstance(kid, PDFObjRef) else None, kid) for kid in list_value(node['Kids'])]
+            (lo, hi) = (0, len(kids))
+            while lo < hi:
+                mid = (lo + hi) // 2
+                kid = dict_value(kids[mid][1])
+                try:
+                    (k1, k2) = list_value(kid['Limits'])
+                except (KeyError, ValueError):
+                    break
+                if key < k1:
+                    hi = mid
+                elif k2 < key:
+                    lo = mid + 1
+                else:
+                    return lookup(kids[mid][0], kid, depth + 1)
+            else:
+                raise KeyError((cat, key))
+            # a kid without /Limits: look in all the remaining ones.
+            for (kidkey, kid) in kids[lo:hi]:
+                try:
+                    return lookup(kidkey, dict_value(kid), depth + 1)
+                except KeyError:
+                    pass
             raise KeyError((cat, key))
-        return lookup(d0)
+        return lookup(nodekey, node, 0)
+
+    def iter_names(self, cat):
+        """Yields all the (key, value) pairs of a name tree in the order
+        of the tree, which is sorted unless the file is broken."""
+        try:
+            (nodekey, node) = self._name_tree(cat)
+        except KeyError:
+            return
+        stack = [(nodekey, node, 0)]
+        while stack:
+            (nodekey, node, depth) = stack.pop()
+            if 'Names' in node:
+                objs = list_value(node['Names'])
+                for (k, v) in choplist(2, objs):
+                    yield (k, v)
+            elif 'Kids' in node and depth <= 32:
+                kids = list_value(node['Kids'])
+                for kid in reversed(kids):
+                    kidkey = kid.objid if isinstance(kid, PDFObjRef) else None
+                    stack.append((kidkey, dict_value(kid), depth + 1))
 
     def get_dest(self, name):
         try:
@@ -580,6 +1691,73 @@ class PDFDocument(object):
         return obj
 
 
+class PDFFileView(object):
+    """A read-only file object over a file that is shared with others.
+
+    Each view has a position of its own, and reading it doesn't move
+    the file: the data is sliced from a memory map, read with
+    os.pread(), or else read from the file under a lock that all the
+    views of the file share.
+    """
+
+    def __init__(self, fp, lock, mmap=None):
+        self.fp = fp
+        self.lock = lock
+        self.mmap = mmap
+        self.fd = None
+        self.pos = 0
+        if mmap is None and hasattr(os, 'pread'):
+            try:
+                self.fd = fp.fileno()
+            except (AttributeError, ValueError, EnvironmentError):
+                pass
+
+    def __repr__(self):
+        return '<PDFFileView: %r, pos=%d>' % (self.fp, self.pos)
+
+    def size(self):
+        if self.mmap is not None:
+            return len(self.mmap)
+        if self.fd is not None:
+            return os.fstat(self.fd).st_size
+        with self.lock:
+            pos0 = self.fp.tell()
+            self.fp.seek(0, 2)
+            size = self.fp.tell()
+            self.fp.seek(pos0)
+        return size
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size()
+        self.pos = pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, n=-1):
+        if n < 0:
+            n = max(0, self.size() - self.pos)
+        data = self.pread(n, self.pos)
+        self.pos += len(data)
+        return data
+
+    def pread(self, n, pos):
+        """Returns n bytes at pos without moving the view."""
+        if self.mmap is not None:
+            return self.mmap[pos:pos + n]
+        if self.fd is not None:
+            return os.pread(self.fd, n, pos)
+        with self.lock:
+            pos0 = self.fp.tell()
+            self.fp.seek(pos)
+            data = self.fp.read(n)
+            self.fp.seek(pos0)
+        return data
+
+
 class PDFParser(PSStackParser):
     """PDFParser fetch PDF objects from a file stream.
 
@@ -594,13 +1772,86 @@ class PDFParser(PSStackParser):
         parser.set_document(doc)
         parser.seek(offset)
         parser.nextobject()
-    
+
+    With use_mmap=True the whole file is memory-mapped and tokenized
+    in place: seek() only moves the current position and stream bodies
+    are slices of the mapping rather than copies. Files that can't be
+    mapped (pipes, in-memory files) are read in chunks as usual. The
+    mapping is released by close(), or at the end of a with statement;
+    the data of the streams read from it must be used before that.
+
+    With lazy_streams=True the bodies of streams are left in the file
+    until their data is used, and can be dropped again afterwards (see
+    PDFStream.release()).
+
+    A parser keeps its position and tokenizer state, so it can only be
+    used from one thread at a time. fork() makes another one that
+    reads the same file independently.
     """
 
-    def __init__(self, fp):
+    def __init__(self, fp, use_mmap=False, lazy_streams=False):
+        self.rawfp = fp
+        self.lazy_streams = lazy_streams
+        self.mmap = None
+        # the forks of this parser share its mmap, but don't close it.
+        self._own_mmap = False
+        if use_mmap:
+            try:
+                self.mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                self._own_mmap = True
+                fp = self.mmap
+            except (AttributeError, ValueError, EnvironmentError) as e:
+                log.info('cannot mmap %r: %r', fp, e)
         PSStackParser.__init__(self, fp)
         self.doc = None
         self.fallback = False
+        # shared by the forks of this parser.
+        self.fplock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Releases the memory map, if any. The file itself is left open."""
+        PSStackParser.close(self)
+        if self._own_mmap:
+            try:
+                self.mmap.close()
+            except BufferError:
+                # streams still use it; it is unmapped once they are gone.
+                log.info('mmap still in use: %r', self.rawfp)
+            self._own_mmap = False
+
+    def fork(self):
+        """Returns a parser that reads the same file with its own position.
+
+        The new parser has its own tokenizer state and reads the file
+        through a PDFFileView, so it can be used in another thread
+        while this one is used. It has the same document and settings.
+        """
+        parser = copy.copy(self)
+        parser._own_mmap = False
+        PSStackParser.__init__(parser, PDFFileView(self.rawfp, self.fplock, self.mmap))
+        return parser
+
+    def seek(self, pos):
+        if self.mmap is None:
+            PSStackParser.seek(self, pos)
+            return
+        # the whole file is the buffer; mmap.seek() can't go past the end.
+        PSStackParser.seek(self, min(pos, len(self.mmap)))
+        self.buf = self.mmap
+        self.bufpos = 0
+        self.charpos = pos
+
+    def fillbuf(self):
+        if self.mmap is None:
+            PSStackParser.fillbuf(self)
+        elif len(self.buf) <= self.charpos:
+            raise PSEOF('Unexpected EOF')
 
     def set_document(self, doc):
         """Associates the parser with a PDFDocument object."""
@@ -635,7 +1886,7 @@ class PDFParser(PSStackParser):
             # stream object
             ((_, dic),) = self.pop(1)
             dic = dict_value(dic)
-            objlen = 0
+            objlen = None
             if not self.fallback:
                 try:
                     objlen = int_value(dic['Length'])
@@ -648,31 +1899,107 @@ class PDFParser(PSStackParser):
                 handle_error(PDFSyntaxError, 'Unexpected EOF')
                 return
             pos += len(line)
-            self.fp.seek(pos)
-            data = self.fp.read(objlen)
-            self.seek(pos + objlen)
-            while 1:
-                try:
-                    (linepos, line) = self.nextline()
-                except PSEOF:
-                    handle_error(PDFSyntaxError, 'Unexpected EOF')
-                    break
-                if 'endstream' in line:
-                    i = line.index('endstream')
-                    objlen += i
-                    data += line[:i]
-                    break
-                objlen += len(line)
-                data += line
+            objlen = self._streamlen(pos, objlen)
+            if self.mmap is not None:
+                obj = PDFStream(dic, _bufslice(self.mmap, pos, objlen), self.doc.decipher)
+            elif self.lazy_streams:
+                obj = PDFStream(dic, None, self.doc.decipher, source=(self.fp, pos, objlen))
+            else:
+                self.fp.seek(pos)
+                obj = PDFStream(dic, self.fp.read(objlen), self.doc.decipher)
             self.seek(pos+objlen)
             # XXX limit objlen not to exceed object boundary
-            log.debug('Stream: pos=%d, objlen=%d, dic=%r, data=%r...', pos, objlen, dic, data[:10])
-            obj = PDFStream(dic, data, self.doc.decipher)
+            log.debug('Stream: pos=%d, objlen=%d, dic=%r', pos, objlen, dic)
             self.push((pos, obj))
         else:
             # others
             self.push((pos, token))
 
+    def _peek(self, pos, n):
+        """Returns n bytes at pos without moving the parser."""
+        if self.mmap is not None:
+            return self.mmap[pos:pos + n]
+        pos0 = self.fp.tell()
+        self.fp.seek(pos)
+        data = self.fp.read(n)
+        self.fp.seek(pos0)
+        return data
+
+    ENDSTREAM_WINDOW = 65536
+
+    def _find_endstream(self, pos):
+        """Returns the position of the next 'endstream' after pos, or -1."""
+        if self.mmap is not None:
+            return self.mmap.find('endstream', pos)
+        pos0 = self.fp.tell()
+        self.fp.seek(pos)
+        (tail, window) = ('', self.ENDSTREAM_WINDOW)
+        while 1:
+            data = self.fp.read(window)
+            if not data:
+                pos = -1
+                break
+            # the keyword may straddle two windows.
+            i = (tail + data).find('endstream')
+            if 0 <= i:
+                pos += i - len(tail)
+                break
+            pos += len(data)
+            # the windows may be shorter than the keyword.
+            tail = (tail + data)[-8:]
+            window = min(window * 2, 1 << 24)
+        self.fp.seek(pos0)
+        return pos
+
+    def _streamlen(self, pos, objlen):
+        """Returns the length of the stream data that starts at pos.
+
+        objlen (the /Length of the stream, if any) is used when it is
+        followed by 'endstream'. Otherwise the data runs up to the next
+        'endstream', without the end-of-line marker before it.
+        """
+        if objlen is not None and 0 <= objlen:
+            if self._peek(pos + objlen, 32).lstrip(' \t\r\n\f\0').startswith('endstream'):
+                return objlen
+            log.info('invalid /Length: pos=%d, objlen=%d', pos, objlen)
+        end = self._find_endstream(pos)
+        if end < 0:
+            handle_error(PDFSyntaxError, 'Unexpected EOF')
+            self.fp.seek(0, 2)
+            return max(0, self.fp.tell() - pos)
+        eol = self._peek(max(pos, end - 2), end - max(pos, end - 2))
+        if eol.endswith('\r\n'):
+            end -= 2
+        elif eol.endswith('\n') or eol.endswith('\r'):
+            end -= 1
+        return end - pos
+
+    def skipobject(self):
+        """Skips the next object without building it.
+
+        A dictionary that is followed by a stream body is skipped
+        together with the stream. Returns (pos, data) where data is the
+        raw text of the object (without the stream body).
+        """
+        (pos, data) = PSStackParser.skipobject(self)
+        if not data.startswith('<<'):
+            return (pos, data)
+        end = self.tell()
+        try:
+            (_, token) = self.nexttoken()
+        except PSEOF:
+            return (pos, data)
+        if token is not self.KEYWORD_STREAM:
+            self._setpos(end)
+            return (pos, data)
+        i = self._find_endstream(self.tell())
+        if i < 0:
+            self.fp.seek(0, 2)
+            self._setpos(self.fp.tell())
+        else:
+            self._setpos(i + len('endstream'))
+        return (pos, data)
+
     def find_xref(self):
         """Internal function used to locate the first XRef."""
         # search the last xref table by scanning the file backwards.
@@ -766,3 +2093,9 @@ class PDFStreamParser(PDFParser):
             return
         # others
         self.push((pos, token))
+
+
+class _PDFValueParser(PDFParser):
+
+    def flush(self):
+        self.add_results(*self.popall())
@@ -2,13 +2,13 @@
 
 import zlib
 
-from .ascii85 import ascii85decode, asciihexdecode
+from .ascii85 import ASCII85Decoder, ASCIIHexDecoder, ascii85decode, asciihexdecode
 from .ccitt import ccittfaxdecode
-from .lzw import lzwdecode
-from .runlength import rldecode
+from .lzw import LZWDecoder, lzwdecode
+from .runlength import RunLengthDecoder, rldecode
 from .psparser import PSException, PSObject
 from .psparser import LIT, handle_error
-from .utils import apply_png_predictor
+from .predictor import apply_predictor, get_rowsize
 
 
 LITERAL_CRYPT = LIT('Crypt')
@@ -154,16 +154,81 @@ def stream_value(x):
     return x
 
 
+def _iter_inflate(chunks, chunk_size):
+    """Inflates the pieces of a Flate stream as they come."""
+    d = zlib.decompressobj()
+    try:
+        for data in chunks:
+            while data:
+                # bound the output, keeping the rest of the input for later.
+                out = d.decompress(data, chunk_size)
+                if out:
+                    yield out
+                if d.unused_data:
+                    # the stream has ended; ignore what follows.
+                    return
+                data = d.unconsumed_tail
+        out = d.flush()
+    except zlib.error as e:
+        handle_error(PDFException, 'Invalid zlib bytes: %r' % e)
+        return
+    if out:
+        yield out
+
+
+def _iter_decoder(decoder, chunks):
+    """Feeds the pieces of a stream to an incremental decoder."""
+    for data in chunks:
+        data = decoder.decode(data)
+        if data:
+            yield data
+    data = decoder.flush()
+    if data:
+        yield data
+
+
+def _iter_predictor(predictor, chunks):
+    """Undoes a predictor a whole number of rows at a time."""
+    rowsize = get_rowsize(*predictor)
+    (rest, line0) = ('', None)
+    for data in chunks:
+        data = rest + data
+        n = len(data) - len(data) % rowsize
+        rest = data[n:]
+        if n:
+            data = apply_predictor(*(predictor + (data[:n], line0)))
+            line0 = data[len(data) - rowsize + 1:]
+            yield data
+    if rest:
+        yield apply_predictor(*(predictor + (rest, line0)))
+
+
 class PDFStream(PDFObject):
+    """A stream object.
+
+    The raw data is either given, or read on first use from a source
+    (fp, pos, length) in which case the data can be dropped with
+    release() and read again later. If on_decode is set, it is called
+    with the stream once its data is decoded.
+
+    A stream that is shared between threads is given a lock, under
+    which get_data() decodes it only once.
+
+    The raw data of an mmap parser is a slice of the mapping (a buffer
+    or a memoryview), which is copied to a string only when it is read.
+    """
 
-    def __init__(self, attrs, rawdata, decipher=None):
+    def __init__(self, attrs, rawdata, decipher=None, source=None):
         assert isinstance(attrs, dict)
         self.attrs = attrs
         self.rawdata = rawdata
         self.decipher = decipher
+        self.source = source
         self.data = None
         self.objid = None
         self.genno = None
+        self.on_decode = None
+        self.lock = None
 
     def set_objid(self, objid, genno):
         self.objid = objid
@@ -171,7 +236,9 @@ class PDFStream(PDFObject):
 
     def __repr__(self):
         if self.data is None:
-            assert self.rawdata is not None
+            if self.rawdata is None:
+                assert self.source is not None
+                return '<PDFStream(%r): raw=%d, %r>' % (self.objid, self.source[2], self.attrs)
             return '<PDFStream(%r): raw=%d, %r>' % (self.objid, len(self.rawdata), self.attrs)
         else:
             assert self.data is not None
@@ -200,69 +267,191 @@ class PDFStream(PDFObject):
             return filters
         return [filters]
 
+    def _apply_filter(self, f, params, data):
+        """Decodes data with the filter f as a whole."""
+        if f in LITERALS_FLATE_DECODE:
+            # will get errors if the document is encrypted.
+            try:
+                data = zlib.decompress(data)
+            except zlib.error as e:
+                handle_error(PDFException, 'Invalid zlib bytes: %r, %r' % (e, data))
+                data = ''
+        elif f in LITERALS_LZW_DECODE:
+            data = lzwdecode(data, self._get_earlychange(params))
+        elif f in LITERALS_ASCII85_DECODE:
+            data = ascii85decode(data)
+        elif f in LITERALS_ASCIIHEX_DECODE:
+            data = asciihexdecode(data)
+        elif f in LITERALS_RUNLENGTH_DECODE:
+            data = rldecode(data)
+        elif f in LITERALS_DCT_DECODE:
+            # /DCTDecode is essentially a jpeg image. There's nothing to "decode" per se, simply
+            # use the data as jpeg data.
+            pass
+        elif f in LITERALS_CCITTFAX_DECODE:
+            data = ccittfaxdecode(data, params)
+        elif f == LITERAL_CRYPT:
+            # the crypt filter is applied by decipher.
+            pass
+        else:
+            raise PDFNotImplementedError('Unsupported filter: %r' % f)
+        return data
+
+    def _get_earlychange(self, params):
+        if isinstance(params, dict):
+            return int_value(params.get('EarlyChange', 1))
+        return 1
+
+    def _get_predictor(self, params):
+        """Returns (pred, colors, columns, bitspercomponent), or None."""
+        if 'Predictor' not in params:
+            return None
+        pred = int_value(params['Predictor'])
+        if pred == 1:
+            # no predictor
+            return None
+        elif pred == 2 or 10 <= pred:
+            # TIFF or PNG predictor
+            colors = int_value(params.get('Colors', 1))
+            columns = int_value(params.get('Columns', 1))
+            bitspercomponent = int_value(params.get('BitsPerComponent', 8))
+            return (pred, colors, columns, bitspercomponent)
+        else:
+            raise PDFNotImplementedError('Unsupported predictor: %r' % pred)
+
     def decode(self):
-        assert self.data is None and self.rawdata is not None
-        data = self.rawdata
+        data = self.get_rawdata()
+        if data is None:
+            # another thread has just decoded it.
+            assert self.data is not None
+            return self.data
         if self.decipher:
             # Handle encryption
-            data = self.decipher(self.objid, self.genno, data)
-        filters = self.get_filters()
-        if not filters:
-            self.data = data
-            self.rawdata = None
-            return
-        for f in filters:
+            data = self.decipher(self.objid, self.genno, data, self.attrs)
+        for f in self.get_filters():
             params = self.get_any(('DP', 'DecodeParms', 'FDecodeParms'), {})
             if f is None:
                 # Oops, broken reference. use FlateDecode since it's the most popular.
                 f = LIT('FlateDecode')
-            if f in LITERALS_FLATE_DECODE:
-                # will get errors if the document is encrypted.
-                try:
-                    data = zlib.decompress(data)
-                except zlib.error as e:
-                    handle_error(PDFException, 'Invalid zlib bytes: %r, %r' % (e, data))
-                    data = ''
-            elif f in LITERALS_LZW_DECODE:
-                data = lzwdecode(data)
-            elif f in LITERALS_ASCII85_DECODE:
-                data = ascii85decode(data)
-            elif f in LITERALS_ASCIIHEX_DECODE:
-                data = asciihexdecode(data)
-            elif f in LITERALS_RUNLENGTH_DECODE:
-                data = rldecode(data)
-            elif f in LITERALS_DCT_DECODE:
-                # /DCTDecode is essentially a jpeg image. There's nothing to "decode" per se, simply
-                # use the data as jpeg data.
-                pass
-            elif f in LITERALS_CCITTFAX_DECODE:
-                data = ccittfaxdecode(data, params)
-            elif f == LITERAL_CRYPT:
-                # not yet..
-                raise PDFNotImplementedError('/Crypt filter is unsupported')
-            else:
-                raise PDFNotImplementedError('Unsupported filter: %r' % f)
+            data = self._apply_filter(f, params, data)
             # apply predictors
-            if 'Predictor' in params:
-                pred = int_value(params['Predictor'])
-                if pred == 1:
-                    # no predictor
-                    pass
-                elif 10 <= pred:
-                    # PNG predictor
-                    colors = int_value(params.get('Colors', 1))
-                    columns = int_value(params.get('Columns', 1))
-                    bitspercomponent = int_value(params.get('BitsPerComponent', 8))
-                    data = apply_png_predictor(pred, colors, columns, bitspercomponent, data)
-                else:
-                    raise PDFNotImplementedError('Unsupported predictor: %r' % pred)
+            predictor = self._get_predictor(params)
+            if predictor:
+                data = apply_predictor(*(predictor + (data,)))
         self.data = data
         self.rawdata = None
+        if self.on_decode is not None:
+            self.on_decode(self)
+        return data
+
+    def iter_decoded(self, chunk_size=65536, cache_size=0):
+        """Yields the decoded data in pieces.
+
+        Flate, LZW, ASCII85, ASCIIHex and RunLength streams are decoded
+        as they are read, so that only the pieces in flight are held in
+        memory; Flate output comes at most chunk_size bytes at a time.
+        The other filters decode their input as a whole. If the decoded
+        data turns out to be no longer than cache_size, it is kept as
+        get_data() would keep it.
+        """
+        data = self.data
+        rawdata = self.rawdata
+        if data is None and rawdata is None and self.source is None:
+            # another thread has just decoded it.
+            data = self.data
+        if data is None:
+            chunks = self._iter_rawdata(rawdata, chunk_size)
+            for f in self.get_filters():
+                params = self.get_any(('DP', 'DecodeParms', 'FDecodeParms'), {})
+                if f is None:
+                    # Oops, broken reference. use FlateDecode since it's the most popular.
+                    f = LIT('FlateDecode')
+                if f in LITERALS_FLATE_DECODE:
+                    chunks = _iter_inflate(chunks, chunk_size)
+                elif f in LITERALS_LZW_DECODE:
+                    chunks = _iter_decoder(LZWDecoder(early=self._get_earlychange(params)), chunks)
+                elif f in LITERALS_ASCII85_DECODE:
+                    chunks = _iter_decoder(ASCII85Decoder(), chunks)
+                elif f in LITERALS_ASCIIHEX_DECODE:
+                    chunks = _iter_decoder(ASCIIHexDecoder(), chunks)
+                elif f in LITERALS_RUNLENGTH_DECODE:
+                    chunks = _iter_decoder(RunLengthDecoder(), chunks)
+                else:
+                    chunks = [self._apply_filter(f, params, ''.join(chunks))]
+                predictor = self._get_predictor(params)
+                if predictor:
+                    chunks = _iter_predictor(predictor, chunks)
+            kept = []
+            size = 0
+            for chunk in chunks:
+                if kept is not None:
+                    size += len(chunk)
+                    if size <= cache_size:
+                        kept.append(chunk)
+                    else:
+                        kept = None
+                yield chunk
+            if kept is not None:
+                self.data = ''.join(kept)
+                self.rawdata = None
+                if self.on_decode is not None:
+                    self.on_decode(self)
+            return
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def _iter_rawdata(self, rawdata, chunk_size):
+        """Yields the deciphered raw data in pieces."""
+        if rawdata is None:
+            (fp, pos, length) = self.source
+            if not self.decipher:
+                # read it piece by piece, without keeping it.
+                for i in range(0, length, chunk_size):
+                    yield self._read_source(fp, pos + i, min(chunk_size, length - i))
+                return
+            rawdata = self._read_source(fp, pos, length)
+        if self.decipher:
+            # Handle encryption
+            rawdata = self.decipher(self.objid, self.genno, bytes(rawdata), self.attrs)
+        for i in range(0, len(rawdata), chunk_size):
+            yield bytes(rawdata[i:i + chunk_size])
 
     def get_data(self):
-        if self.data is None:
-            self.decode()
-        return self.data
+        # the data is kept in a local, as another thread may release it.
+        data = self.data
+        if data is None:
+            if self.lock is None:
+                data = self.decode()
+            else:
+                with self.lock:
+                    data = self.data
+                    if data is None:
+                        data = self.decode()
+        return data
 
     def get_rawdata(self):
-        return self.rawdata
+        rawdata = self.rawdata
+        if rawdata is None and self.source is not None:
+            (fp, pos, length) = self.source
+            rawdata = self._read_source(fp, pos, length)
+            self.rawdata = rawdata
+        elif rawdata is not None:
+            rawdata = bytes(rawdata)
+        return rawdata
+
+    def _read_source(self, fp, pos, length):
+        if hasattr(fp, 'pread'):
+            # a PDFFileView is read without moving it.
+            return fp.pread(length, pos)
+        # the parser that shares fp expects it to stay where it was.
+        pos0 = fp.tell()
+        fp.seek(pos)
+        data = fp.read(length)
+        fp.seek(pos0)
+        return data
+
+    def release(self):
+        """Drops the data if it can be read again from the source."""
+        if self.source is not None:
+            self.rawdata = None
+            self.data = None
@@ -0,0 +1,279 @@
+#!/usr/bin/env python2
+""" Predictors of the LZWDecode and FlateDecode filters.
+
+PDF Reference 3.3.3: with TIFF Predictor 2, each component is stored
+as the difference from the same component of the pixel on its left.
+With the PNG predictors (10-15), each row starts with a byte telling
+which PNG filter was used for it: None, Sub, Up, Average or Paeth.
+
+Rows are added up as big integers, one lane per byte or component,
+so that Sub, Up and TIFF rows are undone without looping over their
+bytes. If NumPy is installed, it is used for those rows instead.
+
+This code is in the public domain.
+
+"""
+
+from binascii import hexlify, unhexlify
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# the highest bit of each lane, in hex, for each lane width.
+LANE_PATTERNS = {1: 'f', 2: 'a', 4: '8', 8: '80', 16: '8000'}
+
+# rows of Up are added up this many bytes at a time.
+UP_BLOCK_SIZE = 4096
+
+_masks = {}
+
+
+def get_masks(ndigits, width):
+    """Returns (high, low): the highest bits of each lane and the others."""
+    key = (ndigits, width)
+    if key not in _masks:
+        if 64 <= len(_masks):
+            _masks.clear()
+        pattern = LANE_PATTERNS[width]
+        high = int(pattern * (ndigits // len(pattern)), 16)
+        low = ((1 << (ndigits * 4)) - 1) ^ high
+        _masks[key] = (high, low)
+    return _masks[key]
+
+
+def add_lanes(x, y, masks):
+    """Adds x and y lane by lane, dropping the carries out of each lane."""
+    (high, low) = masks
+    return ((x & low) + (y & low)) ^ ((x ^ y) & high)
+
+
+def add_prefix(x, nbits, stride, masks):
+    """Adds to each lane of x all the lanes that are a multiple of
+    stride bits before it, doubling the distance at each step.
+    """
+    (high, low) = masks
+    while stride < nbits:
+        y = x >> stride
+        x = ((x & low) + (y & low)) ^ ((x ^ y) & high)
+        stride *= 2
+    return x
+
+
+def to_int(s):
+    return int(hexlify(s), 16) if s else 0
+
+
+def from_int(x, n):
+    return unhexlify('%0*x' % (n * 2, x))
+
+
+def get_row_sizes(colors, columns, bitspercomponent):
+    """Returns (rowsize, bpp): the bytes of a row and of a pixel."""
+    if bitspercomponent not in (1, 2, 4, 8, 16):
+        # unsupported
+        raise ValueError(bitspercomponent)
+    bits = colors * bitspercomponent
+    return ((bits * columns + 7) // 8, (bits + 7) // 8)
+
+
+def get_rowsize(pred, colors, columns, bitspercomponent):
+    """Returns the bytes of an encoded row, with its PNG filter byte."""
+    (rowsize, _) = get_row_sizes(colors, columns, bitspercomponent)
+    if pred == 2:
+        return rowsize
+    return rowsize + 1
+
+
+def apply_predictor(pred, colors, columns, bitspercomponent, data, line0=None):
+    """Undoes TIFF Predictor 2 or a PNG predictor (10-15)."""
+    if pred == 2:
+        return apply_tiff_predictor(colors, columns, bitspercomponent, data)
+    return apply_png_predictor(pred, colors, columns, bitspercomponent, data, line0)
+
+
+##  Pure Python
+##
+def undo_sub(row, bpp):
+    n = len(row)
+    return from_int(add_prefix(to_int(row), n * 8, bpp * 8, get_masks(n * 2, 8)), n)
+
+
+def undo_up(rows, prev):
+    """Undoes Up on a list of rows below the decoded row prev."""
+    n = len(prev)
+    masks = get_masks(n * 2, 8)
+    if n * 2 > UP_BLOCK_SIZE:
+        # wide rows: one row at a time.
+        y = to_int(prev)
+        for row in rows:
+            y = add_lanes(to_int(row), y, masks)
+            yield from_int(y, n)
+        return
+    # narrow rows: a whole block of rows at a time, as one column sum.
+    nrows = max(1, UP_BLOCK_SIZE // n)
+    for i in range(0, len(rows), nrows):
+        block = [prev] + rows[i:i + nrows]
+        size = len(block) * n
+        x = add_prefix(to_int(''.join(block)), size * 8, n * 8, get_masks(size * 2, 8))
+        data = from_int(x, size)
+        for j in range(n, size, n):
+            yield data[j:j + n]
+        prev = data[-n:]
+
+
+def undo_average(row, prev, bpp):
+    out = bytearray(row)
+    # each byte of a pixel depends only on the same byte of the others.
+    for k in range(bpp):
+        lane = []
+        a = 0
+        for (x, b) in zip(bytearray(row[k::bpp]), bytearray(prev[k::bpp])):
+            a = (x + ((a + b) >> 1)) & 255
+            lane.append(a)
+        out[k::bpp] = lane
+    return bytes(out)
+
+
+def undo_paeth(row, prev, bpp):
+    out = bytearray(row)
+    for k in range(bpp):
+        lane = []
+        a = c = 0
+        for (x, b) in zip(bytearray(row[k::bpp]), bytearray(prev[k::bpp])):
+            pa = abs(b - c)
+            pb = abs(a - c)
+            pc = abs(a + b - c - c)
+            if pa <= pb and pa <= pc:
+                a = (x + a) & 255
+            elif pb <= pc:
+                a = (x + b) & 255
+            else:
+                a = (x + c) & 255
+            c = b
+            lane.append(a)
+        out[k::bpp] = lane
+    return bytes(out)
+
+
+def iter_png_runs(data, rowsize):
+    """Yields (tag, rows) for each run of rows with the same PNG filter."""
+    size = rowsize + 1
+    (tag, rows) = (None, [])
+    for i in range(0, len(data), size):
+        if data[i] != tag:
+            if rows:
+                yield (tag, rows)
+            (tag, rows) = (data[i], [])
+        rows.append(data[i + 1:i + size])
+    if rows:
+        yield (tag, rows)
+
+
+def apply_png_predictor(pred, colors, columns, bitspercomponent, data, line0=None):
+    """Undoes a PNG predictor.
+
+    pred is ignored, as each row tells its own filter. line0 is the
+    decoded row before data, if it is not the first.
+    """
+    (rowsize, bpp) = get_row_sizes(colors, columns, bitspercomponent)
+    # pad a truncated last row, and cut it again at the end.
+    extra = -len(data) % (rowsize + 1)
+    data += '\x00' * extra
+    if line0 is None:
+        line0 = '\x00' * rowsize
+    if numpy is not None and data:
+        data = apply_png_predictor_numpy(rowsize, bpp, data, line0)
+    else:
+        buf = []
+        prev = line0
+        for (tag, rows) in iter_png_runs(data, rowsize):
+            if tag == '\x00':
+                # PNG none
+                pass
+            elif tag == '\x01':
+                # PNG sub
+                rows = [undo_sub(row, bpp) for row in rows]
+            elif tag == '\x02':
+                # PNG up
+                rows = list(undo_up(rows, prev))
+            elif tag == '\x03':
+                # PNG average
+                for (i, row) in enumerate(rows):
+                    rows[i] = prev = undo_average(row, prev, bpp)
+            elif tag == '\x04':
+                # PNG paeth
+                for (i, row) in enumerate(rows):
+                    rows[i] = prev = undo_paeth(row, prev, bpp)
+            else:
+                # unsupported
+                raise ValueError(ord(tag))
+            buf.extend(rows)
+            prev = rows[-1]
+        data = ''.join(buf)
+    return data[:len(data) - extra]
+
+
+def apply_tiff_predictor(colors, columns, bitspercomponent, data):
+    """Undoes TIFF Predictor 2 (horizontal differencing)."""
+    (rowsize, _) = get_row_sizes(colors, columns, bitspercomponent)
+    if numpy is not None and bitspercomponent in (8, 16):
+        return apply_tiff_predictor_numpy(colors, rowsize, bitspercomponent, data)
+    masks = get_masks(rowsize * 2, bitspercomponent)
+    stride = colors * bitspercomponent
+    buf = []
+    for i in range(0, len(data), rowsize):
+        row = data[i:i + rowsize]
+        n = len(row)
+        if n < rowsize:
+            row += '\x00' * (rowsize - n)
+        buf.append(from_int(add_prefix(to_int(row), rowsize * 8, stride, masks), rowsize)[:n])
+    return ''.join(buf)
+
+
+##  NumPy
+##
+def apply_png_predictor_numpy(rowsize, bpp, data, line0):
+    a = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, rowsize + 1)
+    (tags, rows) = (a[:, 0], a[:, 1:].copy())
+    prev = numpy.frombuffer(line0, dtype=numpy.uint8)
+    starts = [0] + list(numpy.flatnonzero(tags[1:] != tags[:-1]) + 1) + [len(tags)]
+    for (i, j) in zip(starts, starts[1:]):
+        tag = tags[i]
+        block = rows[i:j]
+        if tag == 0:
+            # PNG none
+            pass
+        elif tag == 1 and rowsize % bpp:
+            # PNG sub, with pixels across bytes.
+            for k in range(i, j):
+                rows[k] = numpy.frombuffer(undo_sub(rows[k].tobytes(), bpp), dtype=numpy.uint8)
+        elif tag == 1:
+            # PNG sub
+            block = block.reshape(j - i, -1, bpp)
+            rows[i:j] = numpy.cumsum(block, axis=1, dtype=numpy.uint8).reshape(j - i, rowsize)
+        elif tag == 2:
+            # PNG up
+            block[0] += prev
+            rows[i:j] = numpy.cumsum(block, axis=0, dtype=numpy.uint8)
+        elif tag in (3, 4):
+            # PNG average, paeth
+            undo = undo_average if tag == 3 else undo_paeth
+            for k in range(i, j):
+                row = undo(rows[k].tobytes(), prev.tobytes(), bpp)
+                rows[k] = prev = numpy.frombuffer(row, dtype=numpy.uint8)
+        else:
+            # unsupported
+            raise ValueError(tag)
+        prev = rows[j - 1]
+    return rows.tobytes()
+
+
+def apply_tiff_predictor_numpy(colors, rowsize, bitspercomponent, data):
+    dtype = numpy.dtype(numpy.uint8 if bitspercomponent == 8 else '>u2')
+    n = len(data)
+    data += '\x00' * (-n % rowsize)
+    a = numpy.frombuffer(data, dtype=dtype).reshape(-1, rowsize // dtype.itemsize // colors, colors)
+    # the sums are native integers, which may not be big endian.
+    return numpy.cumsum(a, axis=1, dtype=dtype.newbyteorder('=')).astype(dtype).tobytes()[:n]
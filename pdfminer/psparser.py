@@ -2,6 +2,7 @@
 
 import logging
 import re
+from collections import deque
 
 from .utils import choplist
 
@@ -137,13 +138,146 @@ END_STRING = re.compile(r'[()\134]')
 OCT_STRING = re.compile(r'[0-7]')
 ESC_STRING = {'b': 8, 't': 9, 'n': 10, 'f': 12, 'r': 13, '(': 40, ')': 41, '\\': 92}
 
+# Master pattern used by the bulk tokenizer. Each alternative matches one
+# complete token exactly the way the state machine below would read it.
+# Anything it can't handle (nested parens in strings, non-ASCII starters,
+# etc.) is left to the state machine.
+TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<literal>/(?:[^#/%\[\]()<>{}\s]|#[0-9a-fA-F]{0,2})*)|'
+    r'(?P<number>[-+0-9][0-9]*(?:\.[0-9]*)?|\.[0-9]*)|'
+    r'(?P<keyword>[A-Za-z][^#/%\[\]()<>{}\s]*)|'
+    r'(?P<string>\((?:[^()\\]|\\.)*\))|'
+    r'(?P<dictbegin><<)|'
+    r'(?P<hexstring><[\s0-9a-fA-F]*)|'
+    r'(?P<dictend>>>?)|'
+    r'(?P<comment>%[^\r\n]*)|'
+    r'(?P<char>[\x00-\x08\x0e-\x1b!"#$&\'),*:;=?@\[\\\]^_`{|}~\x7f])'
+    r')', re.DOTALL)
+LITERAL_HEX = re.compile(r'#([0-9a-fA-F]{0,2})')
+STRING_ESC = re.compile(r'\\(?:([0-7]{1,3})|(.))', re.DOTALL)
+
+
+def _unescape_literal(m):
+    if m.group(1):
+        return chr(int(m.group(1), 16))
+    return ''
+
+
+def _unescape_string(m):
+    if m.group(1):
+        return chr(int(m.group(1), 8))
+    c = m.group(2)
+    if c in ESC_STRING:
+        return chr(ESC_STRING[c])
+    return ''
+
+
+def _unhex_pair(m):
+    return chr(int(m.group(0), 16))
+
+
+# Patterns used to skip over objects by looking at their delimiters only.
+SKIP_SPACE = re.compile(r'(?:\s+|%[^\r\n]*)+')
+SKIP_ATOM = re.compile(r'[^\s/%()<>\[\]{}]+|/[^\s/%()<>\[\]{}]*')
+SKIP_STRING = re.compile(r'[()\\]')
+
+
+def _skip_object(s, i, depth=0, eof=True):
+    """Finds the extent of the object that starts at s[i:].
+
+    Strings, hex strings and nested arrays, dictionaries and procedures
+    are skipped over by scanning for their delimiters. With depth > 0
+    the scan starts inside that many open brackets and stops after the
+    matching closing one. Returns (start, end), where start is past any
+    leading whitespace and comments, or (start, -1) if s ends before
+    the object does and eof is False.
+    """
+    n = len(s)
+    start = None
+    while 1:
+        m = SKIP_SPACE.match(s, i)
+        if m:
+            i = m.end()
+        if n <= i:
+            break
+        if start is None:
+            start = i
+        c = s[i]
+        if c == '(':
+            paren = 1
+            i += 1
+            while paren:
+                m = SKIP_STRING.search(s, i)
+                if not m:
+                    i = n + 1
+                    break
+                i = m.end()
+                c = m.group(0)
+                if c == '\\':
+                    i += 1
+                elif c == '(':
+                    paren += 1
+                else:
+                    paren -= 1
+            if n < i:
+                break
+        elif c == '<':
+            if n <= i + 1:
+                break
+            if s[i + 1] == '<':
+                depth += 1
+                i += 2
+            else:
+                i = s.find('>', i) + 1
+                if not i:
+                    break
+        elif c == '>':
+            if n <= i + 1 and not eof:
+                break
+            if s[i + 1:i + 2] == '>':
+                i += 1
+            depth -= 1
+            i += 1
+        elif c in '[{':
+            depth += 1
+            i += 1
+        elif c in ']}':
+            depth -= 1
+            i += 1
+        else:
+            m = SKIP_ATOM.match(s, i)
+            i = m.end() if m else i + 1
+            # a name or number may go on in the next chunk.
+            if n <= i and not eof:
+                break
+        if depth <= 0:
+            return (start, i)
+    if start is None:
+        start = n
+    if eof:
+        return (start, n)
+    return (start, -1)
+
 
 class PSBaseParser(object):
-    """Most basic PostScript parser that performs only tokenization."""
+    """Most basic PostScript parser that performs only tokenization.
+
+    By default complete tokens are read from each buffer in batches
+    with the TOKEN pattern and the character-level state machine is
+    only used for tokens that cross a buffer boundary or that the
+    pattern doesn't cover. Set BULK_TOKENIZE to False (on the class
+    or an instance) to use the state machine alone.
+    """
     BUFSIZ = 4096
+    BULK_TOKENIZE = True
+    # the most tokens read ahead at a time, so that random access
+    # doesn't tokenize the rest of a buffer (or a whole mapped file).
+    BULK_TOKENS = 64
 
     def __init__(self, fp):
         self.fp = fp
+        self._tokens = deque()
         self.seek(0)
 
     def __repr__(self):
@@ -156,6 +290,7 @@ class PSBaseParser(object):
         self.flush()
 
     def tell(self):
+        self._sync()
         return self.bufpos + self.charpos
 
     def poll(self, pos=None, n=80):
@@ -178,7 +313,8 @@ class PSBaseParser(object):
         self._parse1 = self._parse_main
         self._curtoken = ''
         self._curtokenpos = 0
-        self._tokens = []
+        self._tokens.clear()
+        self._tokenends = []
 
     def fillbuf(self):
         if self.charpos < len(self.buf):
@@ -190,8 +326,34 @@ class PSBaseParser(object):
             raise PSEOF('Unexpected EOF')
         self.charpos = 0
 
+    def _sync(self):
+        """Moves charpos back to the end of the last token returned.
+
+        The bulk tokenizer reads ahead, so charpos may be past the last
+        token (and tokens may still be queued) when a caller switches to
+        reading raw lines.
+        """
+        if not self._tokenends:
+            return
+        self.charpos = self._tokenends[-len(self._tokens) - 1]
+        self._parse1 = self._parse_main
+        self._tokens.clear()
+        self._tokenends = []
+
+    def _setpos(self, pos):
+        """Moves the read position to pos without resetting the parser."""
+        if self.bufpos <= pos <= self.bufpos + len(self.buf):
+            self.charpos = pos - self.bufpos
+        else:
+            self.fp.seek(pos)
+            (self.bufpos, self.buf, self.charpos) = (pos, '', 0)
+        self._parse1 = self._parse_main
+        self._tokens.clear()
+        self._tokenends = []
+
     def nextline(self):
         """Fetches a next line that ends either with \\r or \\n."""
+        self._sync()
         linebuf = ''
         linepos = self.bufpos + self.charpos
         eol = False
@@ -242,7 +404,79 @@ class PSBaseParser(object):
                 s = s[:n]
                 buf = ''
 
+    def _parse_bulk(self, s, i):
+        """Reads up to BULK_TOKENS complete tokens in s from i with a single pattern.
+
+        Returns the position where the state machine has to take over,
+        or None if no token was found there.
+        """
+        match = TOKEN.match
+        intern_keyword = PSKeywordTable.intern
+        n = len(s)
+        bufpos = self.bufpos
+        limit = self.BULK_TOKENS
+        tokens = []
+        ends = []
+        while len(tokens) < limit:
+            m = match(s, i)
+            # a token that touches the end of the buffer may continue in the next one.
+            if m is None or n <= m.end():
+                break
+            kind = m.lastgroup
+            token = m.group(kind)
+            i = m.end()
+            j = i - len(token)
+            if kind == 'number':
+                try:
+                    if '.' in token:
+                        token = float(token)
+                    else:
+                        token = int(token)
+                except ValueError:
+                    continue
+            elif kind == 'keyword':
+                if token == 'true':
+                    token = True
+                elif token == 'false':
+                    token = False
+                else:
+                    token = intern_keyword(token)
+            elif kind == 'string':
+                token = token[1:-1]
+                if '\\' in token:
+                    token = STRING_ESC.sub(_unescape_string, token)
+            elif kind == 'literal':
+                token = token[1:]
+                if '#' in token:
+                    token = LITERAL_HEX.sub(_unescape_literal, token)
+                token = LIT(token)
+            elif kind == 'char':
+                token = intern_keyword(token)
+            elif kind == 'hexstring':
+                token = HEX_PAIR.sub(_unhex_pair, SPC.sub('', token[1:]))
+            elif kind == 'dictbegin':
+                token = KEYWORD_DICT_BEGIN
+            elif kind == 'dictend':
+                if len(token) == 1:
+                    continue
+                token = KEYWORD_DICT_END
+            else:
+                # We ignore comments.
+                continue
+            tokens.append((bufpos + j, token))
+            ends.append(i)
+        if not tokens:
+            return None
+        self._tokens.extend(tokens)
+        self._tokenends = ends
+        return i
+
     def _parse_main(self, s, i):
+        if self.BULK_TOKENIZE and not self._tokens:
+            j = self._parse_bulk(s, i)
+            if j is not None:
+                return j
+            self._tokenends = []
         m = NONSPC.search(s, i)
         if not m:
             return len(s)
@@ -293,7 +527,7 @@ class PSBaseParser(object):
         m = EOL.search(s, i)
         if not m:
             self._curtoken += s[i:]
-            return self._parse_comment, len(s)
+            return len(s)
         j = m.start(0)
         self._curtoken += s[i:j]
         self._parse1 = self._parse_main
@@ -451,9 +685,24 @@ class PSBaseParser(object):
         while not self._tokens:
             self.fillbuf()
             self.charpos = self._parse1(self.buf, self.charpos)
-        token = self._tokens.pop(0)
-        log.debug('nexttoken: %r', token)
-        return token
+        return self._tokens.popleft()
+
+    def itertokens(self):
+        """Yields (pos, token) tuples until the end of the input.
+
+        Each batch of tokens is handed out straight from the queue.
+        It is fine to seek() or call nextline() between tokens.
+        """
+        tokens = self._tokens
+        while 1:
+            try:
+                while not tokens:
+                    self.fillbuf()
+                    self.charpos = self._parse1(self.buf, self.charpos)
+            except PSEOF:
+                return
+            while tokens:
+                yield tokens.popleft()
 
 
 class PSStackParser(PSBaseParser):
@@ -466,7 +715,7 @@ class PSStackParser(PSBaseParser):
         self.context = []
         self.curtype = None
         self.curstack = []
-        self.results = []
+        self.results = deque()
 
     def seek(self, pos):
         PSBaseParser.seek(self, pos)
@@ -486,7 +735,6 @@ class PSStackParser(PSBaseParser):
         return objs
 
     def add_results(self, *objs):
-        log.debug('add_results: %r', objs)
         self.results.extend(objs)
 
     def start_type(self, pos, type):
@@ -505,6 +753,34 @@ class PSStackParser(PSBaseParser):
     def do_keyword(self, pos, token):
         return
 
+    def skipobject(self):
+        """Skips the next object without building it.
+
+        Arrays, dictionaries and strings are skipped as a whole by
+        looking at their delimiters only, reading ahead as far as
+        needed. Returns (pos, data) where data is the raw text of the
+        object.
+        """
+        self._sync()
+        self._parse1 = self._parse_main
+        self.fillbuf()
+        (s, i, base, eof) = (self.buf, self.charpos, self.bufpos, False)
+        while 1:
+            (start, end) = _skip_object(s, i, 0, eof)
+            if 0 <= end:
+                break
+            # the object crosses the end of the buffer: read some more.
+            self.fp.seek(base + len(s))
+            data = self.fp.read(max(len(s) - i, self.BUFSIZ))
+            if data:
+                (s, base, i) = (s[i:] + data, base + i, 0)
+            else:
+                eof = True
+        (self.buf, self.bufpos, self.charpos) = (s, base, end)
+        if start == end:
+            raise PSEOF('Unexpected EOF')
+        return (base + start, s[start:end])
+
     def nextobject(self):
         """Yields a list of objects.
 
@@ -512,24 +788,26 @@ class PSStackParser(PSBaseParser):
         Arrays and dictionaries are represented as Python lists and dictionaries.
         """
         while not self.results:
-            (pos, token) = self.nexttoken()
-            #print (pos,token), (self.curtype, self.curstack)
+            while not self._tokens:
+                self.fillbuf()
+                self.charpos = self._parse1(self.buf, self.charpos)
+            (pos, token) = self._tokens.popleft()
             if isinstance(token, (int, float, bool, str, PSLiteral)):
                 # normal token
-                self.push((pos, token))
-            elif token == KEYWORD_ARRAY_BEGIN:
+                self.curstack.append((pos, token))
+            elif token is KEYWORD_ARRAY_BEGIN:
                 # begin array
                 self.start_type(pos, 'a')
-            elif token == KEYWORD_ARRAY_END:
+            elif token is KEYWORD_ARRAY_END:
                 # end array
                 try:
                     self.push(self.end_type('a'))
                 except PSTypeError as e:
                     handle_error(type(e), str(e))
-            elif token == KEYWORD_DICT_BEGIN:
+            elif token is KEYWORD_DICT_BEGIN:
                 # begin dictionary
                 self.start_type(pos, 'd')
-            elif token == KEYWORD_DICT_END:
+            elif token is KEYWORD_DICT_END:
                 # end dictionary
                 try:
                     (pos, objs) = self.end_type('d')
@@ -538,24 +816,36 @@ class PSStackParser(PSBaseParser):
                     # construct a Python dictionary.
                     d = dict((literal_name(k), v) for (k,v) in choplist(2, objs) if v is not None)
                     self.push((pos, d))
-                except PSTypeError:
+                except PSTypeError as e:
                     handle_error(type(e), str(e))
-            elif token == KEYWORD_PROC_BEGIN:
+            elif token is KEYWORD_PROC_BEGIN:
                 # begin proc
                 self.start_type(pos, 'p')
-            elif token == KEYWORD_PROC_END:
+            elif token is KEYWORD_PROC_END:
                 # end proc
                 try:
                     self.push(self.end_type('p'))
-                except PSTypeError:
+                except PSTypeError as e:
                     handle_error(type(e), str(e))
             else:
-                log.debug('do_keyword: pos=%r, token=%r, stack=%r', pos, token, self.curstack)
                 self.do_keyword(pos, token)
-            if self.context:
-                continue
-            else:
+            if not self.context:
                 self.flush()
-        obj = self.results.pop(0)
-        log.debug('nextobject: %r', obj)
-        return obj
+        return self.results.popleft()
+
+    def iterobjects(self):
+        """Yields (pos, obj) tuples until the end of the input.
+
+        This gives the same objects as calling nextobject() until PSEOF
+        is raised, but objects that are already parsed are handed out
+        without going through nextobject() again.
+        """
+        while 1:
+            try:
+                obj = self.nextobject()
+            except PSEOF:
+                return
+            yield obj
+            while self.results:
+                yield self.results.popleft()
+
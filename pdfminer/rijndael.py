@@ -1045,6 +1045,89 @@ def rijndaelDecrypt(rk, nrounds, ciphertext):
     return plaintext
 
 
+# Te4 and Td4 masked for each byte of the last round.
+Te4_0 = [x & 0xff000000 for x in Te4]
+Te4_1 = [x & 0x00ff0000 for x in Te4]
+Te4_2 = [x & 0x0000ff00 for x in Te4]
+Te4_3 = [x & 0x000000ff for x in Te4]
+Td4_0 = [x & 0xff000000 for x in Td4]
+Td4_1 = [x & 0x00ff0000 for x in Td4]
+Td4_2 = [x & 0x0000ff00 for x in Td4]
+Td4_3 = [x & 0x000000ff for x in Td4]
+
+
+def rijndaelEncryptCBC(rk, nrounds, iv, plaintext):
+    """Encrypts a whole plaintext in CBC mode.
+
+    The plaintext is a multiple of 16 bytes long (there's no padding).
+    It is unpacked into 32-bit words at once and the rounds work on
+    local variables only, so nothing is allocated per block.
+    """
+    assert len(iv) == 16 and len(plaintext) % 16 == 0
+    n = len(plaintext) // 4
+    words = struct.unpack('>%dI' % n, plaintext)
+    out = [0] * n
+    (T0, T1, T2, T3) = (Te0, Te1, Te2, Te3)
+    (L0, L1, L2, L3) = (Te4_0, Te4_1, Te4_2, Te4_3)
+    (k0, k1, k2, k3) = rk[0:4]
+    rounds = [tuple(rk[p:p + 4]) for p in range(4, 4 * nrounds, 4)]
+    (l0, l1, l2, l3) = rk[4 * nrounds:4 * nrounds + 4]
+    (c0, c1, c2, c3) = struct.unpack('>4I', iv)
+    for b in range(0, n, 4):
+        s0 = words[b] ^ c0 ^ k0
+        s1 = words[b + 1] ^ c1 ^ k1
+        s2 = words[b + 2] ^ c2 ^ k2
+        s3 = words[b + 3] ^ c3 ^ k3
+        for (r0, r1, r2, r3) in rounds:
+            t0 = T0[s0 >> 24] ^ T1[(s1 >> 16) & 0xff] ^ T2[(s2 >> 8) & 0xff] ^ T3[s3 & 0xff] ^ r0
+            t1 = T0[s1 >> 24] ^ T1[(s2 >> 16) & 0xff] ^ T2[(s3 >> 8) & 0xff] ^ T3[s0 & 0xff] ^ r1
+            t2 = T0[s2 >> 24] ^ T1[(s3 >> 16) & 0xff] ^ T2[(s0 >> 8) & 0xff] ^ T3[s1 & 0xff] ^ r2
+            s3 = T0[s3 >> 24] ^ T1[(s0 >> 16) & 0xff] ^ T2[(s1 >> 8) & 0xff] ^ T3[s2 & 0xff] ^ r3
+            s0 = t0
+            s1 = t1
+            s2 = t2
+        c0 = out[b] = L0[s0 >> 24] ^ L1[(s1 >> 16) & 0xff] ^ L2[(s2 >> 8) & 0xff] ^ L3[s3 & 0xff] ^ l0
+        c1 = out[b + 1] = L0[s1 >> 24] ^ L1[(s2 >> 16) & 0xff] ^ L2[(s3 >> 8) & 0xff] ^ L3[s0 & 0xff] ^ l1
+        c2 = out[b + 2] = L0[s2 >> 24] ^ L1[(s3 >> 16) & 0xff] ^ L2[(s0 >> 8) & 0xff] ^ L3[s1 & 0xff] ^ l2
+        c3 = out[b + 3] = L0[s3 >> 24] ^ L1[(s0 >> 16) & 0xff] ^ L2[(s1 >> 8) & 0xff] ^ L3[s2 & 0xff] ^ l3
+    return struct.pack('>%dI' % n, *out)
+
+
+def rijndaelDecryptCBC(rk, nrounds, iv, ciphertext):
+    """Decrypts a whole ciphertext in CBC mode.
+
+    The ciphertext is a multiple of 16 bytes long and the padding (if
+    any) is left to the caller. See rijndaelEncryptCBC().
+    """
+    assert len(iv) == 16 and len(ciphertext) % 16 == 0
+    n = len(ciphertext) // 4
+    words = struct.unpack('>%dI' % n, ciphertext)
+    out = [0] * n
+    (T0, T1, T2, T3) = (Td0, Td1, Td2, Td3)
+    (L0, L1, L2, L3) = (Td4_0, Td4_1, Td4_2, Td4_3)
+    (k0, k1, k2, k3) = rk[0:4]
+    rounds = [tuple(rk[p:p + 4]) for p in range(4, 4 * nrounds, 4)]
+    (l0, l1, l2, l3) = rk[4 * nrounds:4 * nrounds + 4]
+    (p0, p1, p2, p3) = struct.unpack('>4I', iv)
+    for b in range(0, n, 4):
+        (c0, c1, c2, c3) = words[b:b + 4]
+        (s0, s1, s2, s3) = (c0 ^ k0, c1 ^ k1, c2 ^ k2, c3 ^ k3)
+        for (r0, r1, r2, r3) in rounds:
+            t0 = T0[s0 >> 24] ^ T1[(s3 >> 16) & 0xff] ^ T2[(s2 >> 8) & 0xff] ^ T3[s1 & 0xff] ^ r0
+            t1 = T0[s1 >> 24] ^ T1[(s0 >> 16) & 0xff] ^ T2[(s3 >> 8) & 0xff] ^ T3[s2 & 0xff] ^ r1
+            t2 = T0[s2 >> 24] ^ T1[(s1 >> 16) & 0xff] ^ T2[(s0 >> 8) & 0xff] ^ T3[s3 & 0xff] ^ r2
+            s3 = T0[s3 >> 24] ^ T1[(s2 >> 16) & 0xff] ^ T2[(s1 >> 8) & 0xff] ^ T3[s0 & 0xff] ^ r3
+            s0 = t0
+            s1 = t1
+            s2 = t2
+        out[b] = L0[s0 >> 24] ^ L1[(s3 >> 16) & 0xff] ^ L2[(s2 >> 8) & 0xff] ^ L3[s1 & 0xff] ^ l0 ^ p0
+        out[b + 1] = L0[s1 >> 24] ^ L1[(s0 >> 16) & 0xff] ^ L2[(s3 >> 8) & 0xff] ^ L3[s2 & 0xff] ^ l1 ^ p1
+        out[b + 2] = L0[s2 >> 24] ^ L1[(s1 >> 16) & 0xff] ^ L2[(s0 >> 8) & 0xff] ^ L3[s3 & 0xff] ^ l2 ^ p2
+        out[b + 3] = L0[s3 >> 24] ^ L1[(s2 >> 16) & 0xff] ^ L2[(s1 >> 8) & 0xff] ^ L3[s0 & 0xff] ^ l3 ^ p3
+        (p0, p1, p2, p3) = (c0, c1, c2, c3)
+    return struct.pack('>%dI' % n, *out)
+
+
 class RijndaelDecryptor(object):
 
     def __init__(self, key, keybits=256):
@@ -1057,6 +1140,9 @@ class RijndaelDecryptor(object):
         assert len(ciphertext) == 16
         return rijndaelDecrypt(self.rk, self.nrounds, ciphertext)
 
+    def decrypt_cbc(self, iv, ciphertext):
+        return rijndaelDecryptCBC(self.rk, self.nrounds, iv, ciphertext)
+
 
 class RijndaelEncryptor(object):
     
@@ -1069,3 +1155,6 @@ class RijndaelEncryptor(object):
     def encrypt(self, plaintext):
         assert len(plaintext) == 16
         return rijndaelEncrypt(self.rk, self.nrounds, plaintext)
+
+    def encrypt_cbc(self, iv, plaintext):
+        return rijndaelEncryptCBC(self.rk, self.nrounds, iv, plaintext)
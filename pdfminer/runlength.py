@@ -8,6 +8,53 @@ version 1.4 section 3.3.4.
 """
 
 
+class RunLengthDecoder(object):
+    """Incremental RunLength decoder.
+
+    decode() returns the runs it was given in full; a run that crosses
+    the end of the data is kept for the next call.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.eod = False
+
+    def decode(self, data):
+        if self.eod:
+            return ''
+        # the data may be a slice of an mmap (a buffer).
+        data = self.buf + bytes(data)
+        b = bytearray(data)
+        n = len(b)
+        out = bytearray()
+        i = 0
+        while i < n:
+            length = b[i]
+            if length < 128:
+                j = i + length + 2
+                if n < j:
+                    break
+                out += data[i + 1:j]
+                i = j
+            elif length > 128:
+                if n < i + 2:
+                    break
+                out += data[i + 1] * (257 - length)
+                i += 2
+            else:
+                # 128 is the EOD marker.
+                self.eod = True
+                i = n
+                break
+        self.buf = data[i:]
+        return bytes(out)
+
+    def flush(self):
+        """Returns what is left of a truncated literal run."""
+        (data, self.buf) = (self.buf, '')
+        return data[1:]
+
+
 def rldecode(data):
     """RunLength decoder (Adobe version) implementation based on PDF Reference
 
@@ -23,21 +70,5 @@ def rldecode(data):
         denotes EOD.
 
     """
-    decoded = []
-    i = 0
-    while i < len(data):
-        #print "data[%d]=:%d:" % (i,ord(data[i]))
-        length = ord(data[i])
-        if length == 128:
-            break
-        if 0 <= length < 128:
-            run = data[i + 1:(i + 1)+(length + 1)]
-            #print "length=%d, run=%s" % (length+1,run)
-            decoded.append(run)
-            i = (i + 1) + (length + 1)
-        if length > 128:
-            run = data[i + 1] * (257 - length)
-            #print "length=%d, run=%s" % (257-length,run)
-            decoded.append(run)
-            i = (i + 1) + 1
-    return ''.join(decoded)
+    decoder = RunLengthDecoder()
+    return decoder.decode(data) + decoder.flush()
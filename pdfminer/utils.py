@@ -4,50 +4,12 @@
 import struct
 from sys import maxsize as INF
 
+from .predictor import apply_predictor
+
 
 def apply_png_predictor(pred, colors, columns, bitspercomponent, data):
-    if bitspercomponent != 8:
-        # unsupported
-        raise ValueError(bitspercomponent)
-    nbytes = colors * columns * bitspercomponent / 8
-    i = 0
-    buf = []
-    line0 = '\x00' * columns
-    for i in range(0, len(data), nbytes + 1):
-        pred = ord(data[i])
-        line1 = data[i + 1:i + nbytes + 1]
-        if pred != 2:
-            print(repr(pred), repr(line1))
-        if pred == 0:
-            # PNG none
-            pass
-        elif pred == 1:
-            # PNG sub (UNTESTED)
-            l = []
-            c = 0
-            for b in line1:
-                c = (c + ord(b)) & 255
-                l.append(chr(c))
-            line1 = ''.join(l)
-        elif pred == 2:
-            # PNG up
-            line1 = ''.join(
-                chr((ord(a) + ord(b)) & 255) for (a, b) in
-                zip(line0, line1))
-        elif pred == 3:
-            # PNG average (UNTESTED)
-            l = []
-            c = 0
-            for (a, b) in zip(line0, line1):
-                c = ((c + ord(a) + ord(b)) / 2) & 255
-                l.append(chr(c))
-            line1 = ''.join(l)
-        else:
-            # unsupported
-            raise ValueError(pred)
-        buf.append(line1)
-        line0 = line1
-    return ''.join(buf)
+    """Undoes a PNG predictor. Use predictor.apply_predictor() instead."""
+    return apply_predictor(pred, colors, columns, bitspercomponent, data)
 
 
 MATRIX_IDENTITY = (1, 0, 0, 1, 0, 0)
@@ -390,3 +352,25 @@ class cached_property(object):
             return self
         obj.__dict__[self.__name__] = result = self.fget(obj)
         return result
+
+
+class cached_slot(object):
+    """Like cached_property, for classes with __slots__.
+
+    The value is kept in the slot named '_' + the property name.
+    """
+    def __init__(self, fget, doc=None):
+        self.fget = fget
+        self.__doc__ = doc or fget.__doc__
+        self.__name__ = fget.__name__
+        self.slot = '_' + fget.__name__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            result = self.fget(obj)
+            setattr(obj, self.slot, result)
+            return result
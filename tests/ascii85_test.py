@@ -5,7 +5,7 @@
 
 import unittest
 
-from pdfminer.ascii85 import ascii85decode, asciihexdecode
+from pdfminer.ascii85 import ASCII85Decoder, ASCIIHexDecoder, ascii85decode, asciihexdecode
 
 
 class TestAscii85(unittest.TestCase):
@@ -15,12 +15,44 @@ class TestAscii85(unittest.TestCase):
         self.assertEqual('Man is distinguished', ascii85decode('9jqo^BlbD-BleB1DJ+*+F(f,q'))
         self.assertEqual('pleasure.', ascii85decode('E,9)oF*2M7/c~>'))
 
+    def test_ascii85decode_zero(self):
+        """Test ASCII85 decoder with 'z' groups, white-space and data after EOD"""
+        self.assertEqual('\0\0\0\0plea\0\0\0\0sure.', ascii85decode('zE,9)o z\nF*2M7\r\n/c~>E,9)o'))
+
+    def test_ascii85decoder_pieces(self):
+        """Test ASCII85Decoder with the data given a byte at a time"""
+        decoder = ASCII85Decoder()
+        data = '9jqo^BlbD-BleB1DJ+*+F(f,qzE,9)oF*2M7/c~>junk'
+        self.assertEqual('Man is distinguished\0\0\0\0pleasure.', ''.join(decoder.decode(c) for c in data))
+        self.assertEqual('', decoder.flush())
+
+    def test_ascii85decoder_partial(self):
+        """Test ASCII85Decoder flushes a partial group without EOD"""
+        decoder = ASCII85Decoder()
+        self.assertEqual('pleasure', decoder.decode('E,9)oF*2M7/c'))
+        self.assertEqual('.', decoder.flush())
+
+    def test_ascii85decode_buffer(self):
+        """Test ASCII85 decoder with a buffer, as the streams of an mmap parser are"""
+        self.assertEqual('pleasure.', ascii85decode(buffer('xxE,9)oF*2M7/c~>', 2)))
+
     def test_asciihexdecode(self):
         """Test ASCIIHex decoder"""
         self.assertEqual('ab.cde', asciihexdecode('61 62 2e6364   65'))
         self.assertEqual('ab.cdep', asciihexdecode('61 62 2e6364   657>'))
         self.assertEqual('p', asciihexdecode('7>'))
 
+    def test_asciihexdecoder_pieces(self):
+        """Test ASCIIHexDecoder with the data given a byte at a time"""
+        decoder = ASCIIHexDecoder()
+        data = '61 62 2e6\n364   657>6162'
+        self.assertEqual('ab.cdep', ''.join(decoder.decode(c) for c in data))
+        self.assertEqual('', decoder.flush())
+
+    def test_asciihexdecode_buffer(self):
+        """Test ASCIIHex decoder with a buffer, as the streams of an mmap parser are"""
+        self.assertEqual('ab.cdep', asciihexdecode(buffer('xx61 62 2e6364   657>', 2)))
+
 
 if __name__ == '__main__':
     unittest.main()
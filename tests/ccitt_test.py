@@ -5,144 +5,248 @@
 
 import unittest
 
-from pdfminer.ccitt import CCITTG4Parser
+from pdfminer.ccitt import TABLE_BITS, CCITTFaxDecoder, CCITTG4Parser, ccittfaxdecode
 
 
 class TestCCITTG4Parser(unittest.TestCase):
 
+    class Parser(CCITTG4Parser):
+
+        def output_line(self, y, changes):
+            self.lines.append(self._get_line(changes))
+
     def get_parser(self, bits):
-        parser = CCITTG4Parser(len(bits))
-        parser._curline = [int(c) for c in bits]
+        parser = self.Parser(len(bits))
+        parser.lines = []
+        # the changing elements of the line, which starts white.
+        parser._curline = [i for i in range(len(bits)) if bits[i] != (bits[i - 1] if i else '1')]
         parser._reset_line()
         return parser
 
+    def get_code(self, table, v):
+        """Returns the bits of the code of v in table."""
+        for (i, e) in enumerate(table):
+            if e is not None and e[0] == v:
+                return format(i >> (TABLE_BITS - e[1]), '0%db' % e[1])
+        raise KeyError(v)
+
+    def decode(self, parser, bits):
+        """Decodes the codes of bits as a part of the current line."""
+        b = bytearray(int(bits[i:i + 8].ljust(8, '0'), 2) for i in range(0, len(bits), 8))
+        self.assertEqual(parser._decode_line(b + bytearray(4), 0, len(bits)), len(bits))
+
+    def do_vertical(self, parser, dx):
+        self.decode(parser, self.get_code(parser.MODE, dx))
+
+    def do_pass(self, parser):
+        self.decode(parser, self.get_code(parser.MODE, 'p'))
+
+    def do_horizontal(self, parser, n1, n2):
+        tables = (parser.BLACK, parser.WHITE)
+        self.decode(parser, self.get_code(parser.MODE, 'h') + self.get_code(tables[parser._color], n1) +
+                    self.get_code(tables[1 - parser._color], n2))
+
+    def do_uncompressed(self, parser, *codes):
+        """Decodes uncompressed mode with codes: values of UNCOMPRESSED,
+        up to an exit code.
+        """
+        self.decode(parser, self.get_code(parser.MODE, 'u') +
+                    ''.join(self.get_code(parser.UNCOMPRESSED, v) for v in codes))
+
     def test_b1(self):
         parser = self.get_parser('00000')
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 0)
 
     def test_b2(self):
         parser = self.get_parser('10000')
-        parser._do_vertical(-1)
+        self.do_vertical(parser, -1)
         self.assertEqual(parser._curpos, 0)
 
     def test_b3(self):
         parser = self.get_parser('000111')
-        parser._do_pass()
+        self.do_pass(parser)
         self.assertEqual(parser._curpos, 3)
         self.assertEqual(parser._get_bits(), '111')
 
     def test_b4(self):
         parser = self.get_parser('00000')
-        parser._do_vertical(+2)
+        self.do_vertical(parser, +2)
         self.assertEqual(parser._curpos, 2)
         self.assertEqual(parser._get_bits(), '11')
 
     def test_b5(self):
         parser = self.get_parser('11111111100')
-        parser._do_horizontal(0, 3)
+        self.do_horizontal(parser, 0, 3)
         self.assertEqual(parser._curpos, 3)
-        parser._do_vertical(1)
+        self.do_vertical(parser, 1)
         self.assertEqual(parser._curpos, 10)
         self.assertEqual(parser._get_bits(), '0001111111')
 
     def test_e1(self):
         parser = self.get_parser('10000')
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 1)
-        parser._do_vertical(0)
-        self.assertEqual(parser._curpos, 5)
-        self.assertEqual(parser._get_bits(), '10000')
+        self.do_vertical(parser, 0)
+        self.assertEqual(parser.lines, ['10000'])
 
     def test_e2(self):
         parser = self.get_parser('10011')
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 1)
-        parser._do_vertical(2)
-        self.assertEqual(parser._curpos, 5)
-        self.assertEqual(parser._get_bits(), '10000')
+        self.do_vertical(parser, 2)
+        self.assertEqual(parser.lines, ['10000'])
 
     def test_e3(self):
         parser = self.get_parser('011111')
         parser._color = 0
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._color, 1)
         self.assertEqual(parser._curpos, 1)
-        parser._do_vertical(-2)
+        self.do_vertical(parser, -2)
         self.assertEqual(parser._color, 0)
         self.assertEqual(parser._curpos, 4)
-        parser._do_vertical(0)
-        self.assertEqual(parser._curpos, 6)
-        self.assertEqual(parser._get_bits(), '011100')
+        self.do_vertical(parser, 0)
+        self.assertEqual(parser.lines, ['011100'])
 
     def test_e4(self):
         parser = self.get_parser('10000')
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 1)
-        parser._do_vertical(-2)
+        self.do_vertical(parser, -2)
         self.assertEqual(parser._curpos, 3)
-        parser._do_vertical(0)
-        self.assertEqual(parser._curpos, 5)
-        self.assertEqual(parser._get_bits(), '10011')
+        self.do_vertical(parser, 0)
+        self.assertEqual(parser.lines, ['10011'])
 
     def test_e5(self):
         parser = self.get_parser('011000')
         parser._color = 0
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 1)
-        parser._do_vertical(3)
-        self.assertEqual(parser._curpos, 6)
-        self.assertEqual(parser._get_bits(), '011111')
+        self.do_vertical(parser, 3)
+        self.assertEqual(parser.lines, ['011111'])
 
     def test_e6(self):
         parser = self.get_parser('11001')
-        parser._do_pass()
+        self.do_pass(parser)
         self.assertEqual(parser._curpos, 4)
-        parser._do_vertical(0)
-        self.assertEqual(parser._curpos, 5)
-        self.assertEqual(parser._get_bits(), '11111')
+        self.do_vertical(parser, 0)
+        self.assertEqual(parser.lines, ['11111'])
 
     def test_e7(self):
         parser = self.get_parser('0000000000')
         parser._curpos = 2
         parser._color = 1
-        parser._do_horizontal(2, 6)
-        self.assertEqual(parser._curpos, 10)
-        self.assertEqual(parser._get_bits(), '1111000000')
+        self.do_horizontal(parser, 2, 6)
+        self.assertEqual(parser.lines, ['1111000000'])
 
     def test_e8(self):
         parser = self.get_parser('001100000')
         parser._curpos = 1
         parser._color = 0
-        parser._do_vertical(0)
+        self.do_vertical(parser, 0)
         self.assertEqual(parser._curpos, 2)
-        parser._do_horizontal(7, 0)
-        self.assertEqual(parser._curpos, 9)
-        self.assertEqual(parser._get_bits(), '101111111')
+        self.do_horizontal(parser, 7, 0)
+        self.assertEqual(parser.lines, ['101111111'])
 
     def test_m1(self):
         parser = self.get_parser('10101')
-        parser._do_pass()
+        self.do_pass(parser)
         self.assertEqual(parser._curpos, 2)
-        parser._do_pass()
+        self.do_pass(parser)
         self.assertEqual(parser._curpos, 4)
         self.assertEqual(parser._get_bits(), '1111')
 
     def test_m2(self):
         parser = self.get_parser('101011')
-        parser._do_vertical(-1)
-        parser._do_vertical(-1)
-        parser._do_vertical(1)
-        parser._do_horizontal(1, 1)
-        self.assertEqual(parser._get_bits(), '011101')
+        self.do_vertical(parser, -1)
+        self.do_vertical(parser, -1)
+        self.do_vertical(parser, 1)
+        self.do_horizontal(parser, 1, 1)
+        self.assertEqual(parser.lines, ['011101'])
 
     def test_m3(self):
         parser = self.get_parser('10111011')
-        parser._do_vertical(-1)
-        parser._do_pass()
-        parser._do_vertical(1)
-        parser._do_vertical(1)
-        self.assertEqual(parser._get_bits(), '00000001')
+        self.do_vertical(parser, -1)
+        self.do_pass(parser)
+        self.do_vertical(parser, 1)
+        self.do_vertical(parser, 1)
+        self.assertEqual(parser.lines, ['00000001'])
+
+    def test_uncompressed(self):
+        parser = self.get_parser('11111111')
+        self.do_uncompressed(parser, '1110', ('', 0))
+        self.assertEqual(parser._curpos, 4)
+        self.assertEqual(parser._color, 0)
+        self.assertEqual(parser._get_bits(), '1110')
+        self.do_uncompressed(parser, ('', 1))
+        self.assertEqual(parser._curpos, 4)
+        self.assertEqual(parser._color, 1)
+        self.do_uncompressed(parser, '10', ('1', 1))
+        self.assertEqual(parser._curpos, 7)
+        self.assertEqual(parser._color, 1)
+        self.do_vertical(parser, 0)
+        self.assertEqual(parser.lines, ['11101011'])
+
+    def test_partial(self):
+        parser = self.get_parser('11110000')
+        bits = self.get_code(parser.MODE, 'h') + self.get_code(parser.WHITE, 4) + self.get_code(parser.BLACK, 4)
+        for i in range(1, len(bits)):
+            # an incomplete code is left for the next call.
+            b = bytearray(int(bits[j:j + 8].ljust(8, '0'), 2) for j in range(0, len(bits), 8))
+            self.assertEqual(parser._decode_line(b + bytearray(4), 0, i), 0)
+            self.assertEqual(parser.lines, [])
+        self.decode(parser, bits)
+        self.assertEqual(parser.lines, ['11110000'])
+
+
+class TestCCITTFaxDecoder(unittest.TestCase):
+
+    EOL = '000000000001'
+    # two lines of 8 pixels: 4 white then 4 black, and the opposite.
+    LINE1 = '1011' + '011'
+    LINE2 = '00110101' + '011' + '1011'
+    LINE2_2D = '001' + '00110101' + '011' + '1'
+    decoded = '\xf0\x0f'
+
+    def get_bytes(self, bits):
+        bits += '0' * (-len(bits) % 8)
+        return ''.join(chr(int(bits[i:i + 8], 2)) for i in range(0, len(bits), 8))
+
+    def test_group4(self):
+        data = self.get_bytes('001' + self.LINE1 + self.LINE2_2D + self.EOL * 2)
+        self.assertEqual(self.decoded, ccittfaxdecode(data, {'K': -1, 'Columns': 8}))
+        self.assertEqual('\x0f\xf0', ccittfaxdecode(data, {'K': -1, 'Columns': 8, 'BlackIs1': True}))
+        self.assertEqual(self.decoded[:1], ccittfaxdecode(data, {'K': -1, 'Columns': 8, 'Rows': 1}))
+
+    def test_group4_bytealign(self):
+        data = self.get_bytes('001' + self.LINE1 + '000000' + self.LINE2_2D + '0')
+        self.assertEqual(self.decoded, ccittfaxdecode(data, {'K': -1, 'Columns': 8, 'EncodedByteAlign': True}))
+
+    def test_group3_1d(self):
+        data = self.get_bytes(self.EOL + self.LINE1 + '0000' + self.EOL + self.LINE2 + self.EOL * 6)
+        self.assertEqual(self.decoded, ccittfaxdecode(data, {'K': 0, 'Columns': 8}))
+        data = self.get_bytes(self.LINE1 + self.LINE2)
+        self.assertEqual(self.decoded, ccittfaxdecode(data, {'Columns': 8}))
+
+    def test_group3_2d(self):
+        data = self.get_bytes(self.EOL + '1' + self.LINE1 + self.EOL + '0' + self.LINE2_2D + (self.EOL + '1') * 6)
+        self.assertEqual(self.decoded, ccittfaxdecode(data, {'K': 2, 'Columns': 8}))
+
+    def test_pieces(self):
+        data = self.get_bytes('001' + self.LINE1 + self.LINE2_2D + self.EOL * 2)
+        decoder = CCITTFaxDecoder(8)
+        for c in data:
+            decoder.feedbytes(c)
+        self.assertEqual(self.decoded, decoder.close())
+
+    def test_buffer(self):
+        data = self.get_bytes('001' + self.LINE1 + self.LINE2_2D + self.EOL * 2)
+        self.assertEqual(self.decoded, ccittfaxdecode(buffer('xx' + data, 2), {'K': -1, 'Columns': 8}))
+
+    def test_invalid(self):
+        data = self.get_bytes('0000001000' + '1' * 16)
+        self.assertRaises(CCITTG4Parser.InvalidData, ccittfaxdecode, data, {'K': -1, 'Columns': 8})
 
 
 if __name__ == '__main__':
@@ -1,11 +1,12 @@
 #!/usr/bin/env python2
-""" Unit tests for ASCII85/ASCIIHex decoder (Adobe version).
+""" Unit tests for the LZW decoder.
 
 """
 
 import unittest
+from io import BytesIO
 
-from pdfminer.lzw import lzwdecode
+from pdfminer.lzw import LZWDecoder, lzwdecode
 
 
 class TestLZW(unittest.TestCase):
@@ -21,6 +22,44 @@ class TestLZW(unittest.TestCase):
         self.assertEqual(self.decoded, lzwdecode('\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01\xff\xff'))
         self.assertEqual('', lzwdecode('\x80\x80\r\n'))
 
+    def test_lzwdecoder_pieces(self):
+        """Test LZWDecoder with the data given a byte at a time"""
+        decoder = LZWDecoder()
+        data = '\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'
+        self.assertEqual(self.decoded, ''.join(decoder.decode(c) for c in data))
+
+    def test_lzwdecoder_run(self):
+        """Test LZWDecoder with a file object, as the previous decoder took"""
+        data = '\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'
+        self.assertEqual(self.decoded, ''.join(LZWDecoder(BytesIO(data)).run()))
+        self.assertEqual('', ''.join(LZWDecoder(BytesIO('')).run()))
+
+    def test_lzwdecode_buffer(self):
+        """Test lzwdecode with a buffer, as the streams of an mmap parser are"""
+        data = 'xx\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'
+        self.assertEqual(self.decoded, lzwdecode(buffer(data, 2)))
+
+    def pack(self, codes, early):
+        """Packs codes as an LZW encoder with the given EarlyChange would."""
+        (bits, nbits, size) = (0, 0, 258)
+        for (i, code) in enumerate(codes):
+            width = 9
+            while width < 12 and (1 << width) <= size + early:
+                width += 1
+            (bits, nbits) = ((bits << width) | code, nbits + width)
+            if 1 < i:
+                size += 1
+        bits <<= -nbits % 8
+        return ('%0*x' % ((nbits + 7) // 8 * 2, bits)).decode('hex')
+
+    def test_lzwdecode_earlychange(self):
+        """Test the EarlyChange parameter"""
+        codes = [256] + [i % 256 for i in range(600)] + [257]
+        data = ''.join(chr(i % 256) for i in range(600))
+        self.assertEqual(data, lzwdecode(self.pack(codes, 1)))
+        self.assertEqual(data, lzwdecode(self.pack(codes, 0), 0))
+        self.assertNotEqual(data, lzwdecode(self.pack(codes, 0)))
+
 
 if __name__ == '__main__':
     unittest.main()
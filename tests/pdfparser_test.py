@@ -0,0 +1,1220 @@
+#!/usr/bin/env python2
+""" Unit tests for pdfparser.py
+
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+import zlib
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+
+from pdfminer import psparser
+from pdfminer.arcfour import Arcfour
+from pdfminer.dumppdf import dumpoutline
+from pdfminer.pdfdevice import PDFDevice, TagExtractor
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager, process_pdf
+from pdfminer.pdfparser import PDFCachedXRef, PDFDestinationNotFound, PDFDocument, PDFEncryptionError, PDFLRUObjCache
+from pdfminer.pdfparser import PDFNoOutlines, PDFNoValidXRef, PDFParser, PDFPasswordIncorrect, PDFSyntaxError
+from pdfminer.pdfparser import PDFXRef, PDFXRefCache, PDFXRefIndex, _objsize
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import KWD, PSEOF
+from pdfminer.rijndael import RijndaelEncryptor
+
+
+def make_pdf(objs, trailer='/Root 1 0 R', xref=True, streamed=None):
+    """Returns a PDF file made of objs, a dict of objid to the text of
+    each object. Without xref, the file has no XRef table at all. With
+    streamed, a dict of objid to (strmid, index) for the objects in
+    object streams, the XRef is a stream.
+    """
+    out = ['%PDF-1.4\n']
+    offsets = {}
+    pos = len(out[0])
+    for objid in sorted(objs):
+        offsets[objid] = pos
+        out.append('%d 0 obj\n%s\nendobj\n' % (objid, objs[objid]))
+        pos += len(out[-1])
+    size = max(objs) + 1
+    if streamed:
+        size = max(size, max(streamed) + 1)
+        entries = []
+        for objid in range(size):
+            if objid in offsets:
+                entries.append(struct.pack('>BLH', 1, offsets[objid], 0))
+            elif objid in streamed:
+                entries.append(struct.pack('>BLH', 2, *streamed[objid]))
+            else:
+                entries.append(struct.pack('>BLH', 0, 0, 0))
+        out.append('%d 0 obj\n%s\nendobj\nstartxref\n%d\n%%%%EOF\n' %
+                   (size, stream(''.join(entries), '/Type /XRef /Size %d /W [1 4 2] %s ' % (size, trailer)), pos))
+        return ''.join(out)
+    if not xref:
+        out.append('trailer\n<< /Size %d %s >>\n%%%%EOF\n' % (size, trailer))
+        return ''.join(out)
+    out.append('xref\n0 %d\n0000000000 65535 f \n' % size)
+    for objid in range(1, size):
+        if objid in offsets:
+            out.append('%010d 00000 n \n' % offsets[objid])
+        else:
+            out.append('0000000000 00000 f \n')
+    out.append('trailer\n<< /Size %d %s >>\nstartxref\n%d\n%%%%EOF\n' % (size, trailer, pos))
+    return ''.join(out)
+
+
+def stream(data, attrs=''):
+    return '<< %s/Length %d >>\nstream\n%s\nendstream' % (attrs, len(data), data)
+
+
+def objstm(objs, attrs=''):
+    """Returns the text of an object stream that holds objs."""
+    (header, body) = ([], '')
+    for objid in sorted(objs):
+        header.append('%d %d' % (objid, len(body)))
+        body += objs[objid] + '\n'
+    header = ' '.join(header) + '\n'
+    return stream(header + body, '/Type /ObjStm /N %d /First %d %s' % (len(objs), len(header), attrs))
+
+
+def open_pdf(fp, password='', **kwargs):
+    parser = PDFParser(fp)
+    doc = PDFDocument(**kwargs)
+    parser.set_document(doc)
+    doc.set_parser(parser)
+    doc.initialize(password)
+    return doc
+
+
+class TestPDFParser(unittest.TestCase):
+
+    objs = {
+        1: '<< /Type /Catalog /Pages 2 0 R >>',
+        2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        3: '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+        4: stream('BT /F1 12 Tf (Hello) Tj ET'),
+        5: '[1 2.5 (a \\) string) /Name <414243> true null 3 0 R]',
+    }
+
+    def get_path(self, data):
+        (fd, path) = tempfile.mkstemp(suffix='.pdf')
+        os.write(fd, data)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def get_tokens(self, parser, pos):
+        parser.seek(pos)
+        r = []
+        try:
+            while 1:
+                r.append(parser.nexttoken())
+        except PSEOF:
+            pass
+        return r
+
+    def test_skipobject(self):
+        """Test skipping dictionaries together with their stream bodies"""
+        body = '(>> endobj [ << ) stream\nend'
+        data = ('1 0 obj\n' + stream(body, '/A (>>) ') + '\nendobj\n'
+                '2 0 obj\n<< /B [1 2] >>\nendobj\n3 0 obj\n<< /Length 5 >>\nstream\nabc')
+        for use_mmap in (False, True):
+            fp = open(self.get_path(data), 'rb')
+            self.addCleanup(fp.close)
+            parser = PDFParser(fp, use_mmap=use_mmap)
+            parser.seek(8)
+            self.assertEqual(parser.skipobject(), (8, '<< /A (>>) /Length %d >>' % len(body)))
+            self.assertEqual(parser.nexttoken(), (data.index('\nendobj') + 1, KWD('endobj')))
+            parser.seek(data.index('2 0 obj') + 8)
+            self.assertEqual(parser.skipobject(), (data.index('<< /B'), '<< /B [1 2] >>'))
+            self.assertEqual(parser.nexttoken()[1], KWD('endobj'))
+            # a stream without endstream runs to the end of the file.
+            parser.seek(data.index('<< /Length 5'))
+            parser.skipobject()
+            self.assertRaises(PSEOF, parser.nexttoken)
+            parser.close()
+
+    def get_stream(self, length, body, tail='\nendstream', use_mmap=False, window=None):
+        """Returns the raw data of a stream with the given /Length."""
+        objs = dict(self.objs)
+        objs[4] = '<< /Length %s >>\nstream\n%s%s' % (length, body, tail)
+        objs[6] = str(len(body))
+        with open(self.get_path(make_pdf(objs)), 'rb') as fp:
+            with PDFParser(fp, use_mmap=use_mmap) as parser:
+                if window:
+                    parser.ENDSTREAM_WINDOW = window
+                doc = PDFDocument()
+                parser.set_document(doc)
+                doc.set_parser(parser)
+                doc.initialize()
+                return str(doc.getobj(4).get_rawdata())
+
+    def test_streamlen(self):
+        """Test that the stream data ends at the right place whether or not /Length is right"""
+        body = 'BT (a) Tj ET\nBT (b) Tj ET'
+        n = len(body)
+        for use_mmap in (False, True):
+            for window in (None, 4, 16):
+                for (length, data, tail, expected) in [
+                    (n, body, '\nendstream', body),
+                    # /Length is trusted as long as it is followed by endstream.
+                    (n, body + 'endstream', '\nendstream', body),
+                    (n, body, '\r\n  endstream', body),
+                    # too short or too long.
+                    (n - 5, body, '\nendstream', body),
+                    (n + 3, body, '\nendstream', body),
+                    (n + 100, body, '\nendstream', body),
+                    (100000, body, '\nendstream', body),
+                    (-1, body, '\nendstream', body),
+                    (0, body, '\r\nendstream', body),
+                    ('(x)', body, '\rendstream', body),
+                    (n - 1, body + 'endstream', '\nendstream', body),
+                    # an indirect reference, or one to nothing.
+                    ('6 0 R', body, '\nendstream', body),
+                    ('6 0 R', body + 'x', '\nendstream', body + 'x'),
+                    ('99 0 R', body, '\nendstream', body),
+                    ('99 0 R', '', 'endstream', ''),
+                    ('6 0 R', '', '\nendstream', ''),
+                    ]:
+                    self.assertEqual(self.get_stream(length, data, tail, use_mmap, window), expected)
+        # without endstream, the data runs up to the end of the file.
+        self.addCleanup(setattr, psparser, 'STRICT', psparser.STRICT)
+        data = 'stream\n' + body + '\nendobj\n'
+        for use_mmap in (False, True):
+            with open(self.get_path(data), 'rb') as fp:
+                with PDFParser(fp, use_mmap=use_mmap) as parser:
+                    psparser.STRICT = False
+                    self.assertEqual(parser._streamlen(7, n - 5), len(data) - 7)
+                    self.assertEqual(parser._streamlen(7, None), len(data) - 7)
+                    psparser.STRICT = True
+                    self.assertRaises(PDFSyntaxError, parser._streamlen, 7, n - 5)
+
+    def test_find_endstream(self):
+        """Test that endstream is found across the windows read from the file"""
+        data = 'x' * 37 + 'endstream' + 'y' * 50 + 'endstream\n'
+        for use_mmap in (False, True):
+            with open(self.get_path(data), 'rb') as fp:
+                with PDFParser(fp, use_mmap=use_mmap) as parser:
+                    for window in (1, 3, 8, 9, 10, 16, 65536):
+                        parser.ENDSTREAM_WINDOW = window
+                        parser.seek(5)
+                        for (pos, expected) in ((0, 37), (30, 37), (37, 37), (38, 96), (96, 96), (97, -1),
+                                                (len(data), -1), (len(data) + 10, -1)):
+                            self.assertEqual(parser._find_endstream(pos), expected)
+                        # the parser is left where it was.
+                        self.assertEqual(parser.nexttoken(), (5, KWD('x' * 32 + 'endstream' + 'y' * 50 +
+                                                                   'endstream')))
+
+    def test_mmap(self):
+        """Test that the mmap parser reads the same tokens and objects as the buffered one"""
+        data = make_pdf(self.objs)
+        path = self.get_path(data)
+        with open(path, 'rb') as fp1:
+            with open(path, 'rb') as fp2:
+                parser1 = PDFParser(fp1)
+                parser2 = PDFParser(fp2, use_mmap=True)
+                self.assertEqual(parser1.mmap, None)
+                self.assertNotEqual(parser2.mmap, None)
+                for pos in (0, data.index('5 0 obj'), data.index('xref'), len(data) - 5, len(data) + 10):
+                    self.assertEqual(self.get_tokens(parser1, pos), self.get_tokens(parser2, pos))
+                doc1 = PDFDocument()
+                doc2 = PDFDocument()
+                for (parser, doc) in ((parser1, doc1), (parser2, doc2)):
+                    parser.set_document(doc)
+                    doc.set_parser(parser)
+                    doc.initialize()
+                self.assertEqual(list(doc1._index.get_objids()), list(doc2._index.get_objids()))
+                for objid in (1, 2, 3, 5):
+                    self.assertEqual(repr(doc1.getobj(objid)), repr(doc2.getobj(objid)))
+                (strm1, strm2) = (doc1.getobj(4), doc2.getobj(4))
+                self.assertTrue(isinstance(strm2, PDFStream))
+                # the mmap stream is a slice of the file, not a copy, but
+                # it is read as a string.
+                self.assertFalse(isinstance(strm2.rawdata, bytes))
+                self.assertEqual(strm2.get_rawdata(), strm1.rawdata)
+                self.assertEqual(strm2.get_data(), 'BT /F1 12 Tf (Hello) Tj ET')
+                parser2.close()
+                self.assertRaises(ValueError, parser2.mmap.read, 1)
+
+    def check_mmap_stream(self, raw, attrs, expected):
+        """Checks that a stream of an mmap parser, with raw as its data,
+        decodes to expected, as a whole and in pieces.
+        """
+        objs = dict(self.objs)
+        objs[4] = stream(raw, attrs)
+        with open(self.get_path(make_pdf(objs)), 'rb') as fp:
+            with PDFParser(fp, use_mmap=True) as parser:
+                doc = PDFDocument()
+                parser.set_document(doc)
+                doc.set_parser(parser)
+                doc.initialize()
+                strm = doc.getobj(4)
+                self.assertFalse(isinstance(strm.rawdata, bytes))
+                self.assertEqual(''.join(strm.iter_decoded(chunk_size=3)), expected)
+                self.assertEqual(strm.get_data(), expected)
+                del strm
+
+    def test_mmap_filters(self):
+        """Test unfiltered, Flate, DCT and Crypt streams of an mmap parser"""
+        self.check_mmap_stream('BT /F1 12 Tf (Hello) Tj ET', '', 'BT /F1 12 Tf (Hello) Tj ET')
+        rows = ''.join('\x00' + chr(i) * 3 for i in range(256))
+        self.check_mmap_stream(zlib.compress(rows), '/Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 3 >> ',
+                               ''.join(chr(i) * 3 for i in range(256)))
+        self.check_mmap_stream(zlib.compress('Hello').encode('hex') + '>', '/Filter [/AHx /Fl] ', 'Hello')
+        jpeg = '\xff\xd8\xff\xe0 not quite a jpeg'
+        self.check_mmap_stream(jpeg, '/Filter /DCTDecode ', jpeg)
+        self.check_mmap_stream('Hello', '/Filter /Crypt ', 'Hello')
+
+    def test_mmap_lzw(self):
+        """Test LZWDecode streams of an mmap parser"""
+        self.check_mmap_stream('\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01', '/Filter /LZWDecode ', '-----A---B')
+
+    def test_mmap_ascii85(self):
+        """Test ASCII85Decode streams of an mmap parser"""
+        self.check_mmap_stream('9jqo^BlbD-BleB1DJ+*+F(f,q~>', '/Filter /ASCII85Decode ', 'Man is distinguished')
+
+    def test_mmap_asciihex(self):
+        """Test ASCIIHexDecode streams of an mmap parser"""
+        self.check_mmap_stream('61 62 2e6364   657>', '/Filter /ASCIIHexDecode ', 'ab.cdep')
+
+    def test_mmap_runlength(self):
+        """Test RunLengthDecode streams of an mmap parser"""
+        self.check_mmap_stream('\x05123456\xfa7\x04abcde\x80', '/Filter /RunLengthDecode ', '1234567777777abcde')
+
+    def test_mmap_ccittfax(self):
+        """Test CCITTFaxDecode streams of an mmap parser"""
+        self.check_mmap_stream('6\xc9\xab\x80\x08\x00\x80',
+                               '/Filter /CCITTFaxDecode /DecodeParms << /K -1 /Columns 8 >> ', '\xf0\x0f')
+
+    def test_lazy_streams(self):
+        """Test that lazy streams are read from the file when used, and again after release()"""
+        data = make_pdf(self.objs)
+        fp = BytesIO(data)
+        doc = open_pdf(fp)
+        doc._parser.lazy_streams = True
+        strm = doc.getobj(4)
+        self.assertEqual(strm.rawdata, None)
+        (_, pos, length) = strm.source
+        self.assertEqual(data[pos:pos + length], 'BT /F1 12 Tf (Hello) Tj ET')
+        # reading the stream doesn't move the parser.
+        fp.seek(10)
+        self.assertEqual(strm.get_rawdata(), 'BT /F1 12 Tf (Hello) Tj ET')
+        self.assertEqual(fp.tell(), 10)
+        strm.release()
+        self.assertEqual((strm.rawdata, strm.data), (None, None))
+        self.assertEqual(strm.get_data(), 'BT /F1 12 Tf (Hello) Tj ET')
+        self.assertEqual(strm.rawdata, None)
+        strm.release()
+        self.assertEqual(strm.data, None)
+        self.assertEqual(strm.get_rawdata(), 'BT /F1 12 Tf (Hello) Tj ET')
+        self.assertEqual(''.join(strm.iter_decoded(chunk_size=4)), 'BT /F1 12 Tf (Hello) Tj ET')
+        self.assertEqual(repr(doc.getobj(5)), repr(open_pdf(BytesIO(data)).getobj(5)))
+        # the streams of an mmap parser are slices of the mapping instead.
+        with open(self.get_path(data), 'rb') as fp:
+            with PDFParser(fp, use_mmap=True, lazy_streams=True) as parser:
+                doc = PDFDocument()
+                parser.set_document(doc)
+                doc.set_parser(parser)
+                doc.initialize()
+                strm = doc.getobj(4)
+                self.assertEqual(strm.source, None)
+                self.assertEqual(strm.get_data(), 'BT /F1 12 Tf (Hello) Tj ET')
+                del strm
+
+    def test_mmap_close(self):
+        """Test that a with statement unmaps the file, but not its forks"""
+        path = self.get_path(make_pdf(self.objs))
+        with open(path, 'rb') as fp:
+            with PDFParser(fp, use_mmap=True) as parser:
+                fork = parser.fork()
+                fork.close()
+                self.assertEqual(parser.mmap[:8], '%PDF-1.4')
+            self.assertRaises(ValueError, parser.mmap.read, 1)
+        # files that can't be mapped are read as usual.
+        parser = PDFParser(BytesIO(make_pdf(self.objs)), use_mmap=True)
+        self.assertEqual(parser.mmap, None)
+        parser.close()
+
+
+class TestPDFXRef(unittest.TestCase):
+
+    class SlowPDFXRef(PDFXRef):
+        """Reads every entry line by line."""
+
+        def load_entries(self, parser, start, nobjs):
+            return False
+
+    def load(self, data, cls=PDFXRef):
+        parser = PDFParser(BytesIO(data))
+        parser.seek(len('xref\n'))
+        xref = cls()
+        xref.load(parser)
+        return xref
+
+    def check_xref(self, data, offsets):
+        xref = self.load(data)
+        self.assertEqual(xref.offsets, offsets)
+        self.assertEqual(xref.trailer, {'Size': 9})
+        slow = self.load(data, self.SlowPDFXRef)
+        self.assertEqual(slow.offsets, offsets)
+        self.assertEqual(slow.trailer, xref.trailer)
+
+    def make_xref(self, subsections, eol=' \n'):
+        lines = ['xref\n']
+        for (start, entries) in subsections:
+            lines.append('%d %d\n' % (start, len(entries)))
+            lines.extend('%010d %05d %s%s' % (pos, genno, use, eol) for (pos, genno, use) in entries)
+        lines.append('trailer\n<< /Size 9 >>\n')
+        return ''.join(lines)
+
+    subsections = [
+        (0, [(0, 65535, 'f'), (17, 0, 'n'), (81, 0, 'n'), (0, 1, 'f')]),
+        (6, [(1234567890, 2, 'n'), (99, 0, 'n')]),
+    ]
+    offsets = {1: (0, 17), 2: (0, 81), 6: (2, 1234567890), 7: (0, 99)}
+
+    def test_load_entries(self):
+        """Test reading XRef subsections in bulk with every end of line the spec allows"""
+        for eol in (' \n', ' \r', '\r\n'):
+            data = self.make_xref(self.subsections, eol)
+            self.check_xref(data, self.offsets)
+            parser = PDFParser(BytesIO(data))
+            parser.seek(len('xref\n0 4\n'))
+            self.assertTrue(PDFXRef().load_entries(parser, 0, 4))
+            self.assertEqual(parser.nextline()[1], '6 2\n')
+
+    def test_load_entries_fallback(self):
+        """Test that malformed subsections are read line by line"""
+        # entries ending in a single \r or \n are 19 bytes long.
+        for eol in ('\r', '\n'):
+            data = self.make_xref(self.subsections, eol)
+            self.check_xref(data, self.offsets)
+            parser = PDFParser(BytesIO(data))
+            parser.seek(len('xref\n0 4\n'))
+            self.assertFalse(PDFXRef().load_entries(parser, 0, 4))
+            # the parser is left where it was.
+            self.assertEqual(parser.nextline()[1], '0000000000 65535 f' + eol)
+        # an offset that is one digit short, in the second subsection only.
+        data = self.make_xref(self.subsections).replace('0000000099 00000 n', '000000099 00000 n')
+        self.check_xref(data, self.offsets)
+        # an unknown type of entry is not in use.
+        data = self.make_xref(self.subsections).replace('0000000081 00000 n', '0000000081 00000 x')
+        offsets = dict(self.offsets)
+        del offsets[2]
+        self.check_xref(data, offsets)
+        # a subsection that is longer than the table.
+        data = self.make_xref([(0, [(0, 65535, 'f'), (17, 0, 'n')])]).replace('0 2\n', '0 3\n')
+        self.assertRaises(PDFNoValidXRef, self.load, data)
+        self.assertRaises(PDFNoValidXRef, self.load, data, self.SlowPDFXRef)
+
+    def test_load_fallback_objstm(self):
+        """Test that a damaged XRef is rebuilt with the objects of object streams"""
+        objs = {
+            3: '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+            4: stream('BT (Hello) Tj ET'),
+            10: objstm({
+                1: '<< /Type /Catalog /Pages 2 0 R >>',
+                2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+                3: '<< /Type /Page /Parent 2 0 R >>',
+                5: '(only in a stream)',
+            }),
+        }
+        good = make_pdf(objs)
+        for data in (good.replace('startxref\n%d' % good.index('xref\n'), 'startxref\n99999'),
+                     make_pdf(objs, xref=False)):
+            doc = open_pdf(BytesIO(data))
+            self.assertTrue(doc._parser.fallback)
+            self.assertEqual(doc.catalog['Pages'].objid, 2)
+            self.assertEqual(doc.getobj(2)['Count'], 1)
+            self.assertEqual(doc.getobj(5), 'only in a stream')
+            # an object that is also written out of the stream is read from the file.
+            self.assertEqual(doc._index.get_pos(3), (None, data.index('3 0 obj')))
+            pages = list(doc.get_pages())
+            self.assertEqual(len(pages), 1)
+            self.assertEqual(pages[0].mediabox, [0, 0, 612, 792])
+            self.assertEqual(pages[0].contents[0].get_data(), 'BT (Hello) Tj ET')
+
+
+class TestObjStm(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, psparser, 'STRICT', psparser.STRICT)
+
+    def open(self, header, body, n, streamed):
+        objs = {
+            1: '<< /Type /Catalog >>',
+            10: stream(header + body, '/Type /ObjStm /N %d /First %d ' % (n, len(header))),
+        }
+        return open_pdf(BytesIO(make_pdf(objs, streamed=streamed)), caching=False)
+
+    body = '(one)     [2 (two)] (three) '
+    streamed = {2: (10, 1), 3: (10, 2), 4: (10, 0)}
+
+    def test_spans(self):
+        """Test objects whose offsets in an object stream are not in order"""
+        doc = self.open('4 20 2 0 3 10\n', self.body, 3, self.streamed)
+        self.assertEqual(doc.getobj(2), 'one')
+        self.assertEqual(doc.getobj(3), [2, 'two'])
+        self.assertEqual(doc.getobj(4), 'three')
+        (data, spans) = doc._get_objstm(10)
+        self.assertEqual([data[start:end] for (start, end) in spans],
+                         ['(three) ', '(one)     ', '[2 (two)] '])
+
+    def test_short_header(self):
+        """Test an object stream whose N is larger than its header"""
+        streamed = dict(self.streamed)
+        streamed[5] = (10, 3)
+        for header in ('4 20 2 0 3 10\n', '4 20 2 0 3 10 5\n'):
+            psparser.STRICT = False
+            doc = self.open(header, self.body, 4, streamed)
+            self.assertEqual(doc.getobj(3), [2, 'two'])
+            self.assertEqual(doc.getobj(5), None)
+            psparser.STRICT = True
+            self.assertRaises(PDFSyntaxError, doc.getobj, 4)
+
+    def test_bad_header(self):
+        """Test that an invalid object stream header is reported"""
+        doc = self.open('4 20 2 x 3 10\n', self.body, 3, self.streamed)
+        self.assertEqual(doc.getobj(2), None)
+        self.assertEqual(doc.getobj(4), None)
+        psparser.STRICT = True
+        self.assertRaises(PDFSyntaxError, doc.getobj, 2)
+        # no N and First.
+        objs = {1: '<< /Type /Catalog >>', 10: stream(self.body, '/Type /ObjStm ')}
+        doc = open_pdf(BytesIO(make_pdf(objs, streamed=self.streamed)))
+        self.assertRaises(PDFSyntaxError, doc.getobj, 2)
+
+
+class TestPDFXRefIndex(unittest.TestCase):
+
+    def get_xref(self, offsets, streamed=None):
+        xref = PDFXRef()
+        xref.offsets.update((objid, (0, pos)) for (objid, pos) in offsets.items())
+        xref.streamed.update(streamed or {})
+        return xref
+
+    def check_index(self, base):
+        old = self.get_xref({base + 1: 100, base + 2: 200, base + 3: 300}, {base + 4: (base + 9, 0)})
+        new = self.get_xref({base + 2: 250, base + 5: 500}, {base + 3: (base + 9, 1)})
+        # xrefs come newest first.
+        index = PDFXRefIndex([new, old])
+        self.assertEqual(list(index.get_objids()), [base + 1, base + 2, base + 3, base + 4, base + 5])
+        self.assertEqual(index.get_pos(base + 1), (None, 100))
+        self.assertEqual(index.get_pos(base + 2), (None, 250))
+        self.assertEqual(index.get_pos(base + 3), (base + 9, 1))
+        self.assertEqual(index.get_pos(base + 4), (base + 9, 0))
+        self.assertEqual(index.get_pos(base + 5), (None, 500))
+        for objid in (0, base, base + 6, base + 9, -1, 1 << 40):
+            self.assertRaises(KeyError, index.get_pos, objid)
+        return index
+
+    def test_arrays(self):
+        """Test the parallel arrays of the index and later sections overriding earlier ones"""
+        self.assertEqual(self.check_index(0).sparse, None)
+        # up to 1024 more ids than entries still fit in the arrays.
+        self.assertEqual(self.check_index(1000).sparse, None)
+        index = PDFXRefIndex([])
+        self.assertEqual(list(index.get_objids()), [])
+        self.assertRaises(KeyError, index.get_pos, 0)
+
+    def test_sparse(self):
+        """Test the dictionary used for huge or sparse object ids"""
+        self.assertNotEqual(self.check_index(1100).sparse, None)
+        self.assertNotEqual(self.check_index(1 << 31).sparse, None)
+        # a single huge id among many small ones.
+        xref = self.get_xref(dict((objid, objid * 10) for objid in range(1, 100)))
+        xref.offsets[10 ** 9] = (0, 12345)
+        index = PDFXRefIndex([xref])
+        self.assertNotEqual(index.sparse, None)
+        self.assertEqual(index.get_pos(10 ** 9), (None, 12345))
+        self.assertEqual(index.get_pos(42), (None, 420))
+        self.assertEqual(len(list(index.get_objids())), 100)
+
+
+class TestPDFXRefCache(unittest.TestCase):
+
+    objs = {
+        1: '<< /Type /Catalog /Pages 2 0 R >>',
+        2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        3: '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>',
+        7: '(seven)',
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+        self.path = os.path.join(self.tmpdir, 'test.pdf')
+
+    def write(self, data, mtime=1000000000):
+        with open(self.path, 'wb') as fp:
+            fp.write(data)
+        os.utime(self.path, (mtime, mtime))
+
+    def open(self, cachedir=None):
+        fp = open(self.path, 'rb')
+        self.addCleanup(fp.close)
+        return open_pdf(fp, cachedir=cachedir)
+
+    def get_index(self, doc):
+        index = doc._index
+        if index.sparse is not None:
+            return sorted(index.sparse.items())
+        return [list(a) for a in (index.kinds, index.offsets, index.strmids, index.indexes)]
+
+    def check_cache(self, data):
+        self.write(data)
+        fresh = self.open()
+        doc1 = self.open(self.cachedir)
+        self.assertFalse(isinstance(doc1.xrefs[0], PDFCachedXRef))
+        doc2 = self.open(self.cachedir)
+        self.assertTrue(all(isinstance(xref, PDFCachedXRef) for xref in doc2.xrefs))
+        for doc in (doc1, doc2):
+            self.assertEqual(self.get_index(doc), self.get_index(fresh))
+            self.assertEqual([repr(xref.get_trailer()) for xref in doc.xrefs],
+                             [repr(xref.get_trailer()) for xref in fresh.xrefs])
+            self.assertEqual([sorted(xref.get_objids()) for xref in doc.xrefs],
+                             [sorted(xref.get_objids()) for xref in fresh.xrefs])
+            self.assertEqual(doc._parser.fallback, fresh._parser.fallback)
+            self.assertEqual(doc.getobj(7), 'seven')
+            self.assertEqual(len(list(doc.get_pages())), 1)
+        return doc2
+
+    def test_cache(self):
+        """Test that a cached XRef gives the same index as reading it again"""
+        self.check_cache(make_pdf(self.objs))
+        self.check_cache(make_pdf(self.objs, xref=False))
+        objs = dict(self.objs)
+        objs[5000] = '(sparse)'
+        doc = self.check_cache(make_pdf(objs, '/Root 1 0 R /Info << /Title (\xfe\xff) /A [1.5 true null] >>'))
+        self.assertNotEqual(doc._index.sparse, None)
+        self.assertEqual(doc.getobj(5000), 'sparse')
+
+    def test_cache_key(self):
+        """Test that a file that has changed is not found in the cache"""
+        data = make_pdf(self.objs)
+        self.write(data)
+        self.open(self.cachedir)
+        keys = set(os.listdir(self.cachedir))
+        # a different size, modification time, first byte and last byte.
+        for (data, mtime) in ((data + '\n', 1000000000), (data, 1000000001), (' ' + data[1:], 1000000000),
+                              (data[:-1] + ' ', 1000000000)):
+            self.write(data, mtime)
+            doc = self.open(self.cachedir)
+            self.assertFalse(isinstance(doc.xrefs[0], PDFCachedXRef))
+            self.assertFalse(set(os.listdir(self.cachedir)) <= keys)
+            keys.update(os.listdir(self.cachedir))
+        self.assertEqual(len(keys), 5)
+        # pipes and in-memory files are not cached.
+        parser = PDFParser(BytesIO(data))
+        self.assertEqual(PDFXRefCache(self.cachedir, parser).path, None)
+
+    def test_invalid_cache(self):
+        """Test that truncated and garbage cache files are ignored"""
+        self.write(make_pdf(self.objs))
+        doc = self.open(self.cachedir)
+        cache = PDFXRefCache(self.cachedir, doc._parser)
+        with open(cache.path, 'rb') as fp:
+            good = fp.read()
+        bad = [good[:n] for n in range(len(good))]
+        bad.append('x' + good[1:])
+        bad.append(good[:len(PDFXRefCache.MAGIC)] + '\xff' * 64)
+        bad.append(good + '\0')
+        # a damaged byte anywhere.
+        bad.extend(good[:i] + chr(ord(good[i]) ^ 0x55) + good[i + 1:] for i in range(len(good)))
+        for (i, data) in enumerate(bad):
+            with open(cache.path, 'wb') as fp:
+                fp.write(data)
+            self.assertFalse(cache.load(PDFDocument()))
+            if i % 16:
+                continue
+            # the document is read without the cache, which is written again.
+            doc = self.open(self.cachedir)
+            self.assertFalse(isinstance(doc.xrefs[0], PDFCachedXRef))
+            self.assertEqual(len(list(doc.get_pages())), 1)
+            with open(cache.path, 'rb') as fp:
+                self.assertEqual(fp.read(), good)
+
+
+class TestPDFPages(unittest.TestCase):
+
+    def get_doc(self, count2='/Count 5', count3='/Count 2', count4='/Count 2'):
+        """Returns a document of 5 pages (objids 5 to 9), the first 4 of
+        them under two intermediate nodes, with the given /Count."""
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R >>',
+            2: '<< /Type /Pages /Kids [3 0 R 4 0 R 9 0 R] %s /MediaBox [0 0 612 792] /Resources << >> >>' % count2,
+            3: '<< /Type /Pages /Parent 2 0 R /Kids [5 0 R 6 0 R] %s >>' % count3,
+            4: '<< /Type /Pages /Parent 2 0 R /Kids [7 0 R 8 0 R] %s >>' % count4,
+            10: stream('BT /F1 12 Tf (Hello) Tj ET'),
+        }
+        for objid in range(5, 10):
+            objs[objid] = '<< /Type /Page /Parent %d 0 R /Contents 10 0 R >>' % (2 + (objid - 3) // 2)
+        objs[9] = '<< /Type /Page /Parent 2 0 R /Contents 10 0 R >>'
+        return open_pdf(BytesIO(make_pdf(objs)))
+
+    def check_pages(self, doc):
+        self.assertEqual(doc.get_page_count(), 5)
+        # at random, then in order.
+        for pageno in (3, 0, 4, 1, 2, 0, 1, 2, 3, 4):
+            self.assertEqual(doc.get_page(pageno).pageid, 5 + pageno)
+        for pageno in (5, 6, 100, -1):
+            self.assertRaises(IndexError, doc.get_page, pageno)
+        self.assertEqual([page.pageid for page in doc.get_pages()], [5, 6, 7, 8, 9])
+
+    def test_count(self):
+        """Test that pages are found by /Count, or by walking the tree if it is wrong or missing"""
+        for counts in [('/Count 5', '/Count 2', '/Count 2'), ('', '', ''), ('/Count -1', '/Count (2)', ''),
+                       # wrong, but valid counts.
+                       ('/Count 5', '/Count 3', '/Count 2'), ('/Count 5', '/Count 1', '/Count 2'),
+                       ('/Count 9', '/Count 2', '/Count 2'), ('/Count 2', '/Count 2', '/Count 2'),
+                       ('/Count 0', '/Count 0', '/Count 0'), ('', '/Count 1', '/Count 3')]:
+            self.check_pages(self.get_doc(*counts))
+            # get_page() alone, from a fresh document.
+            doc = self.get_doc(*counts)
+            for pageno in (4, 2, 3, 0, 1):
+                self.assertEqual(doc.get_page(pageno).pageid, 5 + pageno)
+            self.assertRaises(IndexError, self.get_doc(*counts).get_page, 5)
+        # a wrong count that agrees with the root is only found on the
+        # way to a page under it.
+        doc = self.get_doc('/Count 6', '/Count 2', '/Count 3')
+        self.assertEqual(doc.get_page_count(), 6)
+        for pageno in (1, 2, 4, 0, 3):
+            self.assertEqual(doc.get_page(pageno).pageid, 5 + pageno)
+
+    def test_inherited(self):
+        """Test that the inherited attributes of a page are resolved when they are used"""
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R >>',
+            2: '<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 3 /Resources 20 0 R /MediaBox 21 0 R /Rotate 90 >>',
+            3: '<< /Type /Pages /Parent 2 0 R /Kids [4 0 R 5 0 R] /Count 2 /Rotate -90 /CropBox [1 1 9 9] >>',
+            4: '<< /Type /Page /Parent 3 0 R /Contents [10 0 R 10 0 R] >>',
+            5: '<< /Type /Page /Parent 3 0 R /Resources 22 0 R /MediaBox [0 0 5 5] /Rotate 23 0 R >>',
+            6: '<< /Type /Page /Parent 2 0 R /Contents 10 0 R >>',
+            10: stream('BT /F1 12 Tf (Hello) Tj ET'),
+            20: '<< /Font << /F1 24 0 R >> >>',
+            21: '[0 0 612 792]',
+            22: '<< /Font << /F2 24 0 R >> >>',
+            23: '180',
+            24: '<< /Type /Font >>',
+        }
+        for use_get_page in (False, True):
+            doc = open_pdf(BytesIO(make_pdf(objs)))
+            if use_get_page:
+                pages = [doc.get_page(pageno) for pageno in (2, 0, 1)]
+                pages = [pages[1], pages[2], pages[0]]
+            else:
+                pages = list(doc.get_pages())
+            self.assertEqual([page.pageid for page in pages], [4, 5, 6])
+            # nothing is resolved yet.
+            for objid in (10, 20, 21, 22, 23):
+                self.assertFalse(objid in doc.objcache)
+            self.assertEqual(pages[0].rotate, 270)
+            self.assertEqual(pages[0].cropbox, [1, 1, 9, 9])
+            self.assertFalse(20 in doc.objcache)
+            self.assertEqual(pages[0].resources.keys(), ['Font'])
+            self.assertTrue(20 in doc.objcache)
+            self.assertFalse(21 in doc.objcache)
+            self.assertEqual(pages[0].mediabox, [0, 0, 612, 792])
+            self.assertEqual(len(pages[0].contents), 2)
+            self.assertTrue(resolve1(pages[0].contents[0]) is pages[2].contents[0])
+            # a page overrides what it inherits.
+            self.assertEqual(pages[1].rotate, 180)
+            self.assertEqual(pages[1].mediabox, [0, 0, 5, 5])
+            self.assertEqual(pages[1].cropbox, [1, 1, 9, 9])
+            self.assertEqual(pages[1].resources['Font'].keys(), ['F2'])
+            self.assertEqual(pages[1].contents, [])
+            self.assertEqual(pages[2].rotate, 90)
+            self.assertEqual(pages[2].cropbox, [0, 0, 612, 792])
+            self.assertTrue(pages[2].resources is pages[0].resources)
+            # the values are kept once resolved.
+            self.assertTrue(pages[1].resources is pages[1].resources)
+
+    def test_process_pdf(self):
+        """Test that process_pdf processes the requested pages up to maxpages"""
+        class Device(PDFDevice):
+            def begin_page(self, page, ctm):
+                pagenos.append(page.pageid - 5)
+
+        objs = self.get_doc()._parser.fp.getvalue()
+        for (pages, maxpages, expected) in [
+                (None, 0, [0, 1, 2, 3, 4]), (None, 3, [0, 1, 2]), ([4, 1, 1], 0, [1, 4]), ([5], 3, []),
+                # the pages are counted as if they were all walked.
+                ([4], 3, [4]), ([1, 3, 4], 3, [1, 3]), ([3, 1, 100], 0, [1, 3]), ([-1, 2], 0, [2]),
+                ([0, 2, 4], 1, [0]), ([2, 3], 2, [2])]:
+            pagenos = []
+            rsrcmgr = PDFResourceManager()
+            process_pdf(rsrcmgr, Device(rsrcmgr), BytesIO(objs), pages, maxpages=maxpages)
+            self.assertEqual(pagenos, expected)
+
+
+class TestNameTree(unittest.TestCase):
+
+    objs = {
+        1: '<< /Type /Catalog /Pages 2 0 R /Names << /Dests 20 0 R /Cycle 27 0 R /Leaf << /Names [(x) 1] >> >> >>',
+        2: '<< /Type /Pages /Kids [] /Count 0 >>',
+        20: '<< /Kids [21 0 R << /Limits [(h) (k)] /Names [(h) 8 (k) 11] >> 23 0 R] >>',
+        21: '<< /Limits [(a) (f)] /Kids [24 0 R 25 0 R] >>',
+        24: '<< /Limits [(a) (c)] /Names [(a) 1 (b) 2 (c) 3] >>',
+        # unsorted.
+        25: '<< /Limits [(d) (f)] /Names [(f) 6 (d) 4 (e) 5] >>',
+        23: '<< /Limits [(m) (p)] /Kids [26 0 R] >>',
+        # without /Limits, or with broken ones.
+        26: '<< /Limits [(m)] /Names [(m) 13 (p) 16 (o) 15] >>',
+        27: '<< /Kids [27 0 R] >>',
+    }
+
+    def test_lookup(self):
+        """Test looking up the keys of a name tree"""
+        doc = open_pdf(BytesIO(make_pdf(self.objs)))
+        for key in 'abcdefhkmop':
+            self.assertEqual(doc.lookup_name('Dests', key), ord(key) - ord('a') + 1)
+            self.assertEqual(doc.lookup_name('Dests', key), ord(key) - ord('a') + 1)
+        # keys between the limits of the kids, outside all of them, or
+        # within the limits but not in the leaf.
+        for key in ('', '0', 'A', 'aa', 'g', 'i', 'l', 'n', 'q', '{', 'zz', 'a' * 1000):
+            self.assertRaises(KeyError, doc.lookup_name, 'Dests', key)
+        self.assertRaises(KeyError, doc.lookup_name, 'Cycle', 'a')
+        self.assertRaises(KeyError, doc.lookup_name, 'Nothing', 'a')
+        self.assertEqual(doc.lookup_name('Leaf', 'x'), 1)
+        self.assertRaises(KeyError, doc.lookup_name, 'Leaf', 'y')
+        # only the leaves that are indirect objects are kept.
+        self.assertEqual(sorted(k for k in doc._name_leaves if isinstance(k, int)), [24, 25, 26])
+        self.assertEqual(doc._name_leaves[25], {'d': 4, 'e': 5, 'f': 6})
+        self.assertEqual(doc.get_dest('e'), 5)
+        self.assertRaises(PDFDestinationNotFound, doc.get_dest, 'g')
+
+    def test_iter_names(self):
+        """Test that iter_names() walks a name tree in order, and stops at cycles"""
+        doc = open_pdf(BytesIO(make_pdf(self.objs)))
+        self.assertEqual(list(doc.iter_names('Dests')), [(k, ord(k) - ord('a') + 1) for k in 'abcfdehkmpo'])
+        self.assertEqual(list(doc.iter_names('Cycle')), [])
+        self.assertEqual(list(doc.iter_names('Nothing')), [])
+        self.assertEqual(list(doc.iter_names('Leaf')), [('x', 1)])
+        objs = dict(self.objs)
+        objs[1] = '<< /Type /Catalog /Pages 2 0 R /Dests << /e 5 >> >>'
+        doc = open_pdf(BytesIO(make_pdf(objs)))
+        self.assertEqual(list(doc.iter_names('Dests')), [])
+        self.assertRaises(KeyError, doc.lookup_name, 'Dests', 'e')
+        # PDF-1.1 destinations.
+        self.assertEqual(doc.get_dest('e'), 5)
+
+
+class TestOutlines(unittest.TestCase):
+
+    objs = {
+        1: ('<< /Type /Catalog /Pages 2 0 R /Outlines 30 0 R /Names << /Dests << /Names [(chap1) 20 0 R '
+            '(loop) (loop) (chap2) (chap1)] >> >> /Dests << /old << /D [5 0 R /Fit] >> >> >>'),
+        2: '<< /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >>',
+        3: '<< /Type /Page /Parent 2 0 R >>',
+        4: '<< /Type /Page /Parent 2 0 R >>',
+        5: '<< /Type /Page /Parent 2 0 R >>',
+        20: '[4 0 R /XYZ 0 0 0]',
+        30: '<< /Type /Outlines /First 31 0 R /Last 37 0 R >>',
+        31: '<< /Title (One) /Dest [3 0 R /Fit] /Next 32 0 R /First 34 0 R /Last 34 0 R >>',
+        34: '<< /Title (One.A) /Dest (chap1) >>',
+        32: '<< /Title (Two) /A << /S /GoTo /D /chap2 >> /Next 33 0 R >>',
+        33: '<< /Title (Three) /A 21 0 R /Next 35 0 R >>',
+        21: '<< /S /GoTo /D (old) >>',
+        35: '<< /Title (URI) /A << /S /URI /URI (http://example.com/) >> /Next 36 0 R >>',
+        36: '<< /Title (Four) /Dest [0 /Fit] /Next 37 0 R >>',
+        # broken destinations, and a cycle back to the first item.
+        37: '<< /Title (Bad) /Dest (nowhere) /Next 31 0 R /First 38 0 R /Last 38 0 R >>',
+        38: '<< /Title (No dest) /Next 39 0 R /First 31 0 R /Last 31 0 R >>',
+        39: '<< /Title (Loop) /Dest /loop /Next 40 0 R >>',
+        40: '<< /Title (Other) /Dest [99 0 R /Fit] >>',
+    }
+
+    expected = [(1, 'One', 0), (2, 'One.A', 1), (1, 'Two', 1), (1, 'Three', 2), (1, 'URI', None), (1, 'Four', 0),
+                (1, 'Bad', None), (2, 'Loop', None), (2, 'Other', None)]
+
+    def test_resolve_dest(self):
+        """Test resolving named, indirect and explicit destinations"""
+        doc = open_pdf(BytesIO(make_pdf(self.objs)))
+        self.assertEqual(doc.get_page_numbers(), {3: 0, 4: 1, 5: 2})
+        for dest in ('chap1', 'chap2', psparser.LIT('chap1'), {'D': 'chap1'}, {'D': psparser.LIT('chap2')},
+                     doc.getobj(20)):
+            self.assertEqual(repr(doc.resolve_dest(dest)), repr(doc.getobj(20)))
+        self.assertEqual(repr(doc.resolve_dest('old')), '[<PDFObjRef:5>, /Fit]')
+        self.assertEqual(doc.resolve_dest([0, psparser.LIT('Fit')]), [0, psparser.LIT('Fit')])
+        for dest in ('loop', 'nowhere', None, 3, {}, {'D': 'nowhere'}, psparser.LIT('loop')):
+            self.assertEqual(doc.resolve_dest(dest), None)
+
+    def test_outlines(self):
+        """Test the outline items and their pages, with a cycle in the tree"""
+        doc = open_pdf(BytesIO(make_pdf(self.objs)))
+        outlines = list(doc.get_outlines())
+        self.assertEqual([(level, title) for (level, title, _, _, _) in outlines],
+                         [(level, title) for (level, title, _) in self.expected])
+        self.assertEqual(list(doc.get_outline_pages()), self.expected)
+        objs = dict(self.objs)
+        del objs[1]
+        objs[1] = '<< /Type /Catalog /Pages 2 0 R >>'
+        doc = open_pdf(BytesIO(make_pdf(objs)))
+        self.assertRaises(PDFNoOutlines, doc.get_outlines)
+
+    def test_deep_outlines(self):
+        """Test that deep and long outlines are walked without recursion"""
+        n = sys.getrecursionlimit() + 100
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R /Outlines 10 0 R >>',
+            2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            3: '<< /Type /Page /Parent 2 0 R >>',
+            10: '<< /First 11 0 R /Last 11 0 R >>',
+        }
+        # a chain of n children, each with n siblings at the bottom
+        # whose last one points back to the first.
+        for i in range(n):
+            objs[11 + i] = '<< /Title (%d) /Dest [3 0 R /Fit] /First %d 0 R /Last %d 0 R >>' % (i, 12 + i, 12 + i)
+        for i in range(n):
+            objs[11 + n + i] = '<< /Title (s%d) /Dest [3 0 R /Fit] /Next %d 0 R >>' % (i, 11 + n + (i + 1) % n)
+        doc = open_pdf(BytesIO(make_pdf(objs)))
+        expected = [(i + 1, str(i), 0) for i in range(n)] + [(n + 1, 's%d' % i, 0) for i in range(n)]
+        self.assertEqual(list(doc.get_outline_pages()), expected)
+
+    def test_dumpoutline(self):
+        """Test the outline output of dumppdf"""
+        outfp = BytesIO()
+        dumpoutline(outfp, BytesIO(make_pdf(self.objs)), [], [])
+        out = outfp.getvalue()
+        self.assertEqual(re.findall(r'<outline level="(\d+)" title="([^"]*)">', out),
+                         [(str(level), title) for (level, title, _) in self.expected])
+        items = out.split('<outline ')[1:]
+        self.assertEqual([re.findall(r'<pageno>(\d+)</pageno>', item) for item in items],
+                         [[str(pageno)] if pageno is not None else [] for (_, _, pageno) in self.expected])
+        # the destinations are dumped once resolved.
+        self.assertTrue('<dest><list size="5">\n<ref id="4" />' in items[1])
+        self.assertTrue('<dest><list size="2">\n<ref id="5" />' in items[3])
+        # the items whose destination can't be resolved have none.
+        for i in (4, 6, 7):
+            self.assertFalse('<dest>' in items[i])
+
+
+class TestThreadsafe(unittest.TestCase):
+
+    npages = 24
+
+    def get_pdf(self):
+        """Returns a PDF file whose pages and font are in an object
+        stream, and whose pages all share one of their content streams."""
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R >>',
+            2: ('<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> >>'
+                % (' '.join('%d 0 R' % (100 + i) for i in range(self.npages)), self.npages)),
+            50: stream(zlib.compress('BT /F1 10 Tf 72 100 Td (Shared footer) Tj ET\n' * 20), '/Filter /FlateDecode '),
+        }
+        streamed = {3: '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'}
+        for i in range(self.npages):
+            streamed[100 + i] = '<< /Type /Page /Parent 2 0 R /Contents [%d 0 R 50 0 R] >>' % (200 + i)
+            content = zlib.compress('BT /F1 12 Tf 72 700 Td (Page %d) Tj ET\n' % i)
+            objs[200 + i] = stream(content, '/Filter /FlateDecode ')
+        objs[10] = objstm(streamed)
+        return make_pdf(objs, streamed=dict((objid, (10, i)) for (i, objid) in enumerate(sorted(streamed))))
+
+    def process(self, doc, rsrcmgr, pageno):
+        outfp = BytesIO()
+        device = TagExtractor(rsrcmgr, outfp)
+        PDFPageInterpreter(rsrcmgr, device).process_page(doc.get_page(pageno))
+        device.close()
+        return outfp.getvalue()
+
+    def test_pages(self):
+        """Test that the pages of a threadsafe document processed in a thread pool are the same"""
+        data = self.get_pdf()
+        doc = open_pdf(BytesIO(data))
+        rsrcmgr = PDFResourceManager()
+        expected = [self.process(doc, rsrcmgr, pageno) for pageno in range(self.npages)]
+        # every page has its own text.
+        self.assertEqual(len(set(expected)), self.npages)
+        pool = ThreadPool(8)
+        self.addCleanup(pool.terminate)
+        for _ in range(5):
+            doc = open_pdf(BytesIO(data), threadsafe=True)
+            rsrcmgr = PDFResourceManager()
+            pagenos = list(range(self.npages)) * 2
+            results = pool.map(lambda pageno: self.process(doc, rsrcmgr, pageno), pagenos, chunksize=1)
+            self.assertEqual(results, expected * 2)
+        self.assertNotEqual(doc.getobj(50).lock, None)
+
+    def test_get_data(self):
+        """Test that a stream shared between threads is decoded once"""
+        data = 'x' * 100000
+        strm = PDFStream({'Filter': psparser.LIT('FlateDecode')}, zlib.compress(data))
+        strm.lock = threading.Lock()
+        decoded = []
+        strm.on_decode = decoded.append
+        pool = ThreadPool(8)
+        self.addCleanup(pool.terminate)
+        self.assertEqual(pool.map(lambda _: strm.get_data(), range(32), chunksize=1), [data] * 32)
+        self.assertEqual(decoded, [strm])
+
+
+class TestPDFLRUObjCache(unittest.TestCase):
+
+    def check_size(self, cache):
+        self.assertEqual(cache.nbytes, sum(_objsize(obj) for obj in cache.objs.values()))
+
+    def test_order(self):
+        """Test that the least recently used objects are evicted first"""
+        cache = PDFLRUObjCache(maxobjs=3)
+        for key in 'abc':
+            cache[key] = key
+        self.assertEqual(cache['a'], 'a')
+        cache['d'] = 'd'
+        self.assertEqual(list(cache.objs), ['c', 'a', 'd'])
+        self.assertEqual(cache['c'], 'c')
+        # setting an object again makes it the most recent one.
+        cache['a'] = 'A'
+        cache['e'] = 'e'
+        self.assertEqual(list(cache.objs), ['c', 'a', 'e'])
+        self.assertRaises(KeyError, cache.__getitem__, 'b')
+        self.assertRaises(KeyError, cache.__getitem__, 'd')
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(len(cache), 3)
+        self.check_size(cache)
+
+    def test_maxbytes(self):
+        """Test that the objects are evicted to stay within maxbytes"""
+        cache = PDFLRUObjCache(maxbytes=_objsize('x' * 100) * 3)
+        for i in range(3):
+            cache[i] = 'x' * 100
+        self.assertEqual(len(cache), 3)
+        cache[3] = 'x' * 101
+        self.assertEqual(list(cache.objs), [2, 3])
+        self.check_size(cache)
+        # an object bigger than maxbytes is not kept at all.
+        cache[4] = 'x' * 1000
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+        cache[5] = ['x' * 10, {'A': 'y' * 20}]
+        self.check_size(cache)
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+
+    def test_decoded_stream(self):
+        """Test that a stream is measured again once it is decoded"""
+        data = 'x' * 10000
+        rawdata = zlib.compress(data)
+        streams = [PDFStream({'Filter': psparser.LIT('FlateDecode')}, rawdata) for _ in range(3)]
+        cache = PDFLRUObjCache(maxbytes=len(data))
+        cache[0] = streams[0]
+        cache[1] = streams[1]
+        self.check_size(cache)
+        nbytes = cache.nbytes
+        self.assertEqual(streams[0].get_data(), data)
+        self.assertEqual(cache.nbytes, nbytes)
+        # the stream is measured when the next object is added, and
+        # is evicted to make room since it is the oldest one.
+        cache[2] = 'x'
+        self.assertEqual(list(cache.objs), [1, 2])
+        self.check_size(cache)
+        # a stream decoded after it is evicted is not counted.
+        self.assertEqual(streams[0].get_data(), data)
+        cache[3] = 'y'
+        self.assertEqual(list(cache.objs), [1, 2, 3])
+        self.check_size(cache)
+        # nor a stream that is replaced.
+        cache[4] = streams[2]
+        cache[4] = 'z'
+        self.assertEqual(''.join(streams[2].iter_decoded(cache_size=len(data))), data)
+        cache[5] = 'w'
+        self.check_size(cache)
+
+    def test_document(self):
+        """Test the cache of a document whose streams are decoded"""
+        data = 'BT (Hello) Tj ET ' * 100
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R >>',
+            2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            3: '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+            4: stream(zlib.compress(data), '/Filter /FlateDecode '),
+        }
+        cache = PDFLRUObjCache(maxbytes=100000)
+        doc = open_pdf(BytesIO(make_pdf(objs)), objcache=cache)
+        self.assertEqual(doc.getobj(4).get_data(), data)
+        self.assertTrue(doc.getobj(4) is cache.objs[4])
+        for objid in (3, 2, 1):
+            doc.getobj(objid)
+        self.assertEqual(list(cache.objs)[-4:], [4, 3, 2, 1])
+        self.check_size(cache)
+        self.assertTrue(len(data) <= cache.sizes[4])
+
+
+class TestPDFDocumentDecrypt(unittest.TestCase):
+
+    def get_rc4(self, key, objid, genno, data):
+        """Deciphers data with a fresh Arcfour (Algorithm 3.1)."""
+        key += struct.pack('<L', objid)[:3] + struct.pack('<L', genno)[:2]
+        return Arcfour(hashlib.md5(key).digest()[:min(len(key), 16)]).process(data)
+
+    def test_rc4_keystream_cache(self):
+        """Test that the RC4 keys and keystreams kept between strings give the same results"""
+        doc = PDFDocument()
+        doc.decrypt_key = '\x01\x02\x03\x04\x05'
+        doc.RC4_KEYSTREAM_CACHE = 64
+        data = ''.join(chr(i) for i in range(256)) * 4
+        for (objid, genno, n) in [(1, 0, 10), (1, 0, 10), (1, 0, 5), (1, 0, 40), (1, 0, 64), (1, 0, 65),
+                                  (1, 0, 30), (2, 0, 20), (1, 0, 20), (1, 1, 20), (1, 0, 1024), (1, 0, 64),
+                                  (0x1000001, 0, 10), (1, 0, 0), (3, 65535, 100)]:
+            expected = self.get_rc4(doc.decrypt_key, objid, genno, data[:n])
+            self.assertEqual(doc.decrypt_rc4(objid, genno, data[:n]), expected)
+        # the keystream beyond the cache limit is not kept.
+        self.assertTrue(len(doc._rc4_keystream[1]) <= 64)
+        self.assertEqual(len(doc._rc4_keys), 5)
+
+    docid = 'pdfminer test id'
+    content = 'BT /F1 12 Tf 72 712 Td (Hello) Tj ET'
+    # printable, but not extractable.
+    P = -20
+
+    def make_encrypted(self, cfm, R, stmf='/StdCF', strf='/StdCF'):
+        """Returns a document encrypted with the crypt filter method cfm,
+        whose user password is 'user' and owner password 'owner'."""
+        padding = PDFDocument.PASSWORD_PADDING
+        if cfm in ('RC4', 'V2', 'AESV2'):
+            n = 5 if R == 2 else 16
+            # Algorithm 3.3
+            okey = hashlib.md5(('owner' + padding)[:32]).digest()
+            if 3 <= R:
+                for _ in range(50):
+                    okey = hashlib.md5(okey).digest()
+            O = ('user' + padding)[:32]
+            for i in range(1 if R == 2 else 20):
+                O = Arcfour(''.join(chr(ord(c) ^ i) for c in okey[:n])).process(O)
+            # Algorithm 3.2
+            key = hashlib.md5(('user' + padding)[:32] + O + struct.pack('<l', self.P) + self.docid).digest()[:n]
+            if 3 <= R:
+                for _ in range(50):
+                    key = hashlib.md5(key).digest()
+            if R == 2:
+                # Algorithm 3.4
+                U = Arcfour(key).process(padding)
+            else:
+                # Algorithm 3.5
+                U = hashlib.md5(padding + self.docid).digest()
+                for i in range(20):
+                    U = Arcfour(''.join(chr(ord(c) ^ i) for c in key)).process(U)
+                U += '\0' * 16
+            if R == 2:
+                encryption = '/V 1 /R 2'
+            elif R == 3:
+                encryption = '/V 2 /R 3 /Length 128'
+            else:
+                encryption = '/V 4 /R 4 /Length 128 /CF << /StdCF << /CFM /%s /Length 16 >> >>' % cfm
+        else:
+            if R == 5:
+                hash_aes256 = lambda password, salt, udata='': hashlib.sha256(password + salt + udata).digest()
+            else:
+                hash_aes256 = lambda password, salt, udata='': PDFDocument()._hash_aes256(6, password, salt, udata)
+            key = hashlib.sha256('pdfminer test').digest()
+            U = hash_aes256('user', 'usalt001') + 'usalt001' + 'ukey0001'
+            UE = RijndaelEncryptor(hash_aes256('user', 'ukey0001'), 256).encrypt_cbc('\0' * 16, key)
+            O = hash_aes256('owner', 'osalt001', U) + 'osalt001' + 'okey0001'
+            OE = RijndaelEncryptor(hash_aes256('owner', 'okey0001', U), 256).encrypt_cbc('\0' * 16, key)
+            encryption = ('/V 5 /R %d /Length 256 /CF << /StdCF << /CFM /AESV3 /Length 32 >> >> /OE <%s> /UE <%s>' %
+                          (R, OE.encode('hex'), UE.encode('hex')))
+
+        def encrypt(objid, data, f):
+            if f == '/Identity':
+                return data
+            if cfm == 'AESV3':
+                k = key
+            elif cfm == 'AESV2':
+                k = hashlib.md5(key + struct.pack('<L', objid)[:3] + '\0\0sAlT').digest()
+            else:
+                k = hashlib.md5(key + struct.pack('<L', objid)[:3] + '\0\0').digest()
+            if cfm in ('RC4', 'V2'):
+                return Arcfour(k[:len(key) + 5]).process(data)
+            iv = hashlib.md5(data).digest()
+            n = 16 - len(data) % 16
+            return iv + RijndaelEncryptor(k, len(k) * 8).encrypt_cbc(iv, data + chr(n) * n)
+
+        objs = {
+            1: '<< /Type /Catalog /Pages 2 0 R >>',
+            2: '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            3: '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+            4: stream(encrypt(4, self.content, stmf)),
+            5: '<%s>' % encrypt(5, 'secret', strf).encode('hex'),
+            # a stream that is never encrypted, and one that always is.
+            6: stream('plain', '/Filter [/Crypt] /DecodeParms [<< /Name /Identity >>] '),
+            7: '<< /Title <%s> /Array [<%s>] >>' % (encrypt(7, 'Title', strf).encode('hex'),
+                                                    encrypt(7, '', strf).encode('hex')),
+            8: stream(encrypt(8, 'always', '/StdCF'), '/Filter /Crypt /DecodeParms << /Name /StdCF >> '),
+        }
+        trailer = ('/Root 1 0 R /Info 7 0 R /ID [<%s> <%s>] /Encrypt << /Filter /Standard %s /StmF %s /StrF %s '
+                   '/O <%s> /U <%s> /P %d >>' % (self.docid.encode('hex'), self.docid.encode('hex'), encryption,
+                                                 stmf, strf, O.encode('hex'), U.encode('hex'), self.P))
+        return make_pdf(objs, trailer)
+
+    def test_crypt_filters(self):
+        """Test documents encrypted with crypt filters, opened with the user or the owner password"""
+        filters = (('/StdCF', '/StdCF'), ('/Identity', '/StdCF'), ('/StdCF', '/Identity'), ('/Identity', '/Identity'))
+        # the hash of revision 6 is slow, so it is tried once.
+        for (cfm, R, filters) in (('V2', 4, filters), ('AESV2', 4, filters), ('AESV3', 5, filters),
+                                  ('AESV3', 6, filters[:1])):
+            for (stmf, strf) in filters:
+                data = self.make_encrypted(cfm, R, stmf, strf)
+                for password in ('user', 'owner'):
+                    doc = open_pdf(BytesIO(data), password)
+                    self.assertEqual(doc.getobj(5), 'secret')
+                    self.assertEqual(doc.getobj(4).get_data(), self.content)
+                    self.assertEqual(doc.getobj(6).get_data(), 'plain')
+                    self.assertEqual(doc.getobj(8).get_data(), 'always')
+                    self.assertEqual(doc.info, [{'Title': 'Title', 'Array': ['']}])
+                    self.assertEqual(len(list(doc.get_pages())), 1)
+                    self.assertFalse(doc.is_extractable)
+                    self.assertTrue(doc.is_printable)
+                for password in ('', 'User'):
+                    self.assertRaises(PDFPasswordIncorrect, open_pdf, BytesIO(data), password)
+
+    def test_rc4_passwords(self):
+        """Test documents encrypted with RC4, opened with the user or the owner password"""
+        for R in (2, 3):
+            data = self.make_encrypted('RC4', R)
+            for password in ('user', 'owner'):
+                doc = open_pdf(BytesIO(data), password)
+                self.assertEqual(doc.getobj(5), 'secret')
+                self.assertEqual(doc.getobj(4).get_data(), self.content)
+                self.assertEqual(doc.info, [{'Title': 'Title', 'Array': ['']}])
+            for password in ('', 'User'):
+                self.assertRaises(PDFPasswordIncorrect, open_pdf, BytesIO(data), password)
+
+    def test_aes_errors(self):
+        """Test that AES data with partial blocks or invalid padding is reported"""
+        self.addCleanup(setattr, psparser, 'STRICT', psparser.STRICT)
+        doc = PDFDocument()
+        key = hashlib.md5('key').digest()
+        iv = hashlib.md5('iv').digest()
+        encryptor = RijndaelEncryptor(key, 128)
+        for (data, plain) in [(encryptor.encrypt_cbc(iv, 'x' * 10 + '\x06' * 6), 'x' * 10),
+                              (encryptor.encrypt_cbc(iv, 'x' * 16 + '\x10' * 16), 'x' * 16)]:
+            psparser.STRICT = True
+            self.assertEqual(doc._decrypt_aes(key, iv + data), plain)
+            self.assertEqual(doc._decrypt_aes(key, ''), '')
+            # partial blocks.
+            for bad in (iv + data + 'x', iv + data[:-1], iv, iv[:5], iv + data[:5]):
+                psparser.STRICT = True
+                self.assertRaises(PDFEncryptionError, doc._decrypt_aes, key, bad)
+                psparser.STRICT = False
+                # the whole blocks are still deciphered.
+                n = max(0, len(bad) - 16) // 16 * 16
+                self.assertEqual(doc._decrypt_aes(key, bad), doc._decrypt_aes(key, bad[:16 + n]) if n else '')
+        # invalid padding.
+        for padded in ('x' * 15 + '\0', 'x' * 15 + '\x11', 'x' * 14 + '\x01\x02', 'x' * 16 + '\x10' * 15 + '\x0f'):
+            data = iv + encryptor.encrypt_cbc(iv, padded)
+            psparser.STRICT = True
+            self.assertRaises(PDFEncryptionError, doc._decrypt_aes, key, data)
+            psparser.STRICT = False
+            self.assertTrue(padded.startswith(doc._decrypt_aes(key, data)))
+
+
+if __name__ == '__main__':
+    unittest.main()
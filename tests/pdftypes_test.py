@@ -0,0 +1,50 @@
+#!/usr/bin/env python2
+""" Unit tests for pdftypes.py
+
+"""
+
+import unittest
+import zlib
+
+from pdfminer.pdftypes import LIT, PDFStream
+
+
+class TestPDFStream(unittest.TestCase):
+
+    data = ''.join('%d 0 m %d 1 l S\n' % (i, i) for i in range(1000))
+
+    def test_iter_decoded(self):
+        """Test that iter_decoded() yields what get_data() returns"""
+        raw = zlib.compress(self.data) + '\r\ngarbage'
+        for chunk_size in (1, 7, 4096, 65536):
+            strm = PDFStream({'Filter': LIT('FlateDecode')}, raw)
+            chunks = list(strm.iter_decoded(chunk_size))
+            self.assertTrue(max(len(chunk) for chunk in chunks) <= chunk_size)
+            self.assertEqual(''.join(chunks), self.data)
+            self.assertEqual(strm.data, None)
+            self.assertEqual(strm.get_data(), self.data)
+
+    def test_iter_decoded_filters(self):
+        """Test iter_decoded() with several filters and a predictor"""
+        rows = ''.join('\x02' + chr(i) * 3 for i in range(256))
+        attrs = {'Filter': LIT('Fl'), 'DecodeParms': {'Predictor': 12, 'Columns': 3}}
+        raw = zlib.compress(rows)
+        for chunk_size in (1, 5, 4096):
+            strm = PDFStream(attrs, raw)
+            data = ''.join(strm.iter_decoded(chunk_size))
+            self.assertEqual(data, PDFStream(attrs, raw).get_data())
+        attrs = {'Filter': [LIT('AHx'), LIT('Fl')]}
+        raw = zlib.compress(self.data).encode('hex') + '>'
+        for chunk_size in (1, 5, 4096):
+            strm = PDFStream(attrs, raw)
+            data = ''.join(strm.iter_decoded(chunk_size, cache_size=len(self.data)))
+            self.assertEqual(data, self.data)
+            self.assertEqual(strm.data, data)
+        attrs = {'Filter': LIT('LZW'), 'DecodeParms': {'EarlyChange': 1}}
+        raw = '\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'
+        for chunk_size in (1, 5, 4096):
+            self.assertEqual('-----A---B', ''.join(PDFStream(attrs, raw).iter_decoded(chunk_size)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python2
+""" Unit tests for predictor.py
+
+"""
+
+import unittest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pdfminer import predictor
+from pdfminer.predictor import apply_png_predictor, apply_tiff_predictor
+
+
+class TestPredictor(unittest.TestCase):
+    """Tests the pure Python predictors, even if NumPy is installed."""
+
+    numpy = None
+    png = '\x00abc\x01\x01\x01\x01\x02\x01\x01\x01\x03\x02\x02\x02\x04\x01\x01\x01'
+    decoded = 'abc\x01\x02\x03\x02\x03\x04\x03\x05\x06\x04\x06\x07'
+
+    def setUp(self):
+        self.addCleanup(setattr, predictor, 'numpy', predictor.numpy)
+        predictor.numpy = self.numpy
+
+    def test_png(self):
+        """Test PNG None, Sub, Up, Average and Paeth rows"""
+        self.assertEqual(self.decoded, apply_png_predictor(15, 1, 3, 8, self.png))
+
+    def test_png_pieces(self):
+        """Test PNG rows decoded in pieces and truncated rows"""
+        self.assertEqual(self.decoded, apply_png_predictor(15, 1, 3, 8, self.png[:8]) +
+                         apply_png_predictor(15, 1, 3, 8, self.png[8:], self.decoded[3:6]))
+        self.assertEqual(self.decoded[:13], apply_png_predictor(15, 1, 3, 8, self.png[:-2]))
+
+    def test_png_bits(self):
+        """Test PNG rows with 4 and 16 bits per component"""
+        self.assertEqual('\x11\x22\x21\x23', apply_png_predictor(15, 1, 4, 4, '\x01\x11\x11\x02\x10\x01'))
+        self.assertEqual('\x01\x02\x03\x04\x01\x02\x04\x06',
+                         apply_png_predictor(15, 1, 2, 16, '\x01\x01\x02\x02\x02\x02\x00\x00\x01\x02'))
+
+    def test_png_unsupported(self):
+        """Test unsupported PNG rows and bits per component"""
+        self.assertRaises(ValueError, apply_png_predictor, 15, 1, 3, 8, '\x05abc')
+        self.assertRaises(ValueError, apply_png_predictor, 15, 1, 3, 3, '\x00abc')
+
+    def test_tiff(self):
+        """Test TIFF Predictor 2 with 1, 8 and 16 bits per component"""
+        self.assertEqual('\x01\x02\x02\x04\x03\x06', apply_tiff_predictor(2, 3, 8, '\x01\x02\x01\x02\x01\x02'))
+        self.assertEqual('\x00\x01\x00\x00\x00\x02', apply_tiff_predictor(1, 3, 16, '\x00\x01\xff\xff\x00\x02'))
+        self.assertEqual('\xaa\xff', apply_tiff_predictor(1, 8, 1, '\xff\x80'))
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestPredictorNumPy(TestPredictor):
+    """Runs the same tests with the NumPy predictors."""
+
+    numpy = numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -61,10 +61,13 @@ func/a/b{(c)do*}def
         (258, {'foo': 'bar'}),
     ]
 
-    def get_tokens(self, s):
+    def get_tokens(self, s, bulk=True, bufsiz=4096):
         import io
 
         class MyParser(PSStackParser):
+            BUFSIZ = bufsiz
+            BULK_TOKENIZE = bulk
+
             def flush(self):
                 self.add_results(*self.popall())
 
@@ -100,6 +103,34 @@ func/a/b{(c)do*}def
         self.assertEqual(tokens, self.TOKENS)
         return
 
+    def test_1_statemachine(self):
+        """Test PSBaseParser tokenization without the bulk tokenizer"""
+        tokens = self.get_tokens(self.TESTDATA, bulk=False)
+        self.assertEqual(tokens, self.TOKENS)
+        return
+
+    def test_1_buffer_boundaries(self):
+        """Test that tokens crossing buffer boundaries are read correctly"""
+        for bufsiz in (1, 2, 3, 7, 64):
+            self.assertEqual(self.get_tokens(self.TESTDATA, bulk=True, bufsiz=bufsiz), self.TOKENS)
+            self.assertEqual(self.get_tokens(self.TESTDATA, bulk=False, bufsiz=bufsiz), self.TOKENS)
+        return
+
+    def test_1_nextline(self):
+        """Test mixing nexttoken() and nextline()"""
+        import io
+        data = 'xref % comment\n0 2\n<> >> (a) /b\ntrailer\n'
+        for bulk in (False, True):
+            parser = PSStackParser(io.StringIO(data))
+            parser.BULK_TOKENIZE = bulk
+            self.assertEqual(parser.nexttoken(), (0, KWD('xref')))
+            self.assertEqual(parser.nextline(), (4, ' % comment\n'))
+            self.assertEqual(parser.nextline(), (15, '0 2\n'))
+            self.assertEqual(parser.nexttoken(), (19, ''))
+            self.assertEqual(parser.nextline(), (20, '> >> (a) /b\n'))
+            self.assertEqual(parser.nexttoken(), (32, KWD('trailer')))
+        return
+
     def test_2(self):
         """Test PSStackParser object extraction"""
         objs = self.get_objects(self.TESTDATA)
@@ -107,6 +138,116 @@ func/a/b{(c)do*}def
         self.assertEqual(objs, self.OBJS)
         return
 
+    def test_3_iterators(self):
+        """Test itertokens() and iterobjects()"""
+        import io
+
+        class MyParser(PSStackParser):
+            def flush(self):
+                self.add_results(*self.popall())
+
+        parser = MyParser(io.StringIO(self.TESTDATA))
+        self.assertEqual(list(parser.itertokens()), self.TOKENS)
+        parser = MyParser(io.StringIO(self.TESTDATA))
+        self.assertEqual(list(parser.iterobjects()), self.OBJS)
+        for bufsiz in (1, 5, 64):
+            parser = MyParser(io.StringIO(self.TESTDATA))
+            parser.BUFSIZ = bufsiz
+            self.assertEqual(list(parser.itertokens()), self.TOKENS)
+            parser = MyParser(io.StringIO(self.TESTDATA))
+            parser.BUFSIZ = bufsiz
+            self.assertEqual(list(parser.iterobjects()), self.OBJS)
+        self.assertEqual(list(MyParser(io.StringIO('')).itertokens()), [])
+        self.assertEqual(list(MyParser(io.StringIO(' % x')).iterobjects()), [])
+        return
+
+    def test_3_iterators_mixed(self):
+        """Test mixing the iterators with nexttoken(), nextobject(), seek() and nextline()"""
+        import io
+
+        class MyParser(PSStackParser):
+            def flush(self):
+                self.add_results(*self.popall())
+
+        parser = MyParser(io.StringIO(self.TESTDATA))
+        tokens = parser.itertokens()
+        self.assertEqual([next(tokens) for _ in range(3)], self.TOKENS[:3])
+        # an iterator left behind doesn't lose the tokens read ahead.
+        self.assertEqual(parser.nexttoken(), self.TOKENS[3])
+        self.assertEqual(list(parser.itertokens()), self.TOKENS[4:])
+        parser.seek(226)
+        self.assertEqual(list(parser.itertokens()), [t for t in self.TOKENS if 226 <= t[0]])
+        parser = MyParser(io.StringIO(self.TESTDATA))
+        objs = parser.iterobjects()
+        self.assertEqual(next(objs), self.OBJS[0])
+        self.assertEqual(parser.nextobject(), self.OBJS[1])
+        self.assertEqual(list(objs), self.OBJS[2:])
+        parser.seek(234)
+        self.assertEqual(list(parser.iterobjects()), [obj for obj in self.OBJS if 234 <= obj[0]])
+        data = 'xref\n0 2\n[1 2] trailer\n'
+        parser = MyParser(io.StringIO(data))
+        for (pos, token) in parser.itertokens():
+            if token is KWD('xref'):
+                self.assertEqual(parser.nextline(), (4, '\n'))
+                self.assertEqual(parser.nextline(), (5, '0 2\n'))
+            else:
+                self.assertEqual((pos, token), (9, KWD('[')))
+                break
+        self.assertEqual(parser.nexttoken(), (10, 1))
+        parser.seek(9)
+        self.assertEqual(list(parser.iterobjects()), [(9, [1, 2])])
+        return
+
+    def test_4_skipobject(self):
+        """Test skipping objects without building them"""
+        import io
+        data = '[1 (a]) <<>> ] % [\n<< /A [<3e>] /B (\\)) >> /x 2'
+        for bufsiz in (1, 5, 4096):
+            parser = PSStackParser(io.StringIO(data))
+            parser.BUFSIZ = bufsiz
+            self.assertEqual(parser.skipobject(), (0, '[1 (a]) <<>> ]'))
+            self.assertEqual(parser.skipobject(), (19, '<< /A [<3e>] /B (\\)) >>'))
+            self.assertEqual(parser.nexttoken(), (43, LIT('x')))
+            self.assertEqual(parser.skipobject(), (46, '2'))
+            self.assertRaises(PSEOF, parser.skipobject)
+        return
+
+    def test_4_skipobject_spans(self):
+        """Test skipping objects with delimiters in strings, comments and nested objects"""
+        import io
+        objs = [
+            '<< /A (>>) /B (\\(>> [) /C <3e3e> >>',
+            '<< /D << /E [<< >> [(]) ]] >> /F (a (b) c) >>',
+            '[% ] >>\n 1 <</G/H>> ]',
+            '{ 1 { (}) } }',
+            '(escaped \\) and (nested) parens)',
+            '/Name#20with#3e',
+            '-12.5',
+        ]
+        data = '  \n'.join(objs) + ' '
+
+        class MyParser(PSStackParser):
+            def flush(self):
+                self.add_results(*self.popall())
+
+        for bufsiz in (1, 3, 4096):
+            parser = MyParser(io.StringIO(data))
+            parser.BUFSIZ = bufsiz
+            pos = 0
+            for obj in objs:
+                self.assertEqual(parser.skipobject(), (pos, obj))
+                pos += len(obj) + 3
+            self.assertRaises(PSEOF, parser.skipobject)
+            # skipping gives the same span as building the object.
+            for obj in objs:
+                parser.seek(data.index(obj))
+                (pos, _) = parser.nextobject()
+                end = parser.tell()
+                parser.seek(pos)
+                self.assertEqual(parser.skipobject(), (pos, obj))
+                self.assertEqual(parser.tell(), end)
+        return
+
 
 if __name__ == '__main__':
     unittest.main()
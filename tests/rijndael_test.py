@@ -22,6 +22,28 @@ class TestRijndael(unittest.TestCase):
         """Test Rijndael encryptor"""
         self.assertEqual(self.ciphertext, RijndaelEncryptor(self.key, 128).encrypt(self.plaintext))
 
+    # NIST SP 800-38A, F.2.1 and F.2.5
+    cbc_iv = '000102030405060708090a0b0c0d0e0f'.decode('hex')
+    cbc_plaintext = ('6bc1bee22e409f96e93d7e117393172a' 'ae2d8a571e03ac9c9eb76fac45af8e51'
+                     '30c81c46a35ce411e5fbc1191a0a52ef' 'f69f2445df4f9b17ad2b417be66c3710').decode('hex')
+    cbc_vectors = [
+        ('2b7e151628aed2a6abf7158809cf4f3c',
+         '7649abac8119b246cee98e9b12e9197d' '5086cb9b507219ee95db113a917678b2'
+         '73bed6b8e3c1743b7116e69e22229516' '3ff1caa1681fac09120eca307586e1a7'),
+        ('603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4',
+         'f58c4c04d6e5f1ba779eabfb5f7bfbd6' '9cfc4e967edb808d679f777bc6702c7d'
+         '39f23369a9d9bacfa530e26304231461' 'b2eb05e2c39be9fcda6c19078c6a9d1b'),
+    ]
+
+    def test_rijndael_cbc(self):
+        """Test Rijndael encryptor and decryptor in CBC mode"""
+        for (key, ciphertext) in self.cbc_vectors:
+            (key, ciphertext) = (key.decode('hex'), ciphertext.decode('hex'))
+            keybits = len(key) * 8
+            self.assertEqual(ciphertext, RijndaelEncryptor(key, keybits).encrypt_cbc(self.cbc_iv, self.cbc_plaintext))
+            self.assertEqual(self.cbc_plaintext, RijndaelDecryptor(key, keybits).decrypt_cbc(self.cbc_iv, ciphertext))
+            self.assertEqual('', RijndaelDecryptor(key, keybits).decrypt_cbc(self.cbc_iv, ''))
+
 
 if __name__ == '__main__':
     unittest.main()
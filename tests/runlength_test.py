@@ -5,7 +5,7 @@
 
 import unittest
 
-from pdfminer.runlength import rldecode
+from pdfminer.runlength import RunLengthDecoder, rldecode
 
 
 class TestRunLength(unittest.TestCase):
@@ -14,6 +14,22 @@ class TestRunLength(unittest.TestCase):
         """Test RunLength decoder"""
         self.assertEqual('1234567777777abcde', rldecode('\x05123456\xfa7\x04abcde\x80junk'))
 
+    def test_rldecoder_pieces(self):
+        """Test RunLengthDecoder with the data given a byte at a time"""
+        decoder = RunLengthDecoder()
+        data = '\x05123456\xfa7\x04abcde\x80junk'
+        self.assertEqual('1234567777777abcde', ''.join(decoder.decode(c) for c in data))
+        self.assertEqual('', decoder.flush())
+
+    def test_rldecode_truncated(self):
+        """Test RunLength decoder keeps what is left of a truncated run"""
+        self.assertEqual('123456abc', rldecode('\x05123456\x04abc'))
+        self.assertEqual('123456', rldecode('\x05123456\xfa'))
+
+    def test_rldecode_buffer(self):
+        """Test RunLength decoder with a buffer, as the streams of an mmap parser are"""
+        self.assertEqual('1234567777777abcde', rldecode(buffer('xx\x05123456\xfa7\x04abcde\x80', 2)))
+
 
 if __name__ == '__main__':
     unittest.main()
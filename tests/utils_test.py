@@ -5,7 +5,7 @@
 
 import unittest
 
-from pdfminer.utils import nunpack
+from pdfminer.utils import apply_png_predictor, nunpack
 
 
 class TestUtils(unittest.TestCase):
@@ -19,6 +19,10 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(TypeError):
             nunpack('\xa5\x1f\x33\x11\x51\xbb\x3e')
 
+    def test_apply_png_predictor(self):
+        """Test the PNG predictor that utils used to have"""
+        self.assertEqual('abc\x01\x02\x03', apply_png_predictor(12, 1, 3, 8, '\x00abc\x02\xa0\xa0\xa0'))
+
 
 if __name__ == '__main__':
     unittest.main()
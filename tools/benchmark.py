@@ -0,0 +1,1116 @@
+#!/usr/bin/env python2
+"""Throughput benchmarks for pdfminer internals.
+
+usage:
+    $ benchmark.py {tokenizer,objects,encryption,rc4,aes,xref,fallback,objstm,predictor,lzw,filters,ccitt} [file ...]
+
+Without files, each benchmark runs on synthetic data. The encryption
+benchmark makes a plain and an RC4 encrypted version of the same
+document; pass both versions of a real file to compare them instead.
+The rc4 benchmark compares Arcfour with the byte-by-byte implementation
+it replaced, and the aes benchmark compares CBC decryption one block at
+a time with the batched decrypt_cbc(). The predictor benchmark compares
+the predictor engine, with and without NumPy, with the byte-by-byte
+apply_png_predictor() it replaced; given files, it runs on their Flate
+streams that use a predictor. The lzw benchmark compares the LZW decoder
+with the one reading a byte at a time that it replaced, and the filters
+benchmark does the same for the ASCII85, ASCIIHex and RunLength decoders.
+The ccitt benchmark decodes synthetic fax pages in Group 4 and Group 3,
+and compares Group 4 with the bit-by-bit decoder it replaced.
+
+"""
+
+import argparse
+import array
+import binascii
+import hashlib
+import logging
+import random
+import re
+import struct
+import sys
+import time
+import zlib
+from bisect import bisect_right
+from io import BytesIO
+
+from pdfminer.arcfour import Arcfour, xor_bytes
+from pdfminer.ascii85 import ASCII85Decoder, ASCIIHexDecoder, ascii85decode, asciihexdecode
+from pdfminer.ccitt import TABLE_BITS, CCITTG4Parser, ccittfaxdecode
+from pdfminer.converter import TextConverter
+from pdfminer.lzw import LZWDecoder, lzwdecode
+from pdfminer.pdfinterp import PDFResourceManager, process_pdf
+from pdfminer import predictor
+from pdfminer.pdfparser import PDFDocument, PDFParser, PDFXRef
+from pdfminer.pdftypes import LITERALS_FLATE_DECODE, PDFStream
+from pdfminer.psparser import PSBaseParser, PSStackParser, PSEOF
+from pdfminer.rijndael import RijndaelDecryptor, RijndaelEncryptor
+from pdfminer.runlength import RunLengthDecoder, rldecode
+
+
+CONTENT_STREAM = '''BT
+/F1 12 Tf 72 712 Td
+[(Hello) -250 (W) 30 (orld)] TJ
+0 -14.4 TD (Lorem ipsum dolor sit amet, \\(consectetur\\) adipiscing) Tj
+/Span << /ActualText <FEFF00410042> >> BDC (AB) Tj EMC
+ET
+q 0.5 0 0 0.5 100 100 cm /Im1 Do Q
+1 0 0 RG 10 10 m 20.5 30.25 l 40 -10 l h S
+'''
+
+
+class NullWriter(object):
+
+    def write(self, data):
+        pass
+
+
+def make_pdf(npages=200, encrypt=False, objstm=False):
+    """Returns a synthetic PDF document, optionally encrypted.
+
+    Every page shares a resource dictionary and an annotation array
+    full of strings, so the same indirect objects are fetched many times.
+    With objstm, all the objects but the page contents are packed in
+    object streams of 100 objects each and the XRef is a stream.
+    encrypt is True (or 'rc4'), 'aesv2' or 'aesv3'; the passwords are
+    empty.
+    """
+    docid = hashlib.md5('pdfminer benchmark').digest()
+    key = None
+    padding = PDFDocument.PASSWORD_PADDING
+    P = -4
+    if encrypt == 'aesv2':
+        # revision 4 with the AESV2 crypt filter.
+        O = hashlib.md5('owner').digest() * 2
+        key = hashlib.md5(padding + O + struct.pack('<l', P) + docid).digest()
+        for _ in range(50):
+            key = hashlib.md5(key).digest()
+        x = Arcfour(key).process(hashlib.md5(padding + docid).digest())
+        for i in range(1, 19 + 1):
+            x = Arcfour(''.join(chr(ord(c) ^ i) for c in key)).process(x)
+        U = x + x
+        encryption = ('/V 4 /R 4 /Length 128 /CF << /StdCF << /CFM /AESV2 /Length 16 >> >> '
+                      '/StmF /StdCF /StrF /StdCF')
+    elif encrypt == 'aesv3':
+        # revision 6 with the AESV3 crypt filter.
+        key = hashlib.sha256('pdfminer benchmark').digest()
+        hash6 = PDFDocument()._hash_aes256
+        U = hash6(6, '', 'usalt001') + 'usalt001' + 'ukey0001'
+        UE = RijndaelEncryptor(hash6(6, '', 'ukey0001'), 256).encrypt_cbc('\0' * 16, key)
+        O = hash6(6, '', 'osalt001', U) + 'osalt001' + 'okey0001'
+        OE = RijndaelEncryptor(hash6(6, '', 'okey0001', U), 256).encrypt_cbc('\0' * 16, key)
+        encryption = ('/V 5 /R 6 /Length 256 /CF << /StdCF << /CFM /AESV3 /Length 32 >> >> '
+                      '/StmF /StdCF /StrF /StdCF /OE <%s> /UE <%s>' % (OE.encode('hex'), UE.encode('hex')))
+    elif encrypt:
+        # Standard security handler, revision 2.
+        O = Arcfour(hashlib.md5(padding).digest()[:5]).process(padding)
+        key = hashlib.md5(padding + O + struct.pack('<l', P) + docid).digest()[:5]
+        U = Arcfour(key).process(padding)
+        encryption = '/V 1 /R 2'
+
+    def encrypt_data(objid, data):
+        if not key:
+            return data
+        if encrypt in ('aesv2', 'aesv3'):
+            k = key
+            if encrypt == 'aesv2':
+                k = hashlib.md5(key + struct.pack('<L', objid)[:3] + '\0\0sAlT').digest()
+            iv = hashlib.md5(data).digest()
+            n = 16 - len(data) % 16
+            return iv + RijndaelEncryptor(k, len(k) * 8).encrypt_cbc(iv, data + chr(n) * n)
+        k = key + struct.pack('<L', objid)[:3] + '\0\0'
+        return Arcfour(hashlib.md5(k).digest()[:10]).process(data)
+
+    def string(objid, s):
+        if not objstm:
+            # strings in object streams are encrypted with the stream.
+            s = encrypt_data(objid, s)
+        return '<%s>' % s.encode('hex')
+
+    objs = {}
+    objs[1] = '<< /Type /Catalog /Pages 2 0 R >>'
+    objs[3] = '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'
+    objs[4] = '<< /Font << /F1 3 0 R >> /ProcSet [/PDF /Text] >>'
+    objs[5] = '[%s]' % ' '.join(
+        '<< /Type /Annot /Subtype /Text /Rect [%d 10 %d 30] /Contents %s >>' %
+        (i * 20, i * 20 + 20, string(5, 'Annotation %d: ' % i + 'lorem ipsum ' * 20))
+        for i in range(20))
+    objs[6] = '<< /Title %s /Producer %s >>' % (string(6, 'Benchmark'), string(6, 'pdfminer'))
+    kids = []
+    streams = {}
+    for i in range(npages):
+        (pageid, contentid) = (10 + i * 2, 11 + i * 2)
+        kids.append('%d 0 R' % pageid)
+        objs[pageid] = ('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                        '/Resources 4 0 R /Annots 5 0 R /Contents %d 0 R >>' % contentid)
+        data = 'BT /F1 12 Tf 72 712 Td (Page %d) Tj 0 -14 Td (Lorem ipsum dolor sit amet) Tj ET' % i
+        streams[contentid] = ('', encrypt_data(contentid, data))
+    objs[2] = '<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(kids), npages)
+
+    packed = {}
+    if objstm:
+        objids = sorted(objs)
+        strmid = 10 + npages * 2
+        for i in range(0, len(objids), 100):
+            chunk = objids[i:i + 100]
+            (header, body) = ([], [])
+            pos = 0
+            for objid in chunk:
+                header.append('%d %d' % (objid, pos))
+                body.append(objs.pop(objid) + '\n')
+                pos += len(body[-1])
+                packed[objid] = (strmid, len(header) - 1)
+            header = ' '.join(header) + '\n'
+            streams[strmid] = ('/Type /ObjStm /N %d /First %d ' % (len(chunk), len(header)),
+                               encrypt_data(strmid, header + ''.join(body)))
+            strmid += 1
+    for (objid, (attrs, data)) in streams.items():
+        objs[objid] = '<< %s/Length %d >>\nstream\n%s\nendstream' % (attrs, len(data), data)
+
+    out = ['%PDF-1.5\n' if objstm else '%PDF-1.4\n']
+    offsets = {}
+    pos = len(out[0])
+    for objid in sorted(objs):
+        offsets[objid] = pos
+        out.append('%d 0 obj\n%s\nendobj\n' % (objid, objs[objid]))
+        pos += len(out[-1])
+    size = max(list(objs) + list(packed)) + 1
+    trailer = '/Size %d /Root 1 0 R /Info 6 0 R /ID [<%s> <%s>]' % (size, docid.encode('hex'), docid.encode('hex'))
+    if key:
+        trailer += (' /Encrypt << /Filter /Standard %s /O <%s> /U <%s> /P %d >>' %
+                    (encryption, O.encode('hex'), U.encode('hex'), P))
+    if objstm:
+        # the XRef stream itself goes last, uncompressed.
+        xrefid = size
+        offsets[xrefid] = pos
+        entries = []
+        for objid in range(size + 1):
+            if objid in offsets:
+                entries.append(struct.pack('>BLH', 1, offsets[objid], 0))
+            elif objid in packed:
+                entries.append(struct.pack('>BLH', 2, packed[objid][0], packed[objid][1]))
+            else:
+                entries.append(struct.pack('>BLH', 0, 0, 0))
+        data = ''.join(entries)
+        trailer = trailer.replace('/Size %d' % size, '/Size %d' % (size + 1))
+        out.append('%d 0 obj\n<< /Type /XRef %s /W [1 4 2] /Length %d >>\nstream\n%s\nendstream\nendobj\n'
+                   'startxref\n%d\n%%%%EOF\n' % (xrefid, trailer, len(data), data, pos))
+        return ''.join(out)
+    out.append('xref\n0 %d\n' % size)
+    for objid in range(size):
+        if objid in offsets:
+            out.append('%010d 00000 n \n' % offsets[objid])
+        else:
+            out.append('0000000000 65535 f \n')
+    out.append('trailer\n<< %s >>\nstartxref\n%d\n%%%%EOF\n' % (trailer, pos))
+    return ''.join(out)
+
+
+def timeit(func, repeat=3):
+    """Returns the best wall-clock time of func() over several runs."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.time()
+        func()
+        t = time.time() - t0
+        if best is None or t < best:
+            best = t
+    return best
+
+
+def report(name, nbytes, t, extra=''):
+    print('%-32s %8.3fs %8.2f MB/s %s' % (name, t, nbytes / t / 1048576.0, extra))
+
+
+def bench_tokenizer(datas):
+    """Compares the state machine tokenizer with the bulk tokenizer."""
+    def run(data, bulk):
+        parser = PSBaseParser(BytesIO(data))
+        parser.BULK_TOKENIZE = bulk
+        n = 0
+        try:
+            while 1:
+                parser.nexttoken()
+                n += 1
+        except PSEOF:
+            pass
+        return n
+    for (name, data) in datas:
+        ntokens = run(data, True)
+        for bulk in (False, True):
+            t = timeit(lambda: run(data, bulk))
+            label = '%s (%s)' % (name, 'bulk' if bulk else 'statemachine')
+            report(label, len(data), t, '%.0f tokens/s' % (ntokens / t))
+
+
+class ObjectParser(PSStackParser):
+
+    def flush(self):
+        self.add_results(*self.popall())
+
+
+def bench_objects(datas):
+    """Compares nextobject() loops with the iterobjects() generator."""
+    def run_next(data):
+        parser = ObjectParser(BytesIO(data))
+        n = 0
+        try:
+            while 1:
+                parser.nextobject()
+                n += 1
+        except PSEOF:
+            pass
+        return n
+
+    def run_iter(data):
+        parser = ObjectParser(BytesIO(data))
+        n = 0
+        for _ in parser.iterobjects():
+            n += 1
+        return n
+    for (name, data) in datas:
+        nobjs = run_iter(data)
+        for (label, func) in (('nextobject', run_next), ('iterobjects', run_iter)):
+            t = timeit(lambda: func(data))
+            report('%s (%s)' % (name, label), len(data), t, '%.0f objects/s' % (nobjs / t))
+
+
+def bench_encryption(datas):
+    """Extracts the text of each document and fetches every object again."""
+    def run(data):
+        rsrcmgr = PDFResourceManager()
+        device = TextConverter(rsrcmgr, NullWriter())
+        process_pdf(rsrcmgr, device, BytesIO(data))
+        device.close()
+    for (name, data) in datas:
+        t = timeit(lambda: run(data))
+        report(name, len(data), t)
+
+
+class ByteArcfour(object):
+    """The previous Arcfour implementation, kept as a baseline."""
+
+    def __init__(self, key):
+        s = list(range(256))
+        j = 0
+        klen = len(key)
+        for i in range(256):
+            j = (j + s[i] + ord(key[i % klen])) % 256
+            (s[i], s[j]) = (s[j], s[i])
+        self.s = s
+        (self.i, self.j) = (0, 0)
+
+    def process(self, data):
+        (i, j) = (self.i, self.j)
+        s = self.s
+        r = ''
+        for c in data:
+            i = (i + 1) % 256
+            j = (j + s[i]) % 256
+            (s[i], s[j]) = (s[j], s[i])
+            k = s[(s[i] + s[j]) % 256]
+            r += chr(ord(c) ^ k)
+        (self.i, self.j) = (i, j)
+        return r
+
+
+def bench_rc4(datas):
+    """Decrypts each data as one stream, then as many short strings.
+
+    The strings are decrypted with a new cipher each, as well as with
+    PDFDocument.decrypt_rc4(), which shares the keystream of an object.
+    """
+    key = '\x01\x02\x03\x04\x05'
+
+    def run_stream(cipher, data):
+        return cipher(key).process(data)
+
+    def run_strings(cipher, strings):
+        for (objid, s) in strings:
+            cipher(key + chr(objid % 256)).process(s)
+
+    def run_document(strings):
+        doc = PDFDocument()
+        doc.decrypt_key = key
+        for (objid, s) in strings:
+            doc.decrypt_rc4(objid, 0, s)
+    for (name, data) in datas:
+        # 20 strings of 64 bytes per object, like an array of annotations.
+        strings = [(i // 1280, data[i:i + 64]) for i in range(0, len(data), 64)]
+        for cipher in (ByteArcfour, Arcfour):
+            label = '%s (stream, %s)' % (name, cipher.__name__)
+            report(label, len(data), timeit(lambda: run_stream(cipher, data)))
+        for cipher in (ByteArcfour, Arcfour):
+            label = '%s (strings, %s)' % (name, cipher.__name__)
+            report(label, len(data), timeit(lambda: run_strings(cipher, strings)))
+        report('%s (strings, decrypt_rc4)' % name, len(data), timeit(lambda: run_document(strings)))
+
+
+def bench_aes(datas):
+    """Decrypts each data in CBC mode with AES-128 and AES-256."""
+    iv = '\0' * 16
+
+    def run_blocks(decryptor, data):
+        prev = iv
+        out = []
+        for i in range(0, len(data), 16):
+            block = data[i:i + 16]
+            out.append(xor_bytes(decryptor.decrypt(block), prev))
+            prev = block
+        return ''.join(out)
+
+    def run_cbc(decryptor, data):
+        return decryptor.decrypt_cbc(iv, data)
+    for (name, data) in datas:
+        data = data[:len(data) // 16 * 16]
+        for keybits in (128, 256):
+            decryptor = RijndaelDecryptor('\x01' * (keybits // 8), keybits)
+            for (label, func) in (('blocks', run_blocks), ('cbc', run_cbc)):
+                t = timeit(lambda: func(decryptor, data))
+                report('%s (AES-%d, %s)' % (name, keybits, label), len(data), t)
+
+
+def bench_xref(datas):
+    """Opens each document, comparing bulk and line-by-line XRef tables."""
+    def run(data):
+        parser = PDFParser(BytesIO(data))
+        doc = PDFDocument()
+        parser.set_document(doc)
+        doc.set_parser(parser)
+        return sum(len(xref.offsets) for xref in doc.xrefs if isinstance(xref, PDFXRef))
+
+    def by_line(self, parser, start, nobjs):
+        return False
+    load_entries = PDFXRef.load_entries
+    for (name, data) in datas:
+        nobjs = run(data)
+        for bulk in (False, True):
+            PDFXRef.load_entries = load_entries if bulk else by_line
+            try:
+                t = timeit(lambda: run(data))
+            finally:
+                PDFXRef.load_entries = load_entries
+            label = '%s (%s)' % (name, 'bulk' if bulk else 'lines')
+            report(label, len(data), t, '%.0f entries/s' % (nobjs / t))
+
+
+def bench_fallback(datas):
+    """Opens each document with its startxref offset damaged."""
+    def run(data):
+        parser = PDFParser(BytesIO(data))
+        doc = PDFDocument()
+        parser.set_document(doc)
+        doc.set_parser(parser)
+        return sum(1 for xref in doc.xrefs for _ in xref.get_objids())
+    for (name, data) in datas:
+        data = re.sub(r'startxref(\s+)\d+', r'startxref\g<1>999999999', data)
+        nobjs = run(data)
+        t = timeit(lambda: run(data))
+        report(name, len(data), t, '%.0f objects/s' % (nobjs / t))
+
+
+def bench_objstm(datas):
+    """Fetches single objects from object streams, then all of them."""
+    def opendoc(data):
+        parser = PDFParser(BytesIO(data))
+        doc = PDFDocument()
+        parser.set_document(doc)
+        doc.set_parser(parser)
+        doc.initialize()
+        return doc
+
+    def run_one(doc, objids):
+        # each object is fetched from a freshly opened document.
+        for objid in objids:
+            doc.objcache.clear()
+            doc.getobj(objid)
+
+    def run_all(doc, objids):
+        doc.objcache.clear()
+        for objid in objids:
+            doc.getobj(objid)
+    for (name, data) in datas:
+        doc = opendoc(data)
+        objids = [objid for objid in doc._index.get_objids() if doc._index.get_pos(objid)[0]]
+        sample = objids[::max(1, len(objids) // 100)]
+        t = timeit(lambda: run_one(doc, sample))
+        report('%s (single)' % name, len(data), t, '%.0f objects/s' % (len(sample) / t))
+        t = timeit(lambda: run_all(doc, objids))
+        report('%s (all)' % name, len(data), t, '%.0f objects/s' % (len(objids) / t))
+
+
+def byte_png_predictor(pred, colors, columns, bitspercomponent, data):
+    """The previous apply_png_predictor(), kept as a baseline."""
+    nbytes = colors * columns * bitspercomponent // 8
+    buf = []
+    line0 = '\x00' * columns
+    for i in range(0, len(data), nbytes + 1):
+        pred = ord(data[i])
+        line1 = data[i + 1:i + nbytes + 1]
+        if pred == 0:
+            pass
+        elif pred == 1:
+            l = []
+            c = 0
+            for b in line1:
+                c = (c + ord(b)) & 255
+                l.append(chr(c))
+            line1 = ''.join(l)
+        elif pred == 2:
+            line1 = ''.join(chr((ord(a) + ord(b)) & 255) for (a, b) in zip(line0, line1))
+        elif pred == 3:
+            l = []
+            c = 0
+            for (a, b) in zip(line0, line1):
+                c = ((c + ord(a) + ord(b)) // 2) & 255
+                l.append(chr(c))
+            line1 = ''.join(l)
+        else:
+            raise ValueError(pred)
+        buf.append(line1)
+        line0 = line1
+    return ''.join(buf)
+
+
+def make_predicted(pred, colors, columns, nrows, tag=None):
+    """Returns (pred, colors, columns, 8, data) with nrows of noise."""
+    rowsize = colors * columns
+    noise = ''.join(hashlib.md5(str(i)).digest() for i in range(rowsize // 16 + 2))
+    rows = []
+    for i in range(nrows):
+        row = noise[i % 16:i % 16 + rowsize]
+        rows.append(row if tag is None else chr(tag) + row)
+    return (pred, colors, columns, 8, ''.join(rows))
+
+
+def find_predicted(data):
+    """Returns the Flate streams of a document that use a predictor."""
+    parser = PDFParser(BytesIO(data))
+    doc = PDFDocument()
+    parser.set_document(doc)
+    doc.set_parser(parser)
+    doc.initialize()
+    samples = []
+    for xref in doc.xrefs:
+        for objid in xref.get_objids():
+            obj = doc.getobj(objid)
+            if not isinstance(obj, PDFStream) or obj.decipher:
+                continue
+            params = obj.get_any(('DP', 'DecodeParms'), {})
+            if (obj.get_filters() and obj.get_filters()[0] in LITERALS_FLATE_DECODE and
+                    isinstance(params, dict) and params.get('Predictor', 1) != 1):
+                samples.append((params['Predictor'], params.get('Colors', 1), params.get('Columns', 1),
+                                params.get('BitsPerComponent', 8), zlib.decompress(obj.get_rawdata())))
+    return samples
+
+
+def bench_predictor(datas):
+    """Undoes predictors with the previous function, then the engine.
+
+    Each data is a list of (pred, colors, columns, bitspercomponent,
+    data), or a document to take them from.
+    """
+    def run(func, samples):
+        for (pred, colors, columns, bitspercomponent, data) in samples:
+            func(pred, colors, columns, bitspercomponent, data)
+
+    def can_byte(samples):
+        for (pred, colors, columns, bitspercomponent, data) in samples:
+            rowsize = colors * columns + 1
+            if pred < 10 or bitspercomponent != 8 or max(data[::rowsize] or '\x00') > '\x03':
+                return False
+        return True
+    numpy = predictor.numpy
+    for (name, samples) in datas:
+        if isinstance(samples, str):
+            samples = find_predicted(samples)
+        nbytes = sum(len(sample[-1]) for sample in samples)
+        if can_byte(samples):
+            report('%s (old)' % name, nbytes, timeit(lambda: run(byte_png_predictor, samples)))
+        try:
+            predictor.numpy = None
+            report(name, nbytes, timeit(lambda: run(predictor.apply_predictor, samples)))
+        finally:
+            predictor.numpy = numpy
+        if numpy is not None:
+            report('%s (numpy)' % name, nbytes, timeit(lambda: run(predictor.apply_predictor, samples)))
+
+
+def predicted_samples():
+    samples = [('xref (Up)', [make_predicted(12, 1, 7, 100000, 2)]),
+               ('image (TIFF)', [make_predicted(2, 3, 1000, 100)])]
+    for (tag, name) in enumerate(('None', 'Sub', 'Up', 'Average', 'Paeth')):
+        samples.append(('image (%s)' % name, [make_predicted(15, 1, 3000, 100, tag)]))
+    return samples
+
+
+class ByteLZWDecoder(object):
+    """The previous LZW decoder, kept as a baseline."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buff = 0
+        self.bpos = 8
+        self.nbits = 9
+        self.table = None
+        self.prevbuf = None
+
+    def readbits(self, bits):
+        v = 0
+        while 1:
+            r = 8 - self.bpos
+            if bits <= r:
+                v = (v << bits) | ((self.buff >> (r - bits)) & ((1 << bits) - 1))
+                self.bpos += bits
+                break
+            else:
+                v = (v << r) | (self.buff & ((1 << r) - 1))
+                bits -= r
+                x = self.fp.read(1)
+                if not x:
+                    raise EOFError
+                self.buff = ord(x)
+                self.bpos = 0
+        return v
+
+    def feed(self, code):
+        x = ''
+        if code == 256:
+            self.table = [chr(c) for c in range(256)]
+            self.table.append(None)
+            self.table.append(None)
+            self.prevbuf = ''
+            self.nbits = 9
+        elif code == 257:
+            pass
+        elif not self.prevbuf:
+            x = self.prevbuf = self.table[code]
+        else:
+            if code < len(self.table):
+                x = self.table[code]
+                self.table.append(self.prevbuf + x[0])
+            else:
+                self.table.append(self.prevbuf + self.prevbuf[0])
+                x = self.table[code]
+            l = len(self.table)
+            if l == 511:
+                self.nbits = 10
+            elif l == 1023:
+                self.nbits = 11
+            elif l == 2047:
+                self.nbits = 12
+            self.prevbuf = x
+        return x
+
+    def run(self):
+        while 1:
+            try:
+                code = self.readbits(self.nbits)
+            except EOFError:
+                break
+            yield self.feed(code)
+
+
+def lzwencode(data):
+    """Returns data LZW encoded, with EarlyChange and a clear code
+    whenever the table is full.
+    """
+    codes = [256]
+    table = dict((chr(c), c) for c in range(256))
+    w = ''
+    for c in data:
+        if w + c in table:
+            w += c
+            continue
+        codes.append(table[w])
+        table[w + c] = len(table) + 2
+        w = c
+        if len(table) + 2 == 4094:
+            codes.extend((table[w], 256))
+            table = dict((chr(c), c) for c in range(256))
+            w = ''
+    if w:
+        codes.append(table[w])
+    codes.append(257)
+    # the decoder adds each table entry one code later.
+    (bits, nbits, i) = (0, 0, 0)
+    out = []
+    for code in codes:
+        size = 258 + max(0, i - 1)
+        width = 9 if size < 511 else 10 if size < 1023 else 11 if size < 2047 else 12
+        (bits, nbits) = ((bits << width) | code, nbits + width)
+        i = 0 if code == 256 else i + 1
+        while 8 <= nbits:
+            nbits -= 8
+            out.append(chr((bits >> nbits) & 255))
+        bits &= (1 << nbits) - 1
+    if nbits:
+        out.append(chr((bits << (8 - nbits)) & 255))
+    return ''.join(out)
+
+
+def bench_lzw(datas):
+    """LZW encodes each data, then decodes it as a whole and in pieces."""
+    def run_byte(data):
+        return ''.join(ByteLZWDecoder(BytesIO(data)).run())
+
+    def run_chunks(data):
+        decoder = LZWDecoder()
+        return ''.join(decoder.decode(data[i:i + 4096]) for i in range(0, len(data), 4096))
+    for (name, data) in datas:
+        encoded = lzwencode(data)
+        assert lzwdecode(encoded) == data
+        for (label, func) in (('old', run_byte), ('whole', lzwdecode), ('chunks', run_chunks)):
+            report('%s (%s)' % (name, label), len(data), timeit(lambda: func(encoded)))
+
+
+def byte_ascii85decode(data):
+    """The previous ascii85decode(), kept as a baseline."""
+    n = b = 0
+    out = ''
+    for c in data:
+        if '!' <= c <= 'u':
+            n += 1
+            b = b * 85 + (ord(c) - 33)
+            if n == 5:
+                out += struct.pack('>L', b)
+                n = b = 0
+        elif c == 'z':
+            out += '\0\0\0\0'
+        elif c == '~':
+            if n:
+                for _ in range(5 - n):
+                    b = b * 85 + 84
+                out += struct.pack('>L', b)[:n - 1]
+            break
+    return out
+
+
+def regex_asciihexdecode(data):
+    """The previous asciihexdecode(), kept as a baseline."""
+    decode = (lambda hx: chr(int(hx, 16)))
+    out = list(map(decode, re.findall(r'([a-f\d]{2})', data, re.IGNORECASE)))
+    m = re.search(r'^(?:[a-f\d]{2}|\s)*([a-f\d])[\s>]*$', data, re.IGNORECASE)
+    if m:
+        out.append(decode('%c0' % m.group(1)))
+    return ''.join(out)
+
+
+def str_rldecode(data):
+    """The previous rldecode(), kept as a baseline."""
+    decoded = []
+    i = 0
+    while i < len(data):
+        length = ord(data[i])
+        if length == 128:
+            break
+        if 0 <= length < 128:
+            decoded.append(data[i + 1:(i + 1) + (length + 1)])
+            i = (i + 1) + (length + 1)
+        if length > 128:
+            decoded.append(data[i + 1] * (257 - length))
+            i = (i + 1) + 1
+    return ''.join(decoded)
+
+
+def ascii85encode(data):
+    """Returns data ASCII85 encoded in lines of 75 characters."""
+    n = len(data)
+    data += '\0' * (-n % 4)
+    out = []
+    for (i, v) in enumerate(struct.unpack('>%dL' % (len(data) // 4), data)):
+        if v == 0 and i * 4 + 4 <= n:
+            out.append('z')
+            continue
+        digits = []
+        for _ in range(5):
+            (v, c) = divmod(v, 85)
+            digits.append(chr(c + 33))
+        out.append(''.join(reversed(digits)))
+    s = ''.join(out)
+    if n % 4:
+        s = s[:len(s) - 4 + n % 4]
+    return '\n'.join(s[i:i + 75] for i in range(0, len(s), 75)) + '~>'
+
+
+def rlencode(data):
+    """Returns data RunLength encoded."""
+    out = []
+    i = 0
+    while i < len(data):
+        j = i + 1
+        while j < len(data) and j - i < 128 and data[j] == data[i]:
+            j += 1
+        if 2 <= j - i:
+            out.append(chr(257 - (j - i)) + data[i])
+        else:
+            # a literal run, up to the next repeated byte.
+            while j < len(data) and j - i < 128 and data[j] != data[j - 1]:
+                j += 1
+            if j < len(data) and data[j] == data[j - 1] and i < j - 1:
+                j -= 1
+            out.append(chr(j - i - 1) + data[i:j])
+        i = j
+    return ''.join(out) + '\x80'
+
+
+def bench_filters(datas):
+    """Encodes each data, then decodes it with the previous decoders,
+    the bulk ones and the incremental ones fed 4 KB at a time.
+    """
+    def run_chunks(decoder, data):
+        out = [decoder.decode(data[i:i + 4096]) for i in range(0, len(data), 4096)]
+        return ''.join(out) + decoder.flush()
+    for (name, data) in datas:
+        hexdata = binascii.hexlify(data)
+        hexdata = '\n'.join(hexdata[i:i + 64] for i in range(0, len(hexdata), 64)) + '>'
+        for (label, encoded, old, bulk, decoder) in (
+                ('ASCII85', ascii85encode(data), byte_ascii85decode, ascii85decode, ASCII85Decoder),
+                ('ASCIIHex', hexdata, regex_asciihexdecode, asciihexdecode, ASCIIHexDecoder),
+                ('RunLength', rlencode(data), str_rldecode, rldecode, RunLengthDecoder)):
+            assert bulk(encoded) == data
+            report('%s (%s, old)' % (name, label), len(encoded), timeit(lambda: old(encoded)))
+            report('%s (%s, bulk)' % (name, label), len(encoded), timeit(lambda: bulk(encoded)))
+            report('%s (%s, chunks)' % (name, label), len(encoded),
+                   timeit(lambda: run_chunks(decoder(), encoded)))
+
+
+def get_codes(table):
+    """Returns the codes of a lookup table of ccitt, as {bits: value}."""
+    codes = {}
+    for (i, e) in enumerate(table):
+        if e is not None:
+            codes[format(i >> (TABLE_BITS - e[1]), '0%db' % e[1])] = e[0]
+    return codes
+
+
+def make_trie(codes):
+    root = [None, None]
+    for (bits, v) in codes.items():
+        p = root
+        for c in bits[:-1]:
+            if p[int(c)] is None:
+                p[int(c)] = [None, None]
+            p = p[int(c)]
+        p[int(bits[-1])] = v
+    return root
+
+
+class BitCCITTDecoder(object):
+    """The previous Group 4 decoder, kept as a baseline: it walks a
+    trie of the codes a bit at a time, and paints lines a pixel at a time.
+    """
+
+    class EOFB(Exception):
+        pass
+
+    def __init__(self, width):
+        codes = get_codes(CCITTG4Parser.MODE)
+        codes['000000000001000000000001'] = 'e'
+        self.MODE = make_trie(codes)
+        self.WHITE = make_trie(get_codes(CCITTG4Parser.WHITE))
+        self.BLACK = make_trie(get_codes(CCITTG4Parser.BLACK))
+        self.width = width
+        self._buf = ''
+        self._y = 0
+        self._curline = array.array('b', [1] * width)
+        self._reset_line()
+        self._accept = self._parse_mode
+        self._state = self.MODE
+
+    def feedbytes(self, data):
+        for c in data:
+            b = ord(c)
+            try:
+                for m in (128, 64, 32, 16, 8, 4, 2, 1):
+                    self._parse_bit(b & m)
+            except self.EOFB:
+                break
+        return self._buf
+
+    def _parse_bit(self, x):
+        if x:
+            v = self._state[1]
+        else:
+            v = self._state[0]
+        if isinstance(v, list):
+            self._state = v
+        else:
+            self._state = self._accept(v)
+
+    def _parse_mode(self, mode):
+        if mode == 'p':
+            self._do_pass()
+            self._flush_line()
+            return self.MODE
+        elif mode == 'h':
+            self._n1 = 0
+            self._accept = self._parse_horiz1
+            return self.WHITE if self._color else self.BLACK
+        elif mode == 'e':
+            raise self.EOFB
+        self._do_vertical(mode)
+        self._flush_line()
+        return self.MODE
+
+    def _parse_horiz1(self, n):
+        self._n1 += n
+        if n < 64:
+            self._n2 = 0
+            self._color = 1 - self._color
+            self._accept = self._parse_horiz2
+        return self.WHITE if self._color else self.BLACK
+
+    def _parse_horiz2(self, n):
+        self._n2 += n
+        if n < 64:
+            self._color = 1 - self._color
+            self._accept = self._parse_mode
+            self._do_horizontal(self._n1, self._n2)
+            self._flush_line()
+            return self.MODE
+        return self.WHITE if self._color else self.BLACK
+
+    def _reset_line(self):
+        self._refline = self._curline
+        self._curline = array.array('b', [1] * self.width)
+        self._curpos = -1
+        self._color = 1
+
+    def _flush_line(self):
+        if self.width <= self._curpos:
+            thebytes = array.array('B', [0] * ((self.width + 7) // 8))
+            for (i, b) in enumerate(self._curline):
+                if b:
+                    thebytes[i // 8] += (128, 64, 32, 16, 8, 4, 2, 1)[i % 8]
+            self._buf += thebytes.tostring()
+            self._y += 1
+            self._reset_line()
+
+    def _find_b1(self):
+        x1 = self._curpos + 1
+        while 1:
+            if x1 == 0:
+                if self._color == 1 and self._refline[x1] != self._color:
+                    break
+            elif x1 == len(self._refline):
+                break
+            elif self._refline[x1 - 1] == self._color and self._refline[x1] != self._color:
+                break
+            x1 += 1
+        return x1
+
+    def _do_vertical(self, dx):
+        x1 = max(0, min(self.width, self._find_b1() + dx))
+        x0 = max(0, self._curpos)
+        for x in range(min(x0, x1), max(x0, x1)):
+            self._curline[x] = self._color
+        self._curpos = x1
+        self._color = 1 - self._color
+
+    def _do_pass(self):
+        x1 = self._find_b1()
+        while 1:
+            if x1 == 0:
+                if self._color == 0 and self._refline[x1] == self._color:
+                    break
+            elif x1 == len(self._refline):
+                break
+            elif self._refline[x1 - 1] != self._color and self._refline[x1] == self._color:
+                break
+            x1 += 1
+        for x in range(self._curpos, x1):
+            self._curline[x] = self._color
+        self._curpos = x1
+
+    def _do_horizontal(self, n1, n2):
+        if self._curpos < 0:
+            self._curpos = 0
+        x = self._curpos
+        for _ in range(n1):
+            if len(self._curline) <= x:
+                break
+            self._curline[x] = self._color
+            x += 1
+        for _ in range(n2):
+            if len(self._curline) <= x:
+                break
+            self._curline[x] = 1 - self._color
+            x += 1
+        self._curpos = x
+
+
+def ccittencode(lines, width, k=-1):
+    """Returns lines, as lists of changing elements, CCITT encoded: in
+    Group 4 if k < 0, and otherwise in Group 3 with an EOL before each
+    line, where one line in k is one-dimensional (all of them if k is 0).
+    """
+    mode = dict((v, c) for (c, v) in get_codes(CCITTG4Parser.MODE).items())
+    tables = (dict((v, c) for (c, v) in get_codes(CCITTG4Parser.BLACK).items()),
+              dict((v, c) for (c, v) in get_codes(CCITTG4Parser.WHITE).items()))
+
+    def run(n, color):
+        codes = tables[color]
+        out = []
+        while 2560 < n:
+            out.append(codes[2560])
+            n -= 2560
+        if 64 <= n:
+            out.append(codes[n // 64 * 64])
+            n %= 64
+        out.append(codes[n])
+        return ''.join(out)
+    eol = '000000000001'
+    out = []
+    ref = [width] * 3
+    for (y, changes) in enumerate(lines):
+        cur = changes + [width] * 2
+        if 0 <= k:
+            out.append(eol)
+        if k == 0 or (0 < k and y % k == 0):
+            if 0 < k:
+                out.append('1')
+            for (i, (x0, x1)) in enumerate(zip([0] + changes, changes + [width])):
+                out.append(run(x1 - x0, 1 - (i & 1)))
+        else:
+            if 0 < k:
+                out.append('0')
+            (a0, color) = (-1, 1)
+            while a0 < width:
+                i = bisect_right(cur, a0)
+                (a1, a2) = (cur[i], cur[i + 1])
+                j = bisect_right(ref, a0)
+                if (j & 1) == color:
+                    j += 1
+                (b1, b2) = (ref[j], ref[j + 1])
+                if b2 < a1:
+                    out.append(mode['p'])
+                    a0 = b2
+                elif abs(a1 - b1) <= 3:
+                    out.append(mode[a1 - b1])
+                    (a0, color) = (a1, 1 - color)
+                else:
+                    out.append(mode['h'] + run(a1 - max(0, a0), color) + run(a2 - a1, 1 - color))
+                    a0 = a2
+        ref = changes + [width] * 3
+    if k < 0:
+        out.append(eol * 2)
+    else:
+        out.append((eol + ('1' if 0 < k else '')) * 6)
+    bits = ''.join(out)
+    bits += '0' * (-len(bits) % 8)
+    return binascii.unhexlify('%0*x' % (len(bits) // 4, int(bits, 2)))
+
+
+def make_glyph(rnd, width, height=24):
+    """Returns the rows of a glyph, as lists of (start, end) runs: a
+    stroke or two, moving a little from one row to the next.
+    """
+    strokes = [rnd.randint(0, width - 3) for _ in range(rnd.randint(1, 2))]
+    rows = []
+    for _ in range(height):
+        strokes = sorted(min(width - 3, max(0, x + rnd.randint(-1, 1))) for x in strokes)
+        runs = []
+        for x in strokes:
+            if runs and x <= runs[-1][1]:
+                runs[-1] = (runs[-1][0], x + 3)
+            else:
+                runs.append((x, x + 3))
+        rows.append(runs)
+    return rows
+
+
+def fax_pages(npages, width=1728, height=2200):
+    """Returns the lines of pages of text, as lists of changing elements."""
+    rnd = random.Random(0)
+    font = [make_glyph(rnd, rnd.randint(8, 14)) for _ in range(60)]
+    lines = []
+    for _ in range(npages):
+        page = [[] for _ in range(100)]
+        while len(page) < height - 100:
+            # a line of text, 24 rows high, then 16 white rows.
+            glyphs = []
+            x = rnd.randint(90, 110)
+            while x < width - 200:
+                for _ in range(rnd.randint(1, 9)):
+                    glyph = rnd.choice(font)
+                    glyphs.append((x, glyph))
+                    x += max(e for row in glyph for (_, e) in row or [(0, 0)]) + 3
+                x += 12
+            for i in range(24):
+                page.append([x + c for (x, glyph) in glyphs for run in glyph[i] for c in run])
+            page.extend([] for _ in range(16))
+        lines.extend(page[:height])
+    return lines
+
+
+def bench_ccitt(datas):
+    """Encodes synthetic fax pages in Group 4 and Group 3, and decodes
+    them with the previous Group 4 decoder, then the table-driven one.
+    """
+    (npages, width) = (10, 1728)
+    lines = fax_pages(npages, width)
+    expected = None
+    for (label, k) in (('G4', -1), ('G3 1D', 0), ('G3 2D, K=4', 4)):
+        encoded = ccittencode(lines, width, k)
+        params = {'K': k, 'Columns': width}
+        decoded = ccittfaxdecode(encoded, params)
+        if expected is None:
+            expected = decoded
+            old = ccittencode(lines[:len(lines) // npages], width, k)
+            assert BitCCITTDecoder(width).feedbytes(old) == ccittfaxdecode(old, params)
+            t = timeit(lambda: BitCCITTDecoder(width).feedbytes(old), repeat=1)
+            report('%s (old)' % label, len(old), t, '%8.2f pages/s' % (1 / t))
+        assert decoded == expected
+        t = timeit(lambda: ccittfaxdecode(encoded, params))
+        report('%s' % label, len(encoded), t, '%8.2f pages/s' % (npages / t))
+
+
+def scan_data():
+    """Returns bytes that look like a scanned page."""
+    return ''.join('\xff' * (i % 97) + hashlib.md5(str(i)).digest()[:i % 7] for i in range(20000))
+
+
+def synthetic_pdfs():
+    return [('plain', make_pdf()), ('rc4', make_pdf(encrypt=True)),
+            ('aesv2', make_pdf(encrypt='aesv2')), ('aesv3', make_pdf(encrypt='aesv3'))]
+
+
+BENCHMARKS = {
+    'tokenizer': (bench_tokenizer, lambda: [('synthetic', CONTENT_STREAM * 2000)]),
+    'objects': (bench_objects, lambda: [('synthetic', CONTENT_STREAM * 2000)]),
+    'encryption': (bench_encryption, synthetic_pdfs),
+    'rc4': (bench_rc4, lambda: [('synthetic', make_pdf(npages=2000))]),
+    'aes': (bench_aes, lambda: [('synthetic', make_pdf(npages=500))]),
+    'xref': (bench_xref, lambda: [('synthetic', make_pdf(npages=50000))]),
+    'fallback': (bench_fallback, lambda: [('synthetic', make_pdf(npages=50000))]),
+    'objstm': (bench_objstm, lambda: [('synthetic', make_pdf(npages=10000, objstm=True))]),
+    'predictor': (bench_predictor, predicted_samples),
+    'lzw': (bench_lzw, lambda: [('content', CONTENT_STREAM * 2000), ('scan', scan_data())]),
+    'filters': (bench_filters, lambda: [('content', CONTENT_STREAM * 2000), ('scan', scan_data())]),
+    'ccitt': (bench_ccitt, lambda: []),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run pdfminer throughput benchmarks.')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), help='benchmark to run')
+    parser.add_argument('file', nargs='*', help='input file(s) (default: synthetic data)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig()
+    logging.getLogger('pdfminer').setLevel(logging.WARNING)
+
+    (func, synthetic) = BENCHMARKS[args.benchmark]
+    if args.file:
+        datas = []
+        for path in args.file:
+            with open(path, 'rb') as fp:
+                datas.append((path, fp.read()))
+    else:
+        datas = synthetic()
+    func(datas)
+
+
+if __name__ == '__main__':
+    sys.exit(main())